@@ -37,6 +37,7 @@ from .ops.lensflare.delete import KB_OT_delete_lens_flare
 from .ops.lensflare.move import KB_OT_move_lens_flare
 from .ops.lyt.export import KB_OT_export_lyt
 from .ops.lyt.importop import KB_OT_import_lyt
+from .ops.mdl.batchexport import KB_OT_export_mdl_batch
 from .ops.mdl.export import KB_OT_export_mdl
 from .ops.mdl.importop import KB_OT_import_mdl
 from .ops.pth.addconnection import KB_OT_add_path_connection
@@ -131,6 +132,12 @@ def menu_func_export_mdl(self, context):
     self.layout.operator(KB_OT_export_mdl.bl_idname, text="KotOR Model (.mdl)")
 
 
+def menu_func_export_mdl_batch(self, context):
+    self.layout.operator(
+        KB_OT_export_mdl_batch.bl_idname, text="KotOR Models, Batch (.lyt)"
+    )
+
+
 def menu_func_export_lyt(self, context):
     self.layout.operator(KB_OT_export_lyt.bl_idname, text="KotOR Layout (.lyt)")
 
@@ -168,6 +175,7 @@ classes = (
     KB_OT_delete_path_connection,
     KB_OT_export_lyt,
     KB_OT_export_mdl,
+    KB_OT_export_mdl_batch,
     KB_OT_export_pth,
     KB_OT_hide_untextured,
     KB_OT_hide_char_bones,
@@ -239,6 +247,7 @@ def register():
     bpy.types.TOPBAR_MT_file_import.append(menu_func_import_lyt)
     bpy.types.TOPBAR_MT_file_import.append(menu_func_import_pth)
     bpy.types.TOPBAR_MT_file_export.append(menu_func_export_mdl)
+    bpy.types.TOPBAR_MT_file_export.append(menu_func_export_mdl_batch)
     bpy.types.TOPBAR_MT_file_export.append(menu_func_export_lyt)
     bpy.types.TOPBAR_MT_file_export.append(menu_func_export_pth)
 
@@ -248,6 +257,7 @@ def register():
 def unregister():
     bpy.types.TOPBAR_MT_file_export.remove(menu_func_export_pth)
     bpy.types.TOPBAR_MT_file_export.remove(menu_func_export_lyt)
+    bpy.types.TOPBAR_MT_file_export.remove(menu_func_export_mdl_batch)
     bpy.types.TOPBAR_MT_file_export.remove(menu_func_export_mdl)
     bpy.types.TOPBAR_MT_file_import.remove(menu_func_import_pth)
     bpy.types.TOPBAR_MT_file_import.remove(menu_func_import_lyt)
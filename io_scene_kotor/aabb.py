@@ -16,124 +16,265 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
-from mathutils import Vector
+import numpy as np
 
-from .utils import is_close
+from .constants import AabbSplitMode
 
+MAX_COORD = 100000.0
 
-class BoundingBox:
-    def __init__(self, min, max, center):
-        self.min = min
-        self.max = max
-        self.center = center
+NUM_SAH_BINS = 16
 
-    def longest_axis(self):
-        size = self.max - self.min
-        if size.y > size.x and size.y > size.z:
-            return 1  # Y
-        elif size.z > size.x and size.z > size.y:
-            return 2  # Z
-        else:
-            return 0  # X
 
-
-def generate_tree(aabb_tree, faces, depth=0):
-    if depth > 128:
-        raise ValueError("depth must not exceed 128, but is equal to {}".format(depth))
-    if not faces:
+def generate_tree(verts, faces, split_mode=AabbSplitMode.CENTER):
+    if not len(faces):
         raise ValueError("faces must not be empty")
+    if split_mode not in [AabbSplitMode.CENTER, AabbSplitMode.SAH]:
+        raise ValueError("Unsupported split mode: " + str(split_mode))
 
-    bounding_box = compute_bounding_box(faces)
+    face_verts = np.asarray(verts, dtype=np.float32)[np.asarray(faces)[:, :3]]
+    centers = (face_verts[:, 0] + face_verts[:, 1] + face_verts[:, 2]) * np.float32(
+        1.0 / 3.0
+    )
+    builder = TreeBuilder(
+        np.minimum(face_verts.min(axis=1), np.float32(MAX_COORD)),
+        np.maximum(face_verts.max(axis=1), np.float32(-MAX_COORD)),
+        centers,
+    )
+    return builder.build(split_mode)
 
-    # Only one face left - this node is a leaf
-    if len(faces) == 1:
-        face_idx = faces[0][0]
-        aabb_tree.append(new_aabb_node(bounding_box, -1, -1, face_idx, 0))
-        return
 
-    split_axis = find_split_axis(bounding_box, faces)
-    left_faces, right_faces, actual_split_axis = split_faces(
-        bounding_box, faces, split_axis
-    )
+# Builds the tree one level at a time. Faces of every node on the current
+# level are kept in a single array, grouped into contiguous segments, so that
+# bounding boxes and splits of all nodes are computed at once.
+class TreeBuilder:
+    def __init__(self, face_min, face_max, centers):
+        self.face_min = face_min
+        self.face_max = face_max
+        self.centers = centers
+
+    def build(self, split_mode):
+        num_faces = len(self.centers)
+
+        # A tree over N faces always has 2N-1 nodes: N leaves and N-1 nodes
+        # with exactly two children each
+        num_nodes = 2 * num_faces - 1
+        node_min = np.empty((num_nodes, 3), dtype=np.float32)
+        node_max = np.empty((num_nodes, 3), dtype=np.float32)
+        node_children = np.full((num_nodes, 2), -1, dtype=np.int64)
+        node_face = np.full(num_nodes, -1, dtype=np.int64)
+        node_plane = np.zeros(num_nodes, dtype=np.int64)
+
+        elements = np.arange(num_faces)
+        counts = np.array([num_faces])
+        positions = np.array([0])
+        while len(counts):
+            starts = np.cumsum(counts) - counts
+            node_min[positions] = np.minimum.reduceat(self.face_min[elements], starts)
+            node_max[positions] = np.maximum.reduceat(self.face_max[elements], starts)
+
+            # Only one face left - these nodes are leaves
+            is_leaf = counts == 1
+            node_face[positions[is_leaf]] = elements[starts[is_leaf]]
+            if is_leaf.all():
+                break
+            if is_leaf.any():
+                elements = elements[np.repeat(~is_leaf, counts)]
+                counts = counts[~is_leaf]
+                positions = positions[~is_leaf]
+                starts = np.cumsum(counts) - counts
 
-    node = new_aabb_node(bounding_box, 0, 0, -1, 1 + actual_split_axis)
-    aabb_tree.append(node)
-    node[6] = len(aabb_tree)
-    generate_tree(aabb_tree, left_faces, depth + 1)
-    node[7] = len(aabb_tree)
-    generate_tree(aabb_tree, right_faces, depth + 1)
-
-
-def compute_bounding_box(faces):
-    min = Vector((100000.0, 100000.0, 100000.0))
-    max = Vector((-100000.0, -100000.0, -100000.0))
-    center = Vector()
-    for face in faces:
-        verts = face[1]
-        for vert in verts:
-            for axis in range(3):
-                if min[axis] > vert[axis]:
-                    min[axis] = vert[axis]
-                if max[axis] < vert[axis]:
-                    max[axis] = vert[axis]
-        face_center = face[2]
-        center = center + face_center
-    center = center / len(faces)
-    return BoundingBox(min, max, center)
-
-
-def find_split_axis(bounding_box, faces):
-    axis = bounding_box.longest_axis()
-
-    # Change axis in case points are coplanar with the split plane
-    change = True
-    for face in faces:
-        face_center = face[2]
-        change = change and is_close(face_center[axis], bounding_box.center[axis], 1e-4)
-    if change:
-        axis += 1
-        if axis == 3:
-            axis = 0
-
-    return axis
-
-
-def split_faces(bounding_box, faces, split_axis):
-    # Put faces on the left and right side of the split plane into separate
-    # lists. Try all axises to prevent tree degeneration.
-    left_faces = []
-    right_faces = []
-    for i in range(4):
-        left_faces = []
-        right_faces = []
-        for face in faces:
-            face_center = face[2]
-            if face_center[split_axis] < bounding_box.center[split_axis]:
-                left_faces.append(face)
+            seg_ids = np.repeat(np.arange(len(counts)), counts)
+            ranks = np.arange(len(elements)) - starts[seg_ids]
+            if split_mode == AabbSplitMode.SAH:
+                split = self.split_by_sah
             else:
-                right_faces.append(face)
-        if left_faces and right_faces:
-            break
-        # Tree is degenerate. Try another axis, or split into evenly sized
-        # lists if already tried all 3.
-        if i == 3:
-            non_empty_faces = left_faces if left_faces else right_faces
-            empty_faces = left_faces if not left_faces else right_faces
-            num_faces_to_move = int(len(non_empty_faces) / 2)
-            for _ in range(num_faces_to_move):
-                empty_faces.append(non_empty_faces.pop())
-        split_axis = (split_axis + 1) % 3
-    return (left_faces, right_faces, split_axis)
-
-
-def new_aabb_node(
-    bounding_box, left_child_idx, right_child_idx, face_idx, most_significant_plane
-):
-    return [
-        *bounding_box.min[:3],
-        *bounding_box.max[:3],
-        left_child_idx,
-        right_child_idx,
-        face_idx,
-        most_significant_plane,
-    ]
+                split = self.split_at_center
+            is_left, ranks, split_axis = split(
+                elements,
+                seg_ids,
+                ranks,
+                starts,
+                counts,
+                node_min[positions],
+                node_max[positions],
+            )
+            num_left = np.add.reduceat(is_left.astype(np.int64), starts)
+
+            # Stable partition of every segment into left and right faces
+            order = np.lexsort((ranks, seg_ids * 2 + (~is_left)))
+            elements = elements[order]
+
+            # Nodes are laid out in pre-order: every node is followed by its
+            # left subtree, then by its right subtree
+            left_positions = positions + 1
+            right_positions = positions + 2 * num_left
+            node_children[positions, 0] = left_positions
+            node_children[positions, 1] = right_positions
+            node_plane[positions] = 1 + split_axis
+
+            counts = np.stack([num_left, counts - num_left], axis=1).ravel()
+            positions = np.stack([left_positions, right_positions], axis=1).ravel()
+
+        return [
+            [*bb_min, *bb_max, *children, face_idx, plane]
+            for bb_min, bb_max, children, face_idx, plane in zip(
+                node_min.tolist(),
+                node_max.tolist(),
+                node_children.tolist(),
+                node_face.tolist(),
+                node_plane.tolist(),
+            )
+        ]
+
+    def split_at_center(self, elements, seg_ids, ranks, starts, counts, bb_min, bb_max):
+        num_elements = len(elements)
+        centers = self.centers[elements]
+        center = segment_means(centers, starts, counts)
+
+        size = bb_max - bb_min
+        split_axis = np.zeros(len(counts), dtype=np.int64)
+        split_axis[(size[:, 1] > size[:, 0]) & (size[:, 1] > size[:, 2])] = 1
+        split_axis[(size[:, 2] > size[:, 0]) & (size[:, 2] > size[:, 1])] = 2
+
+        # Change axis in case points are coplanar with the split plane
+        element_axis = split_axis[seg_ids]
+        deltas = centers[np.arange(num_elements), element_axis].astype(
+            np.float64
+        ) - center[seg_ids, element_axis].astype(np.float64)
+        coplanar = ~np.logical_or.reduceat(np.abs(deltas) > 1e-4, starts)
+        split_axis[coplanar] = (split_axis[coplanar] + 1) % 3
+
+        # Put faces on the left and right side of the split plane into
+        # separate lists. Try all axises to prevent tree degeneration.
+        is_left = np.zeros(num_elements, dtype=bool)
+        pending = np.ones(len(counts), dtype=bool)
+        for _ in range(4):
+            element_axis = split_axis[seg_ids]
+            left_try = (
+                centers[np.arange(num_elements), element_axis]
+                < center[seg_ids, element_axis]
+            )
+            num_left = np.add.reduceat(left_try.astype(np.int64), starts)
+            split = pending & (num_left > 0) & (num_left < counts)
+            split_elements = split[seg_ids]
+            is_left[split_elements] = left_try[split_elements]
+            pending &= ~split
+            split_axis[pending] = (split_axis[pending] + 1) % 3
+
+        # Tree is degenerate. Split into evenly sized lists, moving faces
+        # from the end of the non-empty list to the empty one.
+        if pending.any():
+            num_moved = counts // 2
+            all_left = pending & (num_left == counts)
+            moved = pending[seg_ids] & (ranks >= (counts - num_moved)[seg_ids])
+            kept = pending[seg_ids] & ~moved
+            is_left[moved] = ~all_left[seg_ids][moved]
+            is_left[kept] = all_left[seg_ids][kept]
+            ranks = np.where(moved, -ranks, ranks)
+
+        return is_left, ranks, split_axis
+
+    def split_by_sah(self, elements, seg_ids, ranks, starts, counts, bb_min, bb_max):
+        num_segments = len(counts)
+        centers = self.centers[elements].astype(np.float64)
+        face_min = self.face_min[elements].astype(np.float64)
+        face_max = self.face_max[elements].astype(np.float64)
+        center_min = np.minimum.reduceat(centers, starts)
+        extent = np.maximum.reduceat(centers, starts) - center_min
+
+        best_cost = np.full(num_segments, np.inf)
+        best_axis = np.zeros(num_segments, dtype=np.int64)
+        best_bin = np.zeros(num_segments, dtype=np.int64)
+        element_bins = np.empty((3, len(elements)), dtype=np.int64)
+        for axis in range(3):
+            scale = np.divide(
+                NUM_SAH_BINS,
+                extent[:, axis],
+                out=np.zeros(num_segments),
+                where=extent[:, axis] > 0.0,
+            )
+            bins = (
+                (centers[:, axis] - center_min[seg_ids, axis]) * scale[seg_ids]
+            ).astype(np.int64)
+            bins = np.clip(bins, 0, NUM_SAH_BINS - 1)
+            element_bins[axis] = bins
+
+            flat_bins = seg_ids * NUM_SAH_BINS + bins
+            bin_counts = np.bincount(
+                flat_bins, minlength=num_segments * NUM_SAH_BINS
+            ).reshape(num_segments, NUM_SAH_BINS)
+            bin_min = np.full((num_segments * NUM_SAH_BINS, 3), np.inf)
+            bin_max = np.full((num_segments * NUM_SAH_BINS, 3), -np.inf)
+            np.minimum.at(bin_min, flat_bins, face_min)
+            np.maximum.at(bin_max, flat_bins, face_max)
+            bin_min = bin_min.reshape(num_segments, NUM_SAH_BINS, 3)
+            bin_max = bin_max.reshape(num_segments, NUM_SAH_BINS, 3)
+
+            # Cost of putting bins up to and including i-th on the left
+            left_counts = np.cumsum(bin_counts, axis=1)[:, :-1]
+            left_area = surface_area(
+                np.minimum.accumulate(bin_min, axis=1),
+                np.maximum.accumulate(bin_max, axis=1),
+            )[:, :-1]
+            right_area = surface_area(
+                np.minimum.accumulate(bin_min[:, ::-1], axis=1)[:, ::-1],
+                np.maximum.accumulate(bin_max[:, ::-1], axis=1)[:, ::-1],
+            )[:, 1:]
+            right_counts = counts[:, None] - left_counts
+            valid = (left_counts > 0) & (right_counts > 0)
+            costs = np.full(left_counts.shape, np.inf)
+            costs[valid] = (
+                left_area[valid] * left_counts[valid]
+                + right_area[valid] * right_counts[valid]
+            )
+
+            split_bin = np.argmin(costs, axis=1)
+            cost = costs[np.arange(num_segments), split_bin]
+            better = cost < best_cost
+            best_cost[better] = cost[better]
+            best_axis[better] = axis
+            best_bin[better] = split_bin[better]
+
+        is_left = (
+            element_bins[best_axis[seg_ids], np.arange(len(elements))]
+            <= best_bin[seg_ids]
+        )
+
+        # Face centers coincide - split into evenly sized lists along the
+        # longest axis
+        unsplit = np.isinf(best_cost)
+        if unsplit.any():
+            best_axis[unsplit] = np.argmax((bb_max - bb_min)[unsplit], axis=1)
+            unsplit_elements = unsplit[seg_ids]
+            is_left[unsplit_elements] = (ranks < (counts // 2)[seg_ids])[
+                unsplit_elements
+            ]
+
+        return is_left, ranks, best_axis
+
+
+def segment_means(values, starts, counts):
+    # Mean of every segment of values, accumulated in single precision and in
+    # segment order, so that split planes match those of the original
+    # toolset. Segments of similar length are padded with zeros and summed
+    # together.
+    sums = np.empty((len(counts), 3), dtype=np.float32)
+    length_classes = np.log2(counts).astype(np.int64)
+    for length_class in np.unique(length_classes):
+        segments = np.flatnonzero(length_classes == length_class)
+        width = counts[segments].max()
+        offsets = np.arange(width)
+        valid = offsets < counts[segments, None]
+        padded = np.zeros((len(segments), width, 3), dtype=np.float32)
+        padded[valid] = values[(starts[segments, None] + offsets)[valid]]
+        sums[segments] = np.cumsum(padded, axis=1, dtype=np.float32)[:, -1]
+    return sums * (np.float32(1.0) / counts.astype(np.float32))[:, None]
+
+
+def surface_area(bb_min, bb_max):
+    size = bb_max - bb_min
+    return (
+        size[..., 0] * size[..., 1]
+        + size[..., 1] * size[..., 2]
+        + size[..., 2] * size[..., 0]
+    )
@@ -16,10 +16,15 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
+import os
+
+import bpy
+
 from bpy.types import AddonPreferences
-from bpy.props import StringProperty
+from bpy.props import BoolProperty, IntProperty, StringProperty
 
-from .constants import PACKAGE_NAME
+from .constants import PACKAGE_NAME, ImportOptions
+from .utils import semicolon_separated_to_absolute_paths
 
 DEF_TEXTURE_SEARCH_PATHS = "textures;../textures;../texturepacks/swpc_tex_tpa"
 DEF_LIGHTMAP_SEARCH_PATHS = "lightmaps;../lightmaps"
@@ -40,7 +45,93 @@ class KotorBlenderAddonPreferences(AddonPreferences):
         default=DEF_LIGHTMAP_SEARCH_PATHS,
     )
 
+    texture_mip_bias: IntProperty(
+        name="Texture Mip Bias",
+        description="Number of mip levels to skip when loading TPC textures, e.g. 1 to load them at half resolution",
+        min=0,
+    )
+
+    texture_max_resolution: IntProperty(
+        name="Texture Max Resolution",
+        description="Load TPC textures from the largest mip level not exceeding this width and height. Set to 0 to not limit resolution.",
+        min=0,
+    )
+
+    use_model_cache: BoolProperty(
+        name="Cache Parsed Models",
+        description="Keep parsed models and walkmeshes on disk to speed up repeated imports",
+    )
+
+    model_cache_path: StringProperty(
+        name="Model Cache Path",
+        description="Directory of the model cache. Leave empty to use the temporary directory.",
+        subtype="DIR_PATH",
+    )
+
+    model_cache_size: IntProperty(
+        name="Model Cache Size (MB)",
+        description="Least recently used models are removed from the cache above this size",
+        default=1024,
+        min=1,
+    )
+
+    use_texture_cache: BoolProperty(
+        name="Cache Decoded Textures",
+        description="Keep decoded TPC textures on disk and reference them from materials instead of packing pixels into the .blend file",
+    )
+
+    texture_cache_path: StringProperty(
+        name="Texture Cache Path",
+        description="Directory of the texture cache. Leave empty to use the temporary directory.",
+        subtype="DIR_PATH",
+    )
+
+    texture_cache_size: IntProperty(
+        name="Texture Cache Size (MB)",
+        description="Least recently used textures are removed from the cache above this size",
+        default=4096,
+        min=1,
+    )
+
     def draw(self, context):
         layout = self.layout
         layout.prop(self, "texture_search_paths")
         layout.prop(self, "lightmap_search_paths")
+        row = layout.row()
+        row.prop(self, "texture_mip_bias")
+        row.prop(self, "texture_max_resolution")
+        layout.prop(self, "use_model_cache")
+        row = layout.row()
+        row.enabled = self.use_model_cache
+        row.prop(self, "model_cache_path")
+        row.prop(self, "model_cache_size")
+        layout.prop(self, "use_texture_cache")
+        row = layout.row()
+        row.enabled = self.use_texture_cache
+        row.prop(self, "texture_cache_path")
+        row.prop(self, "texture_cache_size")
+
+    def set_texture_options(self, options, working_dir):
+        # Search paths can be relative to the working directory
+        options.texture_search_paths = semicolon_separated_to_absolute_paths(
+            self.texture_search_paths, working_dir
+        )
+        options.lightmap_search_paths = semicolon_separated_to_absolute_paths(
+            self.lightmap_search_paths, working_dir
+        )
+        options.texture_mip_bias = self.texture_mip_bias
+        options.texture_max_resolution = self.texture_max_resolution
+        options.use_texture_cache = self.use_texture_cache
+        options.texture_cache_dir = bpy.path.abspath(self.texture_cache_path)
+        options.texture_cache_size = self.texture_cache_size
+
+
+def texture_options_from_blend_file(context):
+    options = ImportOptions()
+    if bpy.data.filepath:
+        # Search paths are relative to the .blend file
+        addon_preferences = context.preferences.addons[PACKAGE_NAME].preferences
+        addon_preferences.set_texture_options(
+            options, os.path.dirname(bpy.data.filepath)
+        )
+    return options
@@ -0,0 +1,54 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+def find_adjacent_edges(faces):
+    # Returns index of the adjacent edge, i.e. 3 * face + edge, for every edge
+    # of every face, or -1 if edge is not shared. Edges shared by more than
+    # two faces are paired in face order: a face edge is paired with the
+    # first later face sharing it, overriding pairing of the latter.
+    edge_faces = dict()
+    for face_idx, face in enumerate(faces):
+        for edge_idx, edge in enumerate(face_edges(face)):
+            sharing_faces = edge_faces.setdefault(edge, [])
+            if not sharing_faces or sharing_faces[-1][0] != face_idx:
+                sharing_faces.append((face_idx, edge_idx))
+
+    adjacent_edges = [[-1, -1, -1] for _ in range(len(faces))]
+    for face_idx, face in enumerate(faces):
+        adjacent = adjacent_edges[face_idx]
+        pairs = []
+        for edge_idx, edge in enumerate(face_edges(face)):
+            if adjacent[edge_idx] != -1:
+                continue
+            for other_face_idx, other_edge_idx in edge_faces[edge]:
+                if other_face_idx > face_idx:
+                    pairs.append((other_face_idx, edge_idx, other_edge_idx))
+                    break
+        for other_face_idx, edge_idx, other_edge_idx in sorted(pairs):
+            adjacent[edge_idx] = 3 * other_face_idx + other_edge_idx
+            adjacent_edges[other_face_idx][other_edge_idx] = 3 * face_idx + edge_idx
+
+    return adjacent_edges
+
+
+def face_edges(face):
+    return [
+        (a, b) if a < b else (b, a)
+        for a, b in [(face[0], face[1]), (face[1], face[2]), (face[2], face[0])]
+    ]
@@ -112,13 +112,34 @@ class WalkmeshType:
     DWK = "DWK"
 
 
+class AabbSplitMode:
+    # Split at the mean of face centers, retrying other axes if that leaves
+    # one side empty. This is what the original toolset produces.
+    CENTER = "CENTER"
+
+    # Split where the binned surface area heuristic cost is the lowest.
+    # Produces tighter trees for unevenly tessellated meshes.
+    SAH = "SAH"
+
+
 class ImportOptions:
     def __init__(self):
         self.import_geometry = True
         self.import_animations = True
+        self.animation_filter = []
         self.import_walkmeshes = True
         self.build_materials = True
         self.build_armature = False
+        self.texture_search_paths = []
+        self.lightmap_search_paths = []
+        self.texture_mip_bias = 0
+        self.texture_max_resolution = 0
+        self.use_texture_cache = False
+        self.texture_cache_dir = ""
+        self.texture_cache_size = 0
+        self.use_model_cache = False
+        self.model_cache_dir = ""
+        self.model_cache_size = 0
 
 
 class ExportOptions:
@@ -128,3 +149,6 @@ class ExportOptions:
         self.export_animations = True
         self.export_walkmeshes = True
         self.compress_quaternions = False
+        self.incremental_export = False
+        self.batch_workers = 0
+        self.aabb_split_mode = AabbSplitMode.CENTER
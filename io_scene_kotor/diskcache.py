@@ -0,0 +1,77 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import hashlib
+import os
+
+# Shared by caches that keep entries on disk as files named after their key,
+# e.g. parsed models and decoded textures. An entry can span several files
+# with the same key and different extensions.
+
+
+def get_files_key(prefix, paths):
+    # Key changes whenever path, size, modification time or contents of any
+    # of the source files change
+    hasher = hashlib.sha1()
+    hasher.update(prefix.encode("utf-8"))
+    for path in paths:
+        stat = os.stat(path)
+        hasher.update(
+            "{}:{}:{}".format(
+                os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+            ).encode("utf-8")
+        )
+        with open(path, "rb") as f:
+            hasher.update(hashlib.sha1(f.read()).digest())
+    return hasher.hexdigest()
+
+
+def touch_entry(paths):
+    # Loading an entry updates modification time of its files, which
+    # eviction treats as the time of last use
+    for path in paths:
+        os.utime(path)
+
+
+def evict_entries(cache_dir, max_size, exts, keep_keys=()):
+    # Removes least recently used entries until the total size of the cache
+    # is within max_size. Entries in keep_keys count towards the total size,
+    # but are never removed.
+    if max_size <= 0:
+        return
+    entries = dict()
+    for name in os.listdir(cache_dir):
+        key, ext = os.path.splitext(name)
+        if ext not in exts:
+            continue
+        stat = os.stat(os.path.join(cache_dir, name))
+        mtime, size = entries.get(key, (0, 0))
+        entries[key] = (max(mtime, stat.st_mtime), size + stat.st_size)
+    total_size = sum(size for _, size in entries.values())
+    for mtime, size, key in sorted(
+        (mtime, size, key) for key, (mtime, size) in entries.items()
+    ):
+        if total_size <= max_size:
+            break
+        if key in keep_keys:
+            continue
+        for ext in exts:
+            path = os.path.join(cache_dir, key + ext)
+            if os.path.exists(path):
+                os.remove(path)
+        total_size -= size
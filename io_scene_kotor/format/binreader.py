@@ -16,7 +16,10 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
+import array
+import mmap
 import struct
+import sys
 
 
 class SeekOrigin:
@@ -25,70 +28,168 @@ class SeekOrigin:
     END = 2
 
 
+# Reads from a memory-mapped file or an in-memory buffer, decoding values in
+# place with precompiled structs.
 class BinaryReader:
-    def __init__(self, path, byteorder="little"):
-        self.file = open(path, "rb")
+    def __init__(self, source, byteorder="little"):
+        # Set before opening, so that close works if opening fails
+        self.file = None
+        self.data = None
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self.data = source if isinstance(source, bytes) else bytes(source)
+        else:
+            self.file = open(source, "rb")
+            try:
+                self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be memory-mapped
+                self.data = b""
         self.byteorder = byteorder
+        self.size = len(self.data)
+        self.position = 0
+
+        self.bo_literal = ">" if byteorder == "big" else "<"
+        self.int8_struct = struct.Struct(self.bo_literal + "b")
+        self.int16_struct = struct.Struct(self.bo_literal + "h")
+        self.int32_struct = struct.Struct(self.bo_literal + "i")
+        self.uint8_struct = struct.Struct(self.bo_literal + "B")
+        self.uint16_struct = struct.Struct(self.bo_literal + "H")
+        self.uint32_struct = struct.Struct(self.bo_literal + "I")
+        self.float_struct = struct.Struct(self.bo_literal + "f")
+        self.structs = dict()
 
     def __del__(self):
-        self.file.close()
+        self.close()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        if self.file:
+            self.file.close()
+            self.file = None
 
     def seek(self, offset, origin=SeekOrigin.BEGIN):
-        self.file.seek(offset, origin)
+        if origin == SeekOrigin.CURRENT:
+            offset += self.position
+        elif origin == SeekOrigin.END:
+            offset += self.size
+        self.position = offset
 
     def skip(self, offset):
-        self.file.seek(offset, SeekOrigin.CURRENT)
+        self.position += offset
 
     def tell(self):
-        return self.file.tell()
+        return self.position
 
     def read_int8(self):
-        return int.from_bytes(self.file.read(1), self.byteorder, signed=True)
+        [val] = self.int8_struct.unpack_from(self.data, self.position)
+        self.position += 1
+        return val
 
     def read_int16(self):
-        return int.from_bytes(self.file.read(2), self.byteorder, signed=True)
+        [val] = self.int16_struct.unpack_from(self.data, self.position)
+        self.position += 2
+        return val
 
     def read_int32(self):
-        return int.from_bytes(self.file.read(4), self.byteorder, signed=True)
+        [val] = self.int32_struct.unpack_from(self.data, self.position)
+        self.position += 4
+        return val
 
     def read_uint8(self):
-        return int.from_bytes(self.file.read(1), self.byteorder, signed=False)
+        [val] = self.uint8_struct.unpack_from(self.data, self.position)
+        self.position += 1
+        return val
 
     def read_uint16(self):
-        return int.from_bytes(self.file.read(2), self.byteorder, signed=False)
+        [val] = self.uint16_struct.unpack_from(self.data, self.position)
+        self.position += 2
+        return val
 
     def read_uint32(self):
-        return int.from_bytes(self.file.read(4), self.byteorder, signed=False)
+        [val] = self.uint32_struct.unpack_from(self.data, self.position)
+        self.position += 4
+        return val
 
     def read_float(self):
-        bo_literal = ">" if self.byteorder == "big" else "<"
-        [val] = struct.unpack(bo_literal + "f", self.file.read(4))
+        [val] = self.float_struct.unpack_from(self.data, self.position)
+        self.position += 4
         return val
 
+    def read_struct(self, fmt):
+        # Reads a fixed-layout record, e.g. a node header, as a single tuple
+        if fmt in self.structs:
+            st = self.structs[fmt]
+        else:
+            st = struct.Struct(self.bo_literal + fmt)
+            self.structs[fmt] = st
+        values = st.unpack_from(self.data, self.position)
+        self.position += st.size
+        return values
+
+    def read_records(self, fmt, count):
+        # Reads count consecutive fixed-layout records as a list of tuples
+        if fmt in self.structs:
+            st = self.structs[fmt]
+        else:
+            st = struct.Struct(self.bo_literal + fmt)
+            self.structs[fmt] = st
+        size = st.size * count
+        records = list(st.iter_unpack(self.read_bytes(size))) if size else []
+        if len(records) != count:
+            raise RuntimeError(
+                "Unexpected end of data reading {} records of '{}'".format(count, fmt)
+            )
+        return records
+
+    def read_array(self, typecode, count):
+        # Reads count consecutive values into an array.array of the given type
+        values = array.array(typecode)
+        size = values.itemsize * count
+        buffer = self.read_bytes(size)
+        if len(buffer) != size:
+            raise RuntimeError(
+                "Unexpected end of data reading {} values of '{}'".format(
+                    count, typecode
+                )
+            )
+        values.frombytes(buffer)
+        if self.byteorder != sys.byteorder:
+            values.byteswap()
+        return values
+
+    def read_int32_array(self, count):
+        return self.read_array("i", count)
+
+    def read_uint16_array(self, count):
+        return self.read_array("H", count)
+
+    def read_uint32_array(self, count):
+        return self.read_array("I", count)
+
+    def read_float_array(self, count):
+        return self.read_array("f", count)
+
     def read_string(self, len):
-        return self.file.read(len).decode("utf-8")
+        return self.read_bytes(len).decode("utf-8")
 
     def read_c_string(self):
-        str = ""
-        while True:
-            ch = self.file.read(1).decode("utf-8")
-            if ch == "\0":
-                break
-            str += ch
+        end = self.data.find(b"\0", self.position)
+        if end == -1:
+            end = self.size
+        str = self.data[self.position : end].decode("utf-8")
+        self.position = min(end + 1, self.size)
         return str
 
     def read_c_string_up_to(self, max_len):
-        str = ""
-        len = max_len
-        while len > 0:
-            ch = self.file.read(1).decode("utf-8")
-            len -= 1
-            if ch == "\0":
-                break
-            str += ch
-        if len > 0:
-            self.file.seek(len, 1)
-        return str
+        chunk = self.data[self.position : self.position + max_len]
+        end = chunk.find(b"\0")
+        if end != -1:
+            chunk = chunk[:end]
+        self.position += max_len
+        return chunk.decode("utf-8")
 
     def read_bytes(self, count):
-        return self.file.read(count)
+        bytes = self.data[self.position : self.position + count]
+        self.position += len(bytes)
+        return bytes
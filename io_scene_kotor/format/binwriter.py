@@ -16,47 +16,125 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
+import os
 import struct
 
 
+# Assembles output in memory and only touches the disk in save(), which writes
+# a temporary file next to the target and atomically renames it into place.
 class BinaryWriter:
-    def __init__(self, path, byteorder):
-        self.file = open(path, "wb")
+    def __init__(self, path, byteorder="little"):
+        self.path = path
         self.byteorder = byteorder
+        self.data = bytearray()
 
-    def __del__(self):
-        self.file.close()
+        self.bo_literal = ">" if byteorder == "big" else "<"
+        self.int8_struct = struct.Struct(self.bo_literal + "b")
+        self.int16_struct = struct.Struct(self.bo_literal + "h")
+        self.int32_struct = struct.Struct(self.bo_literal + "i")
+        self.uint8_struct = struct.Struct(self.bo_literal + "B")
+        self.uint16_struct = struct.Struct(self.bo_literal + "H")
+        self.uint32_struct = struct.Struct(self.bo_literal + "I")
+        self.float_struct = struct.Struct(self.bo_literal + "f")
+        self.structs = dict()
 
     def tell(self):
-        return self.tell()
+        return len(self.data)
+
+    def get_struct(self, fmt):
+        if fmt in self.structs:
+            return self.structs[fmt]
+        st = struct.Struct(self.bo_literal + fmt)
+        self.structs[fmt] = st
+        return st
 
     def write_int8(self, val):
-        self.file.write(val.to_bytes(1, byteorder=self.byteorder, signed=True))
+        self.data += self.int8_struct.pack(val)
 
     def write_int16(self, val):
-        self.file.write(val.to_bytes(2, byteorder=self.byteorder, signed=True))
+        self.data += self.int16_struct.pack(val)
 
     def write_int32(self, val):
-        self.file.write(val.to_bytes(4, byteorder=self.byteorder, signed=True))
+        self.data += self.int32_struct.pack(val)
 
     def write_uint8(self, val):
-        self.file.write(val.to_bytes(1, byteorder=self.byteorder, signed=False))
+        self.data += self.uint8_struct.pack(val)
 
     def write_uint16(self, val):
-        self.file.write(val.to_bytes(2, byteorder=self.byteorder, signed=False))
+        self.data += self.uint16_struct.pack(val)
 
     def write_uint32(self, val):
-        self.file.write(val.to_bytes(4, byteorder=self.byteorder, signed=False))
+        self.data += self.uint32_struct.pack(val)
 
     def write_float(self, val):
-        bo_literal = ">" if self.byteorder == "big" else "<"
-        self.file.write(struct.pack(bo_literal + "f", val))
+        self.data += self.float_struct.pack(val)
+
+    def write_struct(self, fmt, *values):
+        self.data += self.get_struct(fmt).pack(*values)
+
+    def write_records(self, fmt, records):
+        st = self.get_struct(fmt)
+        for record in records:
+            self.data += st.pack(*record)
+
+    def write_array(self, typecode, values):
+        self.data += struct.pack(
+            "{}{}{}".format(self.bo_literal, len(values), typecode), *values
+        )
+
+    def write_int32_array(self, values):
+        self.write_array("i", values)
+
+    def write_uint16_array(self, values):
+        self.write_array("H", values)
+
+    def write_uint32_array(self, values):
+        self.write_array("I", values)
+
+    def write_float_array(self, values):
+        self.write_array("f", values)
 
     def write_string(self, val):
-        self.file.write(val.encode("utf-8"))
+        self.data += val.encode("utf-8")
 
     def write_c_string(self, val):
-        self.file.write((val + "\0").encode("utf-8"))
+        self.data += (val + "\0").encode("utf-8")
 
     def write_bytes(self, bytes):
-        self.file.write(bytes)
+        self.data += bytes
+
+    def patch_uint32(self, offset, val):
+        self.uint32_struct.pack_into(self.data, offset, val)
+
+    def patch_struct(self, offset, fmt, *values):
+        self.get_struct(fmt).pack_into(self.data, offset, *values)
+
+    def write_temp_file(self):
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                file.write(self.data)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return temp_path
+
+    def save(self):
+        save_all([self])
+
+
+# Writes every writer to a temporary file first and only then renames them
+# into place, so that a failure never leaves a partially written set, such as
+# an MDL without its MDX, behind.
+def save_all(writers):
+    temp_paths = []
+    try:
+        for writer in writers:
+            temp_paths.append(writer.write_temp_file())
+    except BaseException:
+        for temp_path in temp_paths:
+            os.remove(temp_path)
+        raise
+    for writer, temp_path in zip(writers, temp_paths):
+        os.replace(temp_path, writer.path)
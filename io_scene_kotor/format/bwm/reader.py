@@ -60,11 +60,11 @@ class BwmReader:
 
         version = self.bwm.read_string(4)
         self.bwm_type = self.bwm.read_uint32()
-        self.rel_use_vec1 = [self.bwm.read_float() for _ in range(3)]
-        self.rel_use_vec2 = [self.bwm.read_float() for _ in range(3)]
-        abs_use_vec1 = [self.bwm.read_float() for _ in range(3)]
-        abs_use_vec2 = [self.bwm.read_float() for _ in range(3)]
-        self.position = [self.bwm.read_float() for _ in range(3)]
+        self.rel_use_vec1 = self.bwm.read_float_array(3).tolist()
+        self.rel_use_vec2 = self.bwm.read_float_array(3).tolist()
+        abs_use_vec1 = self.bwm.read_float_array(3).tolist()
+        abs_use_vec2 = self.bwm.read_float_array(3).tolist()
+        self.position = self.bwm.read_float_array(3).tolist()
         self.num_verts = self.bwm.read_uint32()
         self.off_verts = self.bwm.read_uint32()
         self.num_faces = self.bwm.read_uint32()
@@ -84,43 +84,35 @@ class BwmReader:
 
     def load_vertices(self):
         self.bwm.seek(self.off_verts)
-        for _ in range(self.num_verts):
-            vert = [self.bwm.read_float() - self.position[i] for i in range(3)]
-            self.verts.append(vert)
+        x, y, z = self.position
+        for vx, vy, vz in self.bwm.read_records("3f", self.num_verts):
+            self.verts.append([vx - x, vy - y, vz - z])
 
     def load_faces(self):
-        vert_indices = []
         self.bwm.seek(self.off_vert_indices)
-        for _ in range(self.num_faces):
-            vert_indices.append([self.bwm.read_uint32() for _ in range(3)])
+        vert_indices = self.bwm.read_records("3I", self.num_faces)
 
         self.bwm.seek(self.off_material_ids)
-        material_ids = [self.bwm.read_uint32() for _ in range(self.num_faces)]
+        material_ids = self.bwm.read_uint32_array(self.num_faces)
 
-        normals = []
         self.bwm.seek(self.off_normals)
-        for _ in range(self.num_faces):
-            normal = [self.bwm.read_float() for _ in range(3)]
-            normals.append(normal)
+        normals = self.bwm.read_records("3f", self.num_faces)
 
         self.bwm.seek(self.off_distances)
-        distances = [self.bwm.read_float() for _ in range(self.num_faces)]
+        distances = self.bwm.read_float_array(self.num_faces)
 
         for i in range(self.num_faces):
-            self.facelist.vertices.append(vert_indices[i])
+            self.facelist.vertices.append(list(vert_indices[i]))
             self.facelist.uv.append([0] * 3)
             self.facelist.materials.append(material_ids[i])
 
     def load_aabbs(self):
         aabbs = []
         self.bwm.seek(self.off_aabbs)
-        for _ in range(self.num_aabbs):
-            bounding_box = [self.bwm.read_float() for _ in range(6)]
-            face_idx = self.bwm.read_int32()
-            self.bwm.skip(4)  # unknown
-            most_significant_plane = self.bwm.read_uint32()
-            child_idx1 = self.bwm.read_uint32()
-            child_idx2 = self.bwm.read_uint32()
+        # bounding box, face index, unknown, plane, child indices
+        for record in self.bwm.read_records("6fi4xIII", self.num_aabbs):
+            bounding_box = list(record[:6])
+            face_idx, most_significant_plane, child_idx1, child_idx2 = record[6:]
             aabbs.append(
                 AABB(
                     bounding_box,
@@ -132,21 +124,16 @@ class BwmReader:
             )
 
     def load_adjacent_edges(self):
-        adj_edges = []
         self.bwm.seek(self.off_adj_edges)
-        for _ in range(self.num_adj_edges):
-            adj_edges.append([self.bwm.read_int32() for _ in range(3)])
+        adj_edges = self.bwm.read_records("3i", self.num_adj_edges)
 
     def load_outer_edges(self):
         self.bwm.seek(self.off_outer_edges)
-        for _ in range(self.num_outer_edges):
-            index = self.bwm.read_uint32()
-            transition = self.bwm.read_int32()
-            self.outer_edges.append((index, transition))
+        self.outer_edges.extend(self.bwm.read_records("Ii", self.num_outer_edges))
 
     def load_perimeters(self):
         self.bwm.seek(self.off_perimeters)
-        self.perimeters = [self.bwm.read_uint32() for _ in range(self.num_perimeters)]
+        self.perimeters = self.bwm.read_uint32_array(self.num_perimeters).tolist()
 
     def new_walkmesh(self):
         if self.bwm_type == BWM_TYPE_WOK:
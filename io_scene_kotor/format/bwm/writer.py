@@ -19,7 +19,8 @@
 from mathutils import Vector
 
 from ...aabb import generate_tree
-from ...constants import NON_WALKABLE, DummyType, WalkmeshType
+from ...adjacency import find_adjacent_edges
+from ...constants import NON_WALKABLE, AabbSplitMode, DummyType, WalkmeshType
 from ...scene.modelnode.aabb import AabbNode
 from ...scene.modelnode.dummy import DummyNode
 from ...scene.modelnode.trimesh import FaceList
@@ -41,10 +42,11 @@ class SimilarVertex:
 
 
 class BwmWriter:
-    def __init__(self, path, walkmesh):
+    def __init__(self, path, walkmesh, aabb_split_mode=AabbSplitMode.CENTER):
         self.path = path
         self.bwm = BinaryWriter(path, "little")
         self.walkmesh = walkmesh
+        self.aabb_split_mode = aabb_split_mode
 
         self.bwm_pos = 0
         self.bwm_size = 0
@@ -85,6 +87,8 @@ class BwmWriter:
         self.save_outer_edges()
         self.save_perimeters()
 
+        self.bwm.save()
+
     def peek_walkmesh(self):
         self.bwm_type = (
             BWM_TYPE_WOK
@@ -197,19 +201,7 @@ class BwmWriter:
         if self.bwm_type == BWM_TYPE_PWK_DWK:
             return
 
-        face_list = []
-        face_idx = 0
-
-        for face in self.facelist.vertices:
-            v0 = Vector(self.verts[face[0]])
-            v1 = Vector(self.verts[face[1]])
-            v2 = Vector(self.verts[face[2]])
-            centroid = (v0 + v1 + v2) / 3
-            face_list.append((face_idx, [v0, v1, v2], centroid))
-            face_idx += 1
-
-        aabbs = []
-        generate_tree(aabbs, face_list)
+        aabbs = generate_tree(self.verts, self.facelist.vertices, self.aabb_split_mode)
 
         for aabb_node in aabbs:
             child_idx1 = aabb_node[6]
@@ -240,37 +232,9 @@ class BwmWriter:
 
     def peek_edges(self):
         # Adjacent Edges
-        for _ in range(self.num_walkable_faces):
-            self.adjacent_edges.append([-1, -1, -1])
-        for face_idx in range(self.num_walkable_faces):
-            face = self.facelist.vertices[face_idx]
-            edges = [
-                tuple(sorted(edge))
-                for edge in [(face[0], face[1]), (face[1], face[2]), (face[2], face[0])]
-            ]
-            for other_face_idx in range(face_idx + 1, self.num_walkable_faces):
-                other_face = self.facelist.vertices[other_face_idx]
-                other_edges = [
-                    tuple(sorted(edge))
-                    for edge in [
-                        (other_face[0], other_face[1]),
-                        (other_face[1], other_face[2]),
-                        (other_face[2], other_face[0]),
-                    ]
-                ]
-                num_adj_edges = 0
-                for i in range(3):
-                    if self.adjacent_edges[face_idx][i] != -1:
-                        num_adj_edges += 1
-                        continue
-                    for j in range(3):
-                        if edges[i] == other_edges[j]:
-                            self.adjacent_edges[face_idx][i] = 3 * other_face_idx + j
-                            self.adjacent_edges[other_face_idx][j] = 3 * face_idx + i
-                            num_adj_edges += 1
-                            break
-                if num_adj_edges == 3:
-                    break
+        self.adjacent_edges = find_adjacent_edges(
+            self.facelist.vertices[: self.num_walkable_faces]
+        )
 
         # Outer Edges, Perimeters
         visited_edges = set()
@@ -369,24 +333,17 @@ class BwmWriter:
         self.bwm.write_uint32(off_perimeters)
 
     def save_vertices(self):
-        for vert in self.verts:
-            for val in vert:
-                self.bwm.write_float(val)
+        self.bwm.write_records("3f", self.verts)
 
     def save_faces(self):
         # Vertex Indices
-        for face in self.facelist.vertices:
-            for val in face:
-                self.bwm.write_uint32(val)
+        self.bwm.write_records("3I", self.facelist.vertices)
 
         # Material Ids
-        for mat_id in self.facelist.materials:
-            self.bwm.write_uint32(mat_id)
+        self.bwm.write_uint32_array(self.facelist.materials)
 
         # Normals
-        for normal in self.facelist.normals:
-            for val in normal:
-                self.bwm.write_float(val)
+        self.bwm.write_records("3f", self.facelist.normals)
 
         # Distances
         for face_idx, face in enumerate(self.facelist.vertices):
@@ -406,15 +363,10 @@ class BwmWriter:
             self.bwm.write_int32(aabb.child_idx2)
 
     def save_adjacent_edges(self):
-        for edges in self.adjacent_edges:
-            for val in edges:
-                self.bwm.write_int32(val)
+        self.bwm.write_records("3i", self.adjacent_edges)
 
     def save_outer_edges(self):
-        for edge_idx, transition in self.outer_edges:
-            self.bwm.write_uint32(edge_idx)
-            self.bwm.write_int32(transition)
+        self.bwm.write_records("Ii", self.outer_edges)
 
     def save_perimeters(self):
-        for perimeter in self.perimeters:
-            self.bwm.write_uint32(perimeter)
+        self.bwm.write_uint32_array(self.perimeters)
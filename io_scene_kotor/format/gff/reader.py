@@ -69,29 +69,20 @@ class GffReader:
     def load_structs(self):
         self.structs = []
         self.reader.seek(self.off_structs)
-        for _ in range(self.num_structs):
-            struct = GffStruct(
-                self.reader.read_uint32(),
-                self.reader.read_uint32(),
-                self.reader.read_uint32(),
-            )
-            self.structs.append(struct)
+        for record in self.reader.read_records("3I", self.num_structs):
+            self.structs.append(GffStruct(*record))
 
     def load_fields(self):
         self.fields = []
         self.reader.seek(self.off_fields)
-        for _ in range(self.num_fields):
-            field = GffField(
-                self.reader.read_uint32(),
-                self.reader.read_uint32(),
-                self.reader.read_uint32(),
-            )
-            self.fields.append(field)
+        for record in self.reader.read_records("3I", self.num_fields):
+            self.fields.append(GffField(*record))
 
     def load_labels(self):
         self.reader.seek(self.off_labels)
         self.labels = [
-            self.reader.read_string(16).rstrip("\0") for _ in range(self.num_labels)
+            label.decode("utf-8").rstrip("\0")
+            for [label] in self.reader.read_records("16s", self.num_labels)
         ]
 
     def load_field_data(self):
@@ -100,15 +91,15 @@ class GffReader:
 
     def load_field_indices(self):
         self.reader.seek(self.off_field_indices)
-        self.field_indices = [
-            self.reader.read_uint32() for _ in range(self.num_field_indices // 4)
-        ]
+        self.field_indices = self.reader.read_uint32_array(
+            self.num_field_indices // 4
+        ).tolist()
 
     def load_list_indices(self):
         self.reader.seek(self.off_list_indices)
-        self.list_indices = [
-            self.reader.read_uint32() for _ in range(self.num_list_indices // 4)
-        ]
+        self.list_indices = self.reader.read_uint32_array(
+            self.num_list_indices // 4
+        ).tolist()
 
     def new_tree_struct(self, structIdx):
         tree = dict()
@@ -67,21 +67,21 @@ class GffWriter:
         self.writer.write_uint32(num_list_indices)
 
         for struct in self.structs:
-            self.writer.write_uint32(struct.type)
-            self.writer.write_uint32(struct.data_or_data_offset)
-            self.writer.write_uint32(struct.num_fields)
+            self.writer.write_struct(
+                "3I", struct.type, struct.data_or_data_offset, struct.num_fields
+            )
         for field in self.fields:
-            self.writer.write_uint32(field.type)
-            self.writer.write_uint32(field.label_idx)
-            self.writer.write_uint32(field.data_or_data_offset)
+            self.writer.write_struct(
+                "3I", field.type, field.label_idx, field.data_or_data_offset
+            )
         for label in self.labels:
             self.writer.write_string(label.ljust(16, "\0"))
         if len(self.field_data) > 0:
             self.writer.write_bytes(bytearray(self.field_data))
-        for idx in self.field_indices:
-            self.writer.write_uint32(idx)
-        for idx in self.list_indices:
-            self.writer.write_uint32(idx)
+        self.writer.write_uint32_array(self.field_indices)
+        self.writer.write_uint32_array(self.list_indices)
+
+        self.writer.save()
 
     def decompose_tree(self):
         num_structs = 0
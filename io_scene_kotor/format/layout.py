@@ -0,0 +1,71 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+
+# Contiguous block of a binary file, written by its build function
+class Section:
+    def __init__(self, kind, key, offset, size, build):
+        self.kind = kind
+        self.key = key
+        self.offset = offset
+        self.size = size
+        self.build = build
+
+
+# Section table of a binary file. Sections are planned in file order before
+# anything is written, so that every offset is known up front, and are then
+# written in the same order, verifying that each one has its planned size.
+class Layout:
+    def __init__(self):
+        self.sections = []
+        self.offsets = dict()
+        self.size = 0
+
+    def add(self, kind, key=None, size=0, build=None):
+        offset = self.size
+        self.sections.append(Section(kind, key, offset, size, build))
+        self.offsets[(kind, key)] = offset
+        self.size += size
+        return offset
+
+    def offset(self, kind, key=None):
+        return self.offsets[(kind, key)]
+
+    def write(self, writer):
+        base = writer.tell()
+        for section in self.sections:
+            if not section.build:
+                continue
+            section.build()
+            actual_size = writer.tell() - base - section.offset
+            if actual_size != section.size:
+                raise RuntimeError(
+                    "Section size mismatch: kind={}, key={}, expected={}, "
+                    "actual={}".format(
+                        section.kind, section.key, section.size, actual_size
+                    )
+                )
+
+    def dump(self):
+        lines = []
+        for section in self.sections:
+            line = "{:08X} {:8d} {}".format(section.offset, section.size, section.kind)
+            if section.key is not None:
+                line += " {}".format(section.key)
+            lines.append(line)
+        return "\n".join(lines)
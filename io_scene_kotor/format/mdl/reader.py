@@ -18,7 +18,9 @@
 
 import os
 
-from math import sqrt
+from functools import partial
+
+import numpy as np
 
 from mathutils import Matrix, Quaternion, Vector
 
@@ -59,43 +61,175 @@ SABER_FACES = [
 ]
 
 
+NODE_CLASS_BY_TYPE = {
+    NodeType.DUMMY: DummyNode,
+    NodeType.REFERENCE: ReferenceNode,
+    NodeType.TRIMESH: TrimeshNode,
+    NodeType.DANGLYMESH: DanglymeshNode,
+    NodeType.LIGHTSABER: LightsaberNode,
+    NodeType.SKIN: SkinmeshNode,
+    NodeType.EMITTER: EmitterNode,
+    NodeType.LIGHT: LightNode,
+    NodeType.AABB: AabbNode,
+}
+
+
 class ArrayDefinition:
     def __init__(self, offset, count):
         self.offset = offset
         self.count = count
 
 
+class NodeTableEntry:
+    def __init__(self, offset, type_flags, name, parent_idx, export_order):
+        self.offset = offset
+        self.type_flags = type_flags
+        self.name = name
+        self.parent_idx = parent_idx
+        self.export_order = export_order
+
+
 class MdlReader:
     def __init__(self, path):
         self.path = path
         self.mdl = BinaryReader(path, "little")
+        self.mdx = None
 
-        base, _ = os.path.splitext(path)
+        self.tsl = False
+        self.xbox = False
+        self.node_table = []
+        self.node_names = []
+        self.node_by_number = dict()
+        self.skin_weights = []
+
+    def load(self):
+        base, _ = os.path.splitext(self.path)
         mdx_path = base + ".mdx"
         if not os.path.exists(mdx_path):
             raise RuntimeError("MDX file '{}' not found".format(mdx_path))
 
         self.mdx = BinaryReader(mdx_path, "little")
 
-        self.tsl = False
-        self.xbox = False
-        self.node_names = []
-        self.node_by_number = dict()
+        self.model = Model()
 
-    def load(self):
+        self.load_file_header()
+        self.load_geometry_header()
+        self.load_model_header()
+        self.load_names()
+        self.load_node_table()
+
+        nodes = []
+        for entry in self.node_table:
+            parent = nodes[entry.parent_idx] if entry.parent_idx != -1 else None
+            node = self.load_node(entry.offset, entry.export_order, parent)
+            if parent:
+                parent.children.append(node)
+            nodes.append(node)
+        self.model.root_node = nodes[0]
+
+        self.resolve_bone_weights()
+        self.load_animations()
+
+        return self.model
+
+    # Reads animations of a model whose nodes were loaded elsewhere, e.g. from
+    # the model cache. As in load, animation nodes are decoded on first use.
+    def load_animations_into(self, model):
         self.model = Model()
 
         self.load_file_header()
         self.load_geometry_header()
         self.load_model_header()
         self.load_names()
-        self.peek_nodes(self.off_root_node)
 
-        self.model.root_node = self.load_nodes(self.off_root_node, 0)
+        nodes = [model.root_node]
+        while nodes:
+            node = nodes.pop()
+            self.node_by_number[node.node_number] = node
+            nodes.extend(reversed(node.children))
 
         self.load_animations()
+        model.animations = self.model.animations
 
-        return self.model
+    # Reads only headers and the name table, skipping MDX, face and controller
+    # data, which is enough to take an inventory of a model
+    def probe(self):
+        self.model = Model()
+
+        self.load_file_header()
+        self.load_geometry_header()
+        self.load_model_header()
+        self.load_names()
+
+        info = MdlInfo()
+        info.name = self.model.name
+        info.classification = self.model.classification
+        info.subclassification = self.model.subclassification
+        info.supermodel = self.model.supermodel
+        info.tsl = self.tsl
+        info.xbox = self.xbox
+
+        self.load_node_table()
+        self.probe_nodes(info)
+        self.probe_animations(info)
+
+        return info
+
+    def probe_nodes(self, info):
+        for entry in self.node_table:
+            type_flags = entry.type_flags
+            parent = (
+                self.node_table[entry.parent_idx].name
+                if entry.parent_idx != -1
+                else None
+            )
+            node = MdlNodeInfo(entry.name, self.get_node_type(type_flags), parent)
+            info.nodes.append(node)
+
+            if entry.offset == self.off_anim_root:
+                info.animroot = entry.name
+
+            self.mdl.seek(MDL_OFFSET + entry.offset + 80)  # node header
+
+            if type_flags & NODE_REFERENCE:
+                node.refmodel = self.mdl.read_c_string_up_to(32)
+
+            if type_flags & NODE_MESH:
+                self.mdl.skip(8)  # function pointers
+                face_arr = self.get_array_def()
+                self.mdl.skip(68)  # bounding box through transparency hint
+                bitmap = self.mdl.read_c_string_up_to(32)
+                bitmap2 = self.mdl.read_c_string_up_to(32)
+                self.mdl.skip(152)  # bitmap3 through MDX offsets
+                num_verts = self.mdl.read_uint16()
+
+                if type_flags & NODE_SABER:
+                    node.num_verts = 16
+                    node.num_faces = len(SABER_FACES)
+                else:
+                    node.num_verts = num_verts
+                    node.num_faces = face_arr.count
+                if len(bitmap) > 0 and bitmap.lower() != "null":
+                    node.bitmap = bitmap
+                if len(bitmap2) > 0 and bitmap2.lower() != "null":
+                    node.bitmap2 = bitmap2
+
+    def probe_animations(self, info):
+        if self.animation_arr.count == 0:
+            return
+        self.mdl.seek(MDL_OFFSET + self.animation_arr.offset)
+        offsets = self.mdl.read_uint32_array(self.animation_arr.count)
+        for offset in offsets:
+            self.mdl.seek(MDL_OFFSET + offset)
+            self.mdl.skip(8)  # function pointers
+            name = self.mdl.read_c_string_up_to(32)
+            self.mdl.skip(40)  # root node, node count, runtime arrays, ...
+            length = self.mdl.read_float()
+            transition = self.mdl.read_float()
+            anim_root = self.mdl.read_c_string_up_to(32)
+            info.animations.append(
+                MdlAnimationInfo(name, length, transition, anim_root)
+            )
 
     def load_file_header(self):
         if self.mdl.read_uint32() != 0:
@@ -136,7 +270,7 @@ class MdlReader:
         num_child_models = self.mdl.read_uint32()
         self.animation_arr = self.get_array_def()
         supermodel_ref = self.mdl.read_uint32()
-        bounding_box = [self.mdl.read_float() for _ in range(6)]
+        bounding_box = self.mdl.read_float_array(6).tolist()
         radius = self.mdl.read_float()
         scale = self.mdl.read_float()
         supermodel_name = self.mdl.read_c_string_up_to(32)
@@ -166,27 +300,39 @@ class MdlReader:
     def load_names(self):
         self.names = []
         self.mdl.seek(MDL_OFFSET + self.name_arr.offset)
-        offsets = [self.mdl.read_uint32() for _ in range(self.name_arr.count)]
+        offsets = self.mdl.read_uint32_array(self.name_arr.count)
         for off in offsets:
             self.mdl.seek(MDL_OFFSET + off)
             self.names.append(self.mdl.read_c_string())
 
-    def peek_nodes(self, offset):
-        self.mdl.seek(MDL_OFFSET + offset)
-        self.mdl.skip(4)
-        name_index = self.mdl.read_uint16()
-        self.mdl.skip(38)
-        children_arr = self.get_array_def()
+    # Walks the node hierarchy once, without recursion, and records every node
+    # in depth-first order, which is also the order bonemaps refer to
+    def load_node_table(self):
+        self.node_table = []
+        stack = [(self.off_root_node, -1, 0)]
+        while stack:
+            offset, parent_idx, export_order = stack.pop()
+            self.mdl.seek(MDL_OFFSET + offset)
+            type_flags = self.mdl.read_uint16()
+            self.mdl.skip(2)  # node number
+            name_index = self.mdl.read_uint16()
+            self.mdl.skip(38)
+            children_arr = self.get_array_def()
+
+            node_idx = len(self.node_table)
+            name = self.names[name_index]
+            self.node_table.append(
+                NodeTableEntry(offset, type_flags, name, parent_idx, export_order)
+            )
 
-        name = self.names[name_index]
-        self.node_names.append(name)
+            self.mdl.seek(MDL_OFFSET + children_arr.offset)
+            child_offsets = self.mdl.read_uint32_array(children_arr.count)
+            for child_idx in reversed(range(len(child_offsets))):
+                stack.append((child_offsets[child_idx], node_idx, child_idx))
 
-        self.mdl.seek(MDL_OFFSET + children_arr.offset)
-        child_offsets = [self.mdl.read_uint32() for _ in range(children_arr.count)]
-        for off_child in child_offsets:
-            self.peek_nodes(off_child)
+        self.node_names = [entry.name for entry in self.node_table]
 
-    def load_nodes(self, offset, export_order, parent=None):
+    def load_node(self, offset, export_order, parent=None):
         self.mdl.seek(MDL_OFFSET + offset)
 
         type_flags = self.mdl.read_uint16()
@@ -195,9 +341,9 @@ class MdlReader:
         self.mdl.skip(2)  # padding
         off_root = self.mdl.read_uint32()
         off_parent = self.mdl.read_uint32()
-        position = [self.mdl.read_float() for _ in range(3)]
-        orientation = [self.mdl.read_float() for _ in range(4)]
-        children_arr = self.get_array_def()
+        position = self.mdl.read_float_array(3).tolist()
+        orientation = self.mdl.read_float_array(4).tolist()
+        self.mdl.skip(12)  # children
         controller_arr = self.get_array_def()
         controller_data_arr = self.get_array_def()
 
@@ -319,11 +465,11 @@ class MdlReader:
             fn_ptr1 = self.mdl.read_uint32()
             fn_ptr2 = self.mdl.read_uint32()
             face_arr = self.get_array_def()
-            bouding_box = [self.mdl.read_float() for _ in range(6)]
+            bouding_box = self.mdl.read_float_array(6).tolist()
             radius = self.mdl.read_float()
-            average = [self.mdl.read_float() for _ in range(3)]
-            diffuse = [self.mdl.read_float() for _ in range(3)]
-            ambient = [self.mdl.read_float() for _ in range(3)]
+            average = self.mdl.read_float_array(3).tolist()
+            diffuse = self.mdl.read_float_array(3).tolist()
+            ambient = self.mdl.read_float_array(3).tolist()
             transparency_hint = self.mdl.read_uint32()
             bitmap = self.mdl.read_c_string_up_to(32)
             bitmap2 = self.mdl.read_c_string_up_to(32)
@@ -413,7 +559,7 @@ class MdlReader:
             qbone_arr = self.get_array_def()
             tbone_arr = self.get_array_def()
             garbage_arr = self.get_array_def()
-            bone_indices = [self.mdl.read_uint16() for _ in range(16)]
+            bone_indices = self.mdl.read_uint16_array(16)
             self.mdl.skip(4)  # padding
 
         if type_flags & NODE_DANGLY:
@@ -442,33 +588,33 @@ class MdlReader:
             controllers = self.load_controllers(controller_arr, controller_data_arr)
             if type_flags & NODE_MESH:
                 node.alpha = (
-                    controllers[CTRL_MESH_ALPHA][0][1]
+                    float(controllers[CTRL_MESH_ALPHA].values[0, 0])
                     if CTRL_MESH_ALPHA in controllers
                     else 1.0
                 )
                 node.scale = (
-                    controllers[CTRL_MESH_SCALE][0][1]
+                    float(controllers[CTRL_MESH_SCALE].values[0, 0])
                     if CTRL_MESH_SCALE in controllers
                     else 1.0
                 )
                 node.selfillumcolor = (
-                    controllers[CTRL_MESH_SELFILLUMCOLOR][0][1:]
+                    controllers[CTRL_MESH_SELFILLUMCOLOR].values[0].tolist()
                     if CTRL_MESH_SELFILLUMCOLOR in controllers
                     else [0.0] * 3
                 )
             elif type_flags & NODE_LIGHT:
                 node.radius = (
-                    controllers[CTRL_LIGHT_RADIUS][0][1]
+                    float(controllers[CTRL_LIGHT_RADIUS].values[0, 0])
                     if CTRL_LIGHT_RADIUS in controllers
                     else 1.0
                 )
                 node.multiplier = (
-                    controllers[CTRL_LIGHT_MULTIPLIER][0][1]
+                    float(controllers[CTRL_LIGHT_MULTIPLIER].values[0, 0])
                     if CTRL_LIGHT_MULTIPLIER in controllers
                     else 1.0
                 )
                 node.color = (
-                    controllers[CTRL_LIGHT_COLOR][0][1:]
+                    controllers[CTRL_LIGHT_COLOR].values[0].tolist()
                     if CTRL_LIGHT_COLOR in controllers
                     else [1.0] * 3
                 )
@@ -477,30 +623,27 @@ class MdlReader:
                     if val not in controllers:
                         continue
                     if dim == 1:
-                        setattr(node, key, controllers[val][0][1])
+                        setattr(node, key, float(controllers[val].values[0, 0]))
                     else:
-                        setattr(node, key, controllers[val][0][1 : dim + 1])
+                        setattr(node, key, controllers[val].values[0, :dim].tolist())
 
         if type_flags & NODE_LIGHT:
             self.mdl.seek(MDL_OFFSET + flare_size_arr.offset)
-            node.flare_list.sizes = [
-                self.mdl.read_float() for _ in range(flare_size_arr.count)
-            ]
+            node.flare_list.sizes = self.mdl.read_float_array(
+                flare_size_arr.count
+            ).tolist()
 
             self.mdl.seek(MDL_OFFSET + flare_position_arr.offset)
-            node.flare_list.positions = [
-                self.mdl.read_float() for _ in range(flare_position_arr.count)
-            ]
+            node.flare_list.positions = self.mdl.read_float_array(
+                flare_position_arr.count
+            ).tolist()
 
             self.mdl.seek(MDL_OFFSET + flare_color_shift_arr.offset)
-            for _ in range(flare_color_shift_arr.count):
-                color_shift = [self.mdl.read_float() for _ in range(3)]
-                node.flare_list.colorshifts.append(color_shift)
+            for color_shift in self.mdl.read_records("3f", flare_color_shift_arr.count):
+                node.flare_list.colorshifts.append(list(color_shift))
 
             self.mdl.seek(MDL_OFFSET + flare_tex_name_arr.offset)
-            tex_name_offsets = [
-                self.mdl.read_uint32() for _ in range(flare_tex_name_arr.count)
-            ]
+            tex_name_offsets = self.mdl.read_uint32_array(flare_tex_name_arr.count)
             for tex_name_offset in tex_name_offsets:
                 self.mdl.seek(MDL_OFFSET + tex_name_offset)
                 node.flare_list.textures.append(self.mdl.read_c_string())
@@ -509,16 +652,13 @@ class MdlReader:
             if num_bonemap > 0:
                 self.mdl.seek(MDL_OFFSET + off_bonemap)
                 if self.xbox:
-                    bonemap = [self.mdl.read_uint16() for _ in range(num_bonemap)]
+                    bonemap = self.mdl.read_uint16_array(num_bonemap).tolist()
                 else:
-                    bonemap = [int(self.mdl.read_float()) for _ in range(num_bonemap)]
+                    bonemap = [
+                        int(val) for val in self.mdl.read_float_array(num_bonemap)
+                    ]
             else:
                 bonemap = []
-            node_by_bone = dict()
-            for node_idx, bone_idx in enumerate(bonemap):
-                if bone_idx == -1:
-                    continue
-                node_by_bone[bone_idx] = node_idx
 
         if type_flags & NODE_MESH:
             node.facelist = FaceList()
@@ -529,14 +669,11 @@ class MdlReader:
                     node.facelist.materials.append(0)
             elif face_arr.count > 0:
                 self.mdl.seek(MDL_OFFSET + face_arr.offset)
-                for _ in range(face_arr.count):
-                    normal = [self.mdl.read_float() for _ in range(3)]
-                    plane_distance = self.mdl.read_float()
-                    material_id = self.mdl.read_uint32()
-                    adjacent_faces = [self.mdl.read_uint16() for _ in range(3)]
-                    vert_indices = [self.mdl.read_uint16() for _ in range(3)]
-                    node.facelist.vertices.append(tuple(vert_indices))
-                    node.facelist.uv.append(tuple(vert_indices))
+                for face in self.mdl.read_records("4fI6H", face_arr.count):
+                    material_id = face[4]
+                    vert_indices = face[8:11]
+                    node.facelist.vertices.append(vert_indices)
+                    node.facelist.uv.append(vert_indices)
                     node.facelist.materials.append(material_id)
                 if index_count_arr.count > 0:
                     self.mdl.seek(MDL_OFFSET + index_count_arr.offset)
@@ -548,110 +685,144 @@ class MdlReader:
             node.verts = []
             node.uv1 = []
             node.uv2 = []
-            node.weights = []
 
             if type_flags & NODE_SABER:
-                saber_verts = []
                 self.mdl.seek(MDL_OFFSET + off_saber_verts)
-                for i in range(NUM_SABER_VERTS):
-                    saber_verts.append([self.mdl.read_float() for _ in range(3)])
-                saber_tverts = []
+                saber_verts = self.mdl.read_records("3f", NUM_SABER_VERTS)
                 self.mdl.seek(MDL_OFFSET + off_saber_uv)
-                for i in range(NUM_SABER_VERTS):
-                    saber_tverts.append([self.mdl.read_float() for _ in range(2)])
-                saber_normals = []
+                saber_tverts = self.mdl.read_records("2f", NUM_SABER_VERTS)
                 self.mdl.seek(MDL_OFFSET + off_saber_normals)
-                for i in range(NUM_SABER_VERTS):
-                    saber_normals.append([self.mdl.read_float() for _ in range(3)])
+                saber_normals = self.mdl.read_records("3f", NUM_SABER_VERTS)
 
                 for i in range(8):
-                    node.verts.append(saber_verts[i])
-                    node.normals.append(saber_normals[i])
-                    node.uv1.append(saber_tverts[i])
+                    node.verts.append(list(saber_verts[i]))
+                    node.normals.append(list(saber_normals[i]))
+                    node.uv1.append(list(saber_tverts[i]))
                 for i in range(88, 96):
-                    node.verts.append(saber_verts[i])
-                    node.normals.append(saber_normals[i])
-                    node.uv1.append(saber_tverts[i])
+                    node.verts.append(list(saber_verts[i]))
+                    node.normals.append(list(saber_normals[i]))
+                    node.uv1.append(list(saber_tverts[i]))
 
             elif mdx_data_size > 0:
-                for i in range(num_verts):
-                    self.mdx.seek(mdx_offset + i * mdx_data_size + off_mdx_verts)
-                    node.verts.append(tuple([self.mdx.read_float() for _ in range(3)]))
-                    if mdx_data_bitmap & MDX_FLAG_NORMAL:
-                        self.mdx.seek(mdx_offset + i * mdx_data_size + off_mdx_normals)
-                        if self.xbox:
-                            comp = self.mdx.read_uint32()
-                            node.normals.append(self.decompress_vector_xbox(comp))
-                        else:
-                            node.normals.append(
-                                tuple([self.mdx.read_float() for _ in range(3)])
-                            )
-                    if mdx_data_bitmap & MDX_FLAG_UV1:
-                        self.mdx.seek(mdx_offset + i * mdx_data_size + off_mdx_uv1)
-                        node.uv1.append(
-                            tuple([self.mdx.read_float() for _ in range(2)])
-                        )
-                    if mdx_data_bitmap & MDX_FLAG_UV2:
-                        self.mdx.seek(mdx_offset + i * mdx_data_size + off_mdx_uv2)
-                        node.uv2.append(
-                            tuple([self.mdx.read_float() for _ in range(2)])
+                # Decode the interleaved vertex block of this node in one go
+                fields = [("position", ("<f4", 3), off_mdx_verts)]
+                if mdx_data_bitmap & MDX_FLAG_NORMAL:
+                    if self.xbox:
+                        fields.append(("normal", "<u4", off_mdx_normals))
+                    else:
+                        fields.append(("normal", ("<f4", 3), off_mdx_normals))
+                if mdx_data_bitmap & MDX_FLAG_UV1:
+                    fields.append(("uv1", ("<f4", 2), off_mdx_uv1))
+                if mdx_data_bitmap & MDX_FLAG_UV2:
+                    fields.append(("uv2", ("<f4", 2), off_mdx_uv2))
+                if type_flags & NODE_SKIN:
+                    fields.append(("bone_weights", ("<f4", 4), off_mdx_bone_weights))
+                    if self.xbox:
+                        fields.append(
+                            ("bone_indices", ("<u2", 4), off_mdx_bone_indices)
                         )
-                    if type_flags & NODE_SKIN:
-                        self.mdx.seek(
-                            mdx_offset + i * mdx_data_size + off_mdx_bone_weights
+                    else:
+                        fields.append(
+                            ("bone_indices", ("<f4", 4), off_mdx_bone_indices)
                         )
-                        bone_weights = [self.mdx.read_float() for _ in range(4)]
-                        self.mdx.seek(
-                            mdx_offset + i * mdx_data_size + off_mdx_bone_indices
+                vertex_dtype = np.dtype(
+                    {
+                        "names": [field[0] for field in fields],
+                        "formats": [field[1] for field in fields],
+                        "offsets": [field[2] for field in fields],
+                        "itemsize": mdx_data_size,
+                    }
+                )
+                self.mdx.seek(mdx_offset)
+                vertices = np.frombuffer(
+                    self.mdx.read_bytes(num_verts * mdx_data_size),
+                    dtype=vertex_dtype,
+                    count=num_verts,
+                )
+
+                node.verts.extend(map(tuple, vertices["position"].tolist()))
+                if mdx_data_bitmap & MDX_FLAG_NORMAL:
+                    if self.xbox:
+                        normals = self.decompress_vectors_xbox(vertices["normal"])
+                    else:
+                        normals = vertices["normal"]
+                    node.normals.extend(map(tuple, normals.tolist()))
+                if mdx_data_bitmap & MDX_FLAG_UV1:
+                    node.uv1.extend(map(tuple, vertices["uv1"].tolist()))
+                if mdx_data_bitmap & MDX_FLAG_UV2:
+                    node.uv2.extend(map(tuple, vertices["uv2"].tolist()))
+                if type_flags & NODE_SKIN:
+                    self.skin_weights.append(
+                        (
+                            node,
+                            bonemap,
+                            vertices["bone_weights"].astype(np.float32),
+                            vertices["bone_indices"].astype(np.int32),
                         )
-                        if self.xbox:
-                            bone_indices = [self.mdx.read_uint16() for _ in range(4)]
-                        else:
-                            bone_indices = [
-                                int(self.mdx.read_float()) for _ in range(4)
-                            ]
-                        vert_weights = []
-                        for i in range(4):
-                            bone_idx = bone_indices[i]
-                            if bone_idx == -1:
-                                continue
-                            node_idx = node_by_bone[bone_idx]
-                            node_name = self.node_names[node_idx]
-                            vert_weights.append([node_name, bone_weights[i]])
-                        node.weights.append(vert_weights)
+                    )
 
         if type_flags & NODE_DANGLY:
             self.mdl.seek(MDL_OFFSET + constraint_arr.offset)
-            node.constraints = [
-                self.mdl.read_float() for _ in range(constraint_arr.count)
-            ]
-
-        self.mdl.seek(MDL_OFFSET + children_arr.offset)
-        child_offsets = [self.mdl.read_uint32() for _ in range(children_arr.count)]
-        for child_idx, off_child in enumerate(child_offsets):
-            child = self.load_nodes(off_child, child_idx, node)
-            node.children.append(child)
+            node.constraints = self.mdl.read_float_array(constraint_arr.count).tolist()
 
         return node
 
-    def load_aabb(self, offset):
-        self.mdl.seek(MDL_OFFSET + offset)
-        bounding_box = [self.mdl.read_float() for _ in range(6)]
-        off_child1 = self.mdl.read_uint32()
-        off_child2 = self.mdl.read_uint32()
-        face_idx = self.mdl.read_int32()
-        most_significant_plane = self.mdl.read_uint32()
+    # Bonemaps index into the node table, so skin weights are turned into bone
+    # names once all nodes are loaded
+    def resolve_bone_weights(self):
+        for node, bonemap, bone_weights, bone_indices in self.skin_weights:
+            node_by_bone = dict()
+            for node_idx, bone_idx in enumerate(bonemap):
+                if bone_idx == -1:
+                    continue
+                node_by_bone[bone_idx] = node_idx
+
+            # Move unused bones to the end of every vertex, then renumber bones
+            # in order of first use, merging bones of the same node
+            order = np.argsort(bone_indices == -1, axis=1, kind="stable")
+            bone_indices = np.take_along_axis(bone_indices, order, axis=1)
+            bone_weights = np.take_along_axis(bone_weights, order, axis=1)
+            used = bone_indices != -1
+            bone_weights[~used] = 0.0
+            used_bones, first_use, inverse = np.unique(
+                bone_indices[used], return_index=True, return_inverse=True
+            )
+            bone_names = []
+            name_indices = dict()
+            bone_to_name = np.zeros(len(used_bones), dtype=np.int32)
+            for i in np.argsort(first_use, kind="stable").tolist():
+                name = self.node_names[node_by_bone[int(used_bones[i])]]
+                if name not in name_indices:
+                    name_indices[name] = len(bone_names)
+                    bone_names.append(name)
+                bone_to_name[i] = name_indices[name]
+            node.bone_names = bone_names
+            node.bone_indices = np.full(bone_indices.shape, -1, dtype=np.int32)
+            node.bone_indices[used] = bone_to_name[inverse.reshape(-1)]
+            node.bone_weights = bone_weights
+
+        self.skin_weights = []
 
-        if off_child1 > 0:
-            self.load_aabb(off_child1)
-        if off_child2 > 0:
-            self.load_aabb(off_child2)
+    def load_aabb(self, offset):
+        offsets = [offset]
+        while offsets:
+            self.mdl.seek(MDL_OFFSET + offsets.pop())
+            bounding_box = self.mdl.read_float_array(6).tolist()
+            off_child1 = self.mdl.read_uint32()
+            off_child2 = self.mdl.read_uint32()
+            face_idx = self.mdl.read_int32()
+            most_significant_plane = self.mdl.read_uint32()
+
+            if off_child2 > 0:
+                offsets.append(off_child2)
+            if off_child1 > 0:
+                offsets.append(off_child1)
 
     def load_animations(self):
         if self.animation_arr.count == 0:
             return
         self.mdl.seek(MDL_OFFSET + self.animation_arr.offset)
-        offsets = [self.mdl.read_uint32() for _ in range(self.animation_arr.count)]
+        offsets = self.mdl.read_uint32_array(self.animation_arr.count)
         for offset in offsets:
             self.load_animation(offset)
 
@@ -686,10 +857,24 @@ class MdlReader:
                 event_name = self.mdl.read_c_string_up_to(32)
                 anim.events.append((time, event_name))
 
-        anim.root_node = self.load_anim_nodes(off_root_node, anim)
+        anim.root_node_loader = partial(self.load_anim_nodes, off_root_node, anim)
         self.model.animations.append(anim)
 
-    def load_anim_nodes(self, offset, anim, parent=None):
+    def load_anim_nodes(self, offset, anim):
+        root_node = None
+        stack = [(offset, None)]
+        while stack:
+            offset, parent = stack.pop()
+            node, child_offsets = self.load_anim_node(offset, anim, parent)
+            if parent:
+                parent.children.append(node)
+            else:
+                root_node = node
+            for off_child in reversed(child_offsets):
+                stack.append((off_child, node))
+        return root_node
+
+    def load_anim_node(self, offset, anim, parent):
         self.mdl.seek(MDL_OFFSET + offset)
 
         type_flags = self.mdl.read_uint16()
@@ -698,8 +883,8 @@ class MdlReader:
         self.mdl.skip(2)  # padding
         off_root = self.mdl.read_uint32()
         off_parent = self.mdl.read_uint32()
-        position = [self.mdl.read_float() for _ in range(3)]
-        orientation = [self.mdl.read_float() for _ in range(4)]
+        position = self.mdl.read_float_array(3).tolist()
+        orientation = self.mdl.read_float_array(4).tolist()
         children_arr = self.get_array_def()
         controller_arr = self.get_array_def()
         controller_data_arr = self.get_array_def()
@@ -715,102 +900,81 @@ class MdlReader:
                 supernode = self.node_by_number[node_number]
                 controllers = self.load_controllers(controller_arr, controller_data_arr)
                 if CTRL_BASE_POSITION in controllers:
-                    node.keyframes["position"] = [
-                        row for row in controllers[CTRL_BASE_POSITION]
-                    ]
+                    node.keyframes["position"] = controllers[
+                        CTRL_BASE_POSITION
+                    ].to_rows()
                 if CTRL_BASE_ORIENTATION in controllers:
-                    orientations = [
-                        self.orientation_controller_to_quaternion(row[1:])
-                        for row in controllers[CTRL_BASE_ORIENTATION]
-                    ]
-                    node.keyframes["orientation"] = [
-                        [row[0]] + orientations[i]
-                        for i, row in enumerate(controllers[CTRL_BASE_ORIENTATION])
-                    ]
+                    orientation = controllers[CTRL_BASE_ORIENTATION]
+                    node.keyframes["orientation"] = Controller(
+                        orientation.times,
+                        self.orientation_controller_to_quaternions(orientation.values),
+                    ).to_rows()
                 if isinstance(supernode, TrimeshNode):
                     if CTRL_MESH_ALPHA in controllers:
-                        node.keyframes["alpha"] = [
-                            row for row in controllers[CTRL_MESH_ALPHA]
-                        ]
+                        node.keyframes["alpha"] = controllers[CTRL_MESH_ALPHA].to_rows()
                     if CTRL_MESH_SCALE in controllers:
-                        node.keyframes["scale"] = [
-                            row for row in controllers[CTRL_MESH_SCALE]
-                        ]
+                        node.keyframes["scale"] = controllers[CTRL_MESH_SCALE].to_rows()
                     if CTRL_MESH_SELFILLUMCOLOR in controllers:
-                        node.keyframes["selfillumcolor"] = [
-                            row for row in controllers[CTRL_MESH_SELFILLUMCOLOR]
-                        ]
+                        node.keyframes["selfillumcolor"] = controllers[
+                            CTRL_MESH_SELFILLUMCOLOR
+                        ].to_rows()
                 if isinstance(supernode, LightNode):
                     if CTRL_LIGHT_RADIUS in controllers:
-                        node.keyframes["radius"] = [
-                            row for row in controllers[CTRL_LIGHT_RADIUS]
-                        ]
+                        node.keyframes["radius"] = controllers[
+                            CTRL_LIGHT_RADIUS
+                        ].to_rows()
                     if CTRL_LIGHT_MULTIPLIER in controllers:
-                        node.keyframes["multiplier"] = [
-                            row for row in controllers[CTRL_LIGHT_MULTIPLIER]
-                        ]
+                        node.keyframes["multiplier"] = controllers[
+                            CTRL_LIGHT_MULTIPLIER
+                        ].to_rows()
                     if CTRL_LIGHT_COLOR in controllers:
-                        node.keyframes["color"] = [
-                            row for row in controllers[CTRL_LIGHT_COLOR]
-                        ]
+                        node.keyframes["color"] = controllers[
+                            CTRL_LIGHT_COLOR
+                        ].to_rows()
                 if isinstance(supernode, EmitterNode):
                     for key in EMITTER_CONTROLLER_KEYS:
                         if not key[0] in controllers:
                             continue
-                        node.keyframes[key[1]] = [row for row in controllers[key[0]]]
+                        node.keyframes[key[1]] = controllers[key[0]].to_rows()
             else:
                 logger().warning(f"Model node not found for animation node [{name}]")
 
         self.mdl.seek(MDL_OFFSET + children_arr.offset)
-        child_offsets = [self.mdl.read_uint32() for _ in range(children_arr.count)]
-        for off_child in child_offsets:
-            child = self.load_anim_nodes(off_child, anim, node)
-            node.children.append(child)
+        child_offsets = self.mdl.read_uint32_array(children_arr.count)
 
-        return node
+        return node, child_offsets
 
     def load_controllers(self, controller_arr, controller_data_arr):
         self.mdl.seek(MDL_OFFSET + controller_arr.offset)
-        keys = []
-        for _ in range(controller_arr.count):
-            ctrl_type = self.mdl.read_uint32()
-            self.mdl.skip(2)  # unknown
-            num_rows = self.mdl.read_uint16()
-            timekeys_start = self.mdl.read_uint16()
-            values_start = self.mdl.read_uint16()
-            num_columns = self.mdl.read_uint8()
-            self.mdl.skip(3)  # padding
-            keys.append(
-                ControllerKey(
-                    ctrl_type, num_rows, timekeys_start, values_start, num_columns
-                )
-            )
+        # type, unknown, rows, timekeys start, values start, columns, padding
+        keys = [
+            ControllerKey(*record)
+            for record in self.mdl.read_records("I2xHHHB3x", controller_arr.count)
+        ]
+        # Timekeys and values of all controllers share one float array
+        self.mdl.seek(MDL_OFFSET + controller_data_arr.offset)
+        data = np.frombuffer(
+            self.mdl.read_bytes(4 * controller_data_arr.count), dtype="<f4"
+        )
         controllers = dict()
         for key in keys:
-            self.mdl.seek(
-                MDL_OFFSET + controller_data_arr.offset + 4 * key.timekeys_start
-            )
-            timekeys = [self.mdl.read_float() for _ in range(key.num_rows)]
-            self.mdl.seek(
-                MDL_OFFSET + controller_data_arr.offset + 4 * key.values_start
-            )
+            times = data[key.timekeys_start : key.timekeys_start + key.num_rows]
             if key.ctrl_type == CTRL_BASE_ORIENTATION and key.num_columns == 2:
-                integral = True
+                # Compressed quaternions are stored as one packed uint32 per row
                 num_columns = 1
+                dtype = "<u4"
             else:
-                integral = False
                 num_columns = key.num_columns & 0xF
                 bezier = key.num_columns & CTRL_FLAG_BEZIER
                 if bezier:
+                    # Each row holds a triplet of value and two control points
                     num_columns *= 3
-            values = [
-                self.mdl.read_uint32() if integral else self.mdl.read_float()
-                for _ in range(num_columns * key.num_rows)
-            ]
-            controllers[key.ctrl_type] = [
-                [timekeys[i]] + values[i * num_columns : i * num_columns + num_columns]
-                for i in range(key.num_rows)
-            ]
+                dtype = "<f4"
+            values_stop = key.values_start + num_columns * key.num_rows
+            values = data[key.values_start : values_stop].view(dtype)
+            controllers[key.ctrl_type] = Controller(
+                times, values.reshape(key.num_rows, num_columns)
+            )
         return controllers
 
     def get_node_type(self, flags):
@@ -833,37 +997,23 @@ class MdlReader:
         return NodeType.DUMMY
 
     def new_node(self, name, node_type):
-        switch = {
-            NodeType.DUMMY: DummyNode,
-            NodeType.REFERENCE: ReferenceNode,
-            NodeType.TRIMESH: TrimeshNode,
-            NodeType.DANGLYMESH: DanglymeshNode,
-            NodeType.LIGHTSABER: LightsaberNode,
-            NodeType.SKIN: SkinmeshNode,
-            NodeType.EMITTER: EmitterNode,
-            NodeType.LIGHT: LightNode,
-            NodeType.AABB: AabbNode,
-        }
         try:
-            return switch[node_type](name)
+            return NODE_CLASS_BY_TYPE[node_type](name)
         except KeyError:
             raise RuntimeError("Invalid node type")
 
-    def orientation_controller_to_quaternion(self, values):
-        num_columns = len(values)
+    def orientation_controller_to_quaternions(self, values):
+        num_columns = values.shape[1]
         if num_columns == 4:
             return values
         elif num_columns == 1:
-            comp = values[0]
+            comp = values[:, 0].astype(np.int64)
             x = ((comp & 0x7FF) / 1023.0) - 1.0
             y = (((comp >> 11) & 0x7FF) / 1023.0) - 1.0
             z = ((comp >> 22) / 511.0) - 1.0
             mag2 = x * x + y * y + z * z
-            if mag2 < 1.0:
-                w = sqrt(1.0 - mag2)
-            else:
-                w = 0.0
-            return [x, y, z, w]
+            w = np.sqrt(np.maximum(1.0 - mag2, 0.0))
+            return np.stack((x, y, z, w), axis=-1)
         else:
             raise RuntimeError(
                 "Unsupported number of orientation columns: " + str(num_columns)
@@ -880,23 +1030,12 @@ class MdlReader:
 
         return ArrayDefinition(offset, count1)
 
-    def decompress_vector_xbox(self, comp):
-        tmp = comp & 0x7FF
-        if tmp < 1024:
-            x = tmp / 1023.0
-        else:
-            x = (tmp - 2047) / 1023.0
-
-        tmp = (comp >> 11) & 0x7FF
-        if tmp < 1024:
-            y = tmp / 1023.0
-        else:
-            y = (tmp - 2047) / 1023.0
-
-        tmp = comp >> 22
-        if tmp < 512:
-            z = tmp / 511.0
-        else:
-            z = (tmp - 1023) / 511.0
-
-        return (x, y, z)
+    def decompress_vectors_xbox(self, comp):
+        comp = comp.astype(np.int64)
+        x = comp & 0x7FF
+        x = np.where(x < 1024, x, x - 2047) / 1023.0
+        y = (comp >> 11) & 0x7FF
+        y = np.where(y < 1024, y, y - 2047) / 1023.0
+        z = comp >> 22
+        z = np.where(z < 512, z, z - 1023) / 511.0
+        return np.stack((x, y, z), axis=-1)
@@ -16,7 +16,7 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
-from ...constants import Classification
+from ...constants import Classification, NULL
 
 # BEGIN Function Pointers
 
@@ -254,3 +254,51 @@ class ControllerKey:
         self.timekeys_start = timekeys_start
         self.values_start = values_start
         self.num_columns = num_columns
+
+
+# Decoded controller, with one row of values per timekey
+class Controller:
+    def __init__(self, times, values):
+        self.times = times
+        self.values = values
+
+    def to_rows(self):
+        # Keyframe rows of [time] + values, as used by the scene layer
+        return [
+            [time] + values
+            for time, values in zip(self.times.tolist(), self.values.tolist())
+        ]
+
+
+class MdlNodeInfo:
+    def __init__(self, name, node_type, parent=None):
+        self.name = name
+        self.node_type = node_type
+        self.parent = parent
+        self.num_verts = 0
+        self.num_faces = 0
+        self.bitmap = NULL
+        self.bitmap2 = NULL
+        self.refmodel = NULL
+
+
+class MdlAnimationInfo:
+    def __init__(self, name, length, transtime, animroot):
+        self.name = name
+        self.length = length
+        self.transtime = transtime
+        self.animroot = animroot
+
+
+# Summary of a model, as returned by MdlReader.probe
+class MdlInfo:
+    def __init__(self):
+        self.name = "UNNAMED"
+        self.classification = Classification.OTHER
+        self.subclassification = 0
+        self.supermodel = NULL
+        self.animroot = NULL
+        self.tsl = False
+        self.xbox = False
+        self.nodes = []
+        self.animations = []
@@ -16,20 +16,60 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
+import logging
 import math
 import os
 
+from functools import partial
+
+import numpy as np
+
 from mathutils import Vector
 
-from ...constants import NodeType
-from ...utils import is_not_null
+from ...constants import AabbSplitMode, NodeType
+from ...utils import is_not_null, logger
 from ...aabb import generate_tree
-from ..binwriter import BinaryWriter
+from ...adjacency import find_adjacent_edges
+from ..binwriter import BinaryWriter, save_all
+from ..layout import Layout
 from .types import *
 
+SABER_VERT_INDICES = (
+    list(range(8)) + list(range(4)) * 20 + list(range(8, 16)) + list(range(8, 12)) * 20
+)
+
+# Most significant plane by AABB split axis, from -3 to 3
+AABB_PLANES = np.array(
+    [
+        AABB_NEGATIVE_Z,
+        AABB_NEGATIVE_Y,
+        AABB_NEGATIVE_X,
+        AABB_NO_CHILDREN,
+        AABB_POSITIVE_X,
+        AABB_POSITIVE_Y,
+        AABB_POSITIVE_Z,
+    ]
+)
+
+MDX_FIELD_FLAGS = [
+    ("position", MDX_FLAG_VERTEX),
+    ("normal", MDX_FLAG_NORMAL),
+    ("uv1", MDX_FLAG_UV1),
+    ("uv2", MDX_FLAG_UV2),
+    ("tangent_space", MDX_FLAG_TANGENT1),
+]
+
 
 class MdlWriter:
-    def __init__(self, path, model, tsl, xbox, compress_quaternions=False):
+    def __init__(
+        self,
+        path,
+        model,
+        tsl,
+        xbox,
+        compress_quaternions=False,
+        aabb_split_mode=AabbSplitMode.CENTER,
+    ):
         self.path = path
         self.mdl = BinaryWriter(path, "little")
 
@@ -41,102 +81,40 @@ class MdlWriter:
         self.tsl = tsl
         self.xbox = xbox
         self.compress_quaternions = compress_quaternions
+        self.aabb_split_mode = aabb_split_mode
 
-        # Model
-        self.mdl_pos = 0
-        self.mdx_pos = 0
-        self.mdl_size = 0
-        self.mdx_size = 0
-        self.off_name_offsets = 0
-        self.off_anim_offsets = 0
+        # Sections of MDL data, following the file header, and of MDX data
+        self.mdl_layout = Layout()
+        self.mdx_layout = Layout()
 
         # Nodes
         self.nodes = []
         self.node_names = []
-        self.name_offsets = []
-        self.node_offsets = []
-        self.children_offsets = []
         self.parent_indices = []
         self.child_indices = []
         self.node_idx_by_name = dict()
         self.node_idx_by_number = dict()
 
-        # Lights
-        self.flare_sizes_offsets = dict()
-        self.flare_positions_offsets = dict()
-        self.flare_colorshifts_offsets = dict()
-        self.flare_texture_offset_offsets = dict()
-        self.flare_textures_offsets = dict()
-
-        # Meshes
-        self.mesh_bounding_boxes = dict()
-        self.mesh_averages = dict()
-        self.mesh_radii = dict()
-        self.mesh_total_areas = dict()
-        self.verts_offsets = dict()
-        self.faces_offsets = dict()
-        self.index_count_offsets = dict()
-        self.index_offset_offsets = dict()
-        self.inv_count_offsets = dict()
-        self.indices_offsets = dict()
-        self.mdx_offsets = dict()
-
-        # Skinmeshes
-        self.bonemap_offsets = dict()
-        self.qbone_offsets = dict()
-        self.tbone_offsets = dict()
-        self.skin_garbage_offsets = dict()
-
-        # Danglymeshes
-        self.constraints_offsets = dict()
-        self.dangly_verts_offsets = dict()
-
-        # AABB
-        self.aabbs = dict()
-        self.aabb_offsets = dict()
-
-        # Sabers
-        self.saber_verts_offsets = dict()
-        self.saber_uv_offsets = dict()
-        self.saber_normals_offsets = dict()
-
-        # Controllers
-        self.controller_keys = []
-        self.controller_data = []
-        self.controller_offsets = []
-        self.controller_counts = []
-        self.controller_data_offsets = []
-        self.controller_data_counts = []
-
         # Animations
-        self.anim_offsets = []
-        self.anim_events_offsets = []
         self.anim_nodes = []
-        self.anim_node_offsets = []
-        self.anim_children_offsets = []
         self.anim_parent_indices = []
         self.anim_child_indices = []
-        self.anim_controller_keys = []
-        self.anim_controller_data = []
-        self.anim_controller_offsets = []
-        self.anim_controller_counts = []
-        self.anim_controller_data_offsets = []
-        self.anim_controller_data_counts = []
 
     def save(self):
         self.peek_model()
+        if logger().isEnabledFor(logging.DEBUG):
+            logger().debug(f"Layout of [{self.path}]:\n{self.dump_layout()}")
 
         self.save_file_header()
-        self.save_geometry_header()
-        self.save_model_header()
-        self.save_names()
-        self.save_animations()
-        self.save_nodes()
+        self.mdl_layout.write(self.mdl)
+        self.mdx_layout.write(self.mdx)
 
-    def peek_model(self):
-        self.mdl_pos = 80 + 116  # geometry header + model header
-        self.off_name_offsets = self.mdl_pos
+        save_all([self.mdl, self.mdx])
+
+    def dump_layout(self):
+        return "MDL\n{}\nMDX\n{}".format(self.mdl_layout.dump(), self.mdx_layout.dump())
 
+    def peek_model(self):
         self.peek_nodes(self.model.root_node)
 
         # Nodes
@@ -150,17 +128,15 @@ class MdlWriter:
             self.anim_nodes.append([])
             self.anim_parent_indices.append([])
             self.anim_child_indices.append([])
-            self.peek_anim_nodes(anim_idx, anim.root_node)
+            self.peek_anim_nodes(anim_idx, anim.load_root_node())
 
-        self.mdl_pos += 4 * len(self.nodes)  # name offsets
+        self.mdl_layout.add("geometry_header", None, 80, self.save_geometry_header)
+        self.mdl_layout.add("model_header", None, 116, self.save_model_header)
 
         self.peek_node_names()
         self.peek_animations()
         self.peek_node_data()
 
-        self.mdl_size = self.mdl_pos
-        self.mdx_size = self.mdx_pos
-
     def peek_nodes(self, node, parent_idx=None):
         node_idx = len(self.nodes)
         self.nodes.append(node)
@@ -186,299 +162,433 @@ class MdlWriter:
             self.peek_anim_nodes(anim_idx, child, node_idx)
 
     def peek_node_names(self):
-        for node in self.nodes:
-            self.name_offsets.append(self.mdl_pos)
-            self.mdl_pos += len(node.name) + 1
+        layout = self.mdl_layout
+        layout.add("name_offsets", None, 4 * len(self.nodes), self.save_name_offsets)
+        for node_idx, node in enumerate(self.nodes):
+            layout.add(
+                "name",
+                node_idx,
+                len(node.name) + 1,
+                partial(self.mdl.write_c_string, node.name),
+            )
 
     def peek_animations(self):
-        self.off_anim_offsets = self.mdl_pos
-        self.mdl_pos += 4 * len(self.model.animations)
+        layout = self.mdl_layout
+        layout.add(
+            "anim_offsets",
+            None,
+            4 * len(self.model.animations),
+            self.save_anim_offsets,
+        )
 
         for anim_idx, anim in enumerate(self.model.animations):
             # Animation Header
-            self.anim_offsets.append(self.mdl_pos)
-            self.mdl_pos += 136
+            layout.add(
+                "anim_header",
+                anim_idx,
+                136,
+                partial(self.save_anim_header, anim_idx, anim),
+            )
 
             # Events
-            self.anim_events_offsets.append(self.mdl_pos)
-            self.mdl_pos += 36 * len(anim.events)
-
-            self.anim_node_offsets.append([])
-            self.anim_children_offsets.append([])
-            self.anim_controller_keys.append([])
-            self.anim_controller_data.append([])
-            self.anim_controller_counts.append([])
-            self.anim_controller_data_counts.append([])
-            self.anim_controller_offsets.append([])
-            self.anim_controller_data_offsets.append([])
+            layout.add(
+                "anim_events",
+                anim_idx,
+                36 * len(anim.events),
+                partial(self.save_anim_events, anim),
+            )
 
             # Animation Nodes
             for node_idx, node in enumerate(self.anim_nodes[anim_idx]):
                 model_node = self.nodes[self.node_idx_by_number[node.node_number]]
                 type_flags = self.get_node_flags(model_node)
+                key = (anim_idx, node_idx)
+                child_indices = self.anim_child_indices[anim_idx][node_idx]
+
+                ctrl_keys = []
+                ctrl_data = []
+                self.peek_anim_controllers(node, type_flags, ctrl_keys, ctrl_data)
 
                 # Geometry Header
-                self.anim_node_offsets[anim_idx].append(self.mdl_pos)
-                self.mdl_pos += 80
+                layout.add(
+                    "anim_node_header",
+                    key,
+                    80,
+                    partial(
+                        self.save_anim_node_header,
+                        anim_idx,
+                        node_idx,
+                        node,
+                        len(ctrl_keys),
+                        len(ctrl_data),
+                    ),
+                )
 
                 # Children
-                self.anim_children_offsets[anim_idx].append(self.mdl_pos)
-                self.mdl_pos += 4 * len(self.anim_child_indices[anim_idx][node_idx])
+                layout.add(
+                    "anim_children",
+                    key,
+                    4 * len(child_indices),
+                    partial(self.save_anim_children, anim_idx, child_indices),
+                )
 
                 # Controllers
-                ctrl_keys = []
-                ctrl_data = []
-                self.peek_anim_controllers(node, type_flags, ctrl_keys, ctrl_data)
-                ctrl_count = len(ctrl_keys)
-                ctrl_data_count = len(ctrl_data)
-                self.anim_controller_keys[anim_idx].append(ctrl_keys)
-                self.anim_controller_data[anim_idx].append(ctrl_data)
-                self.anim_controller_counts[anim_idx].append(ctrl_count)
-                self.anim_controller_data_counts[anim_idx].append(ctrl_data_count)
-                self.anim_controller_offsets[anim_idx].append(self.mdl_pos)
-                self.mdl_pos += 16 * ctrl_count
+                layout.add(
+                    "anim_controllers",
+                    key,
+                    16 * len(ctrl_keys),
+                    partial(self.save_controllers, ctrl_keys, True),
+                )
 
                 # Controller Data
-                self.anim_controller_data_offsets[anim_idx].append(self.mdl_pos)
-                self.mdl_pos += 4 * ctrl_data_count
+                layout.add(
+                    "anim_controller_data",
+                    key,
+                    4 * len(ctrl_data),
+                    partial(self.save_controller_data, ctrl_data, True),
+                )
 
     def peek_node_data(self):
-        for node_idx, node in enumerate(self.nodes):
-            # Geometry Header
-            self.node_offsets.append(self.mdl_pos)
-            self.mdl_pos += 80
+        layout = self.mdl_layout
+        num_meshes = 0
 
+        for node_idx, node in enumerate(self.nodes):
             type_flags = self.get_node_flags(node)
+            child_indices = self.child_indices[node_idx]
+
+            ctrl_keys = []
+            ctrl_data = []
+            self.peek_controllers(node, type_flags, ctrl_keys, ctrl_data)
+
+            # Geometry Header
+            layout.add(
+                "node_header",
+                node_idx,
+                80,
+                partial(
+                    self.save_node_header,
+                    node_idx,
+                    node,
+                    type_flags,
+                    len(ctrl_keys),
+                    len(ctrl_data),
+                ),
+            )
 
             # Light Header
             if type_flags & NODE_LIGHT:
-                self.mdl_pos += 92
+                layout.add(
+                    "light_header",
+                    node_idx,
+                    92,
+                    partial(self.save_light_header, node_idx, node),
+                )
 
                 # Lens Flares
                 if node.lensflares:
-                    self.flare_sizes_offsets[node_idx] = self.mdl_pos
-                    self.mdl_pos += 4 * len(node.flare_list.sizes)
-
-                    self.flare_positions_offsets[node_idx] = self.mdl_pos
-                    self.mdl_pos += 4 * len(node.flare_list.positions)
-
-                    self.flare_colorshifts_offsets[node_idx] = self.mdl_pos
-                    self.mdl_pos += 4 * 3 * len(node.flare_list.colorshifts)
-
-                    self.flare_texture_offset_offsets[node_idx] = self.mdl_pos
-                    self.mdl_pos += 4 * len(node.flare_list.textures)
-
-                    self.flare_textures_offsets[node_idx] = []
-                    for tex in node.flare_list.textures:
-                        self.flare_textures_offsets[node_idx].append(self.mdl_pos)
-                        self.mdl_pos += len(tex) + 1
+                    flare_list = node.flare_list
+                    layout.add(
+                        "flare_sizes",
+                        node_idx,
+                        4 * len(flare_list.sizes),
+                        partial(self.mdl.write_float_array, flare_list.sizes),
+                    )
+                    layout.add(
+                        "flare_positions",
+                        node_idx,
+                        4 * len(flare_list.positions),
+                        partial(self.mdl.write_float_array, flare_list.positions),
+                    )
+                    layout.add(
+                        "flare_colorshifts",
+                        node_idx,
+                        4 * 3 * len(flare_list.colorshifts),
+                        partial(self.mdl.write_records, "3f", flare_list.colorshifts),
+                    )
+                    layout.add(
+                        "flare_texture_offsets",
+                        node_idx,
+                        4 * len(flare_list.textures),
+                        partial(self.save_flare_texture_offsets, node_idx, node),
+                    )
+                    for tex_idx, tex in enumerate(flare_list.textures):
+                        layout.add(
+                            "flare_texture",
+                            (node_idx, tex_idx),
+                            len(tex) + 1,
+                            partial(self.mdl.write_c_string, tex),
+                        )
 
             # Emitter Header
             if type_flags & NODE_EMITTER:
-                self.mdl_pos += 224
+                layout.add(
+                    "emitter_header",
+                    node_idx,
+                    224,
+                    partial(self.save_emitter_header, node),
+                )
 
             # Reference Header
             if type_flags & NODE_REFERENCE:
-                self.mdl_pos += 36
+                layout.add(
+                    "reference_header",
+                    node_idx,
+                    36,
+                    partial(self.save_reference_header, node),
+                )
 
             # Mesh Header
             if type_flags & NODE_MESH:
-                self.mdl_pos += 332
+                if type_flags & NODE_SABER:
+                    mdx_dtype = None
+                    num_verts = NUM_SABER_VERTS
+                else:
+                    mdx_dtype = self.get_mdx_dtype(node, type_flags)
+                    num_verts = len(node.verts)
+                num_faces = len(node.facelist.vertices)
+
+                mesh_header_size = 332
                 if self.tsl:
-                    self.mdl_pos += 8
+                    mesh_header_size += 8
                 if self.xbox:
-                    self.mdl_pos -= 4
+                    mesh_header_size -= 4
+                layout.add(
+                    "mesh_header",
+                    node_idx,
+                    mesh_header_size,
+                    partial(
+                        self.save_mesh_header,
+                        node_idx,
+                        node,
+                        type_flags,
+                        mdx_dtype,
+                    ),
+                )
 
             # Skin Header
             if type_flags & NODE_SKIN:
-                self.mdl_pos += 100
+                bone_indices, bonemap, group_to_bone = self.get_skin_bones(node)
+                layout.add(
+                    "skin_header",
+                    node_idx,
+                    100,
+                    partial(self.save_skin_header, node_idx, bone_indices, mdx_dtype),
+                )
 
             # Dangly Header
             if type_flags & NODE_DANGLY:
-                self.mdl_pos += 28
+                layout.add(
+                    "dangly_header",
+                    node_idx,
+                    28,
+                    partial(self.save_dangly_header, node_idx, node),
+                )
 
             # AABB Header
             if type_flags & NODE_AABB:
-                self.mdl_pos += 4
+                aabbs = self.get_export_data(
+                    node,
+                    ("aabb", self.aabb_split_mode),
+                    partial(self.get_aabb_records, node),
+                )
+                layout.add(
+                    "aabb_header",
+                    node_idx,
+                    4,
+                    partial(self.save_aabb_header, node_idx),
+                )
 
             # Saber Header
             if type_flags & NODE_SABER:
-                self.mdl_pos += 20
+                saber_inv_count1 = self.get_inverted_counter(num_meshes + 1)
+                saber_inv_count2 = self.get_inverted_counter(num_meshes + 2)
+                num_meshes += 2
+                layout.add(
+                    "saber_header",
+                    node_idx,
+                    20,
+                    partial(
+                        self.save_saber_header,
+                        node_idx,
+                        saber_inv_count1,
+                        saber_inv_count2,
+                    ),
+                )
 
             # Mesh Data
             if type_flags & NODE_MESH:
-                num_faces = len(node.facelist.vertices)
+                saber = type_flags & NODE_SABER
 
                 # Faces
-                self.faces_offsets[node_idx] = self.mdl_pos
-                self.mdl_pos += 32 * num_faces
+                layout.add(
+                    "faces",
+                    node_idx,
+                    32 * num_faces,
+                    partial(self.save_faces, node),
+                )
 
                 # Vertex Indices Offset
-                self.index_offset_offsets[node_idx] = self.mdl_pos
-                if not type_flags & NODE_SABER:
-                    self.mdl_pos += 4
+                layout.add(
+                    "index_offset",
+                    node_idx,
+                    0 if saber else 4,
+                    None if saber else partial(self.save_index_offset, node_idx),
+                )
 
                 # Vertices
-                num_verts = (
-                    NUM_SABER_VERTS if type_flags & NODE_SABER else len(node.verts)
-                )
                 if not self.xbox:
-                    self.verts_offsets[node_idx] = self.mdl_pos
-                    self.mdl_pos += 4 * 3 * num_verts
-
-                # Vertex Indices Count
-                self.index_count_offsets[node_idx] = self.mdl_pos
-                if not type_flags & NODE_SABER:
-                    self.mdl_pos += 4
-
-                # Inverted Counter
-                self.inv_count_offsets[node_idx] = self.mdl_pos
-                if not type_flags & NODE_SABER:
-                    self.mdl_pos += 4
-
-                # Vertex Indices
-                self.indices_offsets[node_idx] = self.mdl_pos
-                if not type_flags & NODE_SABER:
-                    self.mdl_pos += 2 * 3 * num_faces
+                    layout.add(
+                        "verts",
+                        node_idx,
+                        4 * 3 * num_verts,
+                        partial(self.save_verts, node, type_flags),
+                    )
+
+                # Vertex Indices Count, Inverted Counter, Vertex Indices
+                if saber:
+                    layout.add("index_count", node_idx)
+                    layout.add("inv_count", node_idx)
+                    layout.add("indices", node_idx)
+                else:
+                    num_meshes += 1
+                    mesh_inv_count = self.get_inverted_counter(num_meshes)
+                    layout.add(
+                        "index_count",
+                        node_idx,
+                        4,
+                        partial(self.mdl.write_uint32, 3 * num_faces),
+                    )
+                    layout.add(
+                        "inv_count",
+                        node_idx,
+                        4,
+                        partial(self.mdl.write_uint32, mesh_inv_count),
+                    )
+                    layout.add(
+                        "indices",
+                        node_idx,
+                        2 * 3 * num_faces,
+                        partial(self.mdl.write_records, "3H", node.facelist.vertices),
+                    )
 
                 # MDX data
-                if type_flags & NODE_SABER:
-                    self.mdx_offsets[node_idx] = 0
-                else:
-                    # Vertex Coords
-                    self.mdx_offsets[node_idx] = self.mdx_pos
-                    self.mdx_pos += 4 * 3 * (num_verts + 1)
-                    # Normals
-                    if self.xbox:
-                        self.mdx_pos += 4 * (num_verts + 1)
-                    else:
-                        self.mdx_pos += 4 * 3 * (num_verts + 1)
-                    # UV1
-                    if node.uv1:
-                        self.mdx_pos += 4 * 2 * (num_verts + 1)
-                    # UV2
-                    if node.uv2:
-                        self.mdx_pos += 4 * 2 * (num_verts + 1)
-                    # Tangent Space
-                    if node.tangentspace:
-                        if self.xbox:
-                            self.mdx_pos += 4 * 3 * (num_verts + 1)
-                        else:
-                            self.mdx_pos += 4 * 9 * (num_verts + 1)
-                    if type_flags & NODE_SKIN:
-                        if self.xbox:
-                            self.mdx_pos += (4 * 4 + 2 * 4) * (num_verts + 1)
-                        else:
-                            self.mdx_pos += 4 * 8 * (num_verts + 1)
-
-                # Bounding Box, Average, Total Area
-                bb_min = Vector()
-                bb_max = Vector()
-                average = Vector()
-                total_area = 0.0
-                if node.facelist.vertices:
-                    for face in node.facelist.vertices:
-                        verts = [Vector(node.verts[i]) for i in face]
-                        for vert in verts:
-                            bb_min.x = min(bb_min.x, vert.x)
-                            bb_min.y = min(bb_min.y, vert.y)
-                            bb_min.z = min(bb_min.z, vert.z)
-                            bb_max.x = max(bb_max.x, vert.x)
-                            bb_max.y = max(bb_max.y, vert.y)
-                            bb_max.z = max(bb_max.z, vert.z)
-                            average += vert
-                        edge1 = verts[1] - verts[0]
-                        edge2 = verts[2] - verts[0]
-                        edge3 = verts[2] - verts[1]
-                        area = self.calculate_face_area(edge1, edge2, edge3)
-                        if area != 1.0:
-                            total_area += area
-                    average /= 3 * len(node.facelist.vertices)
-                self.mesh_bounding_boxes[node_idx] = [*bb_min, *bb_max]
-                self.mesh_averages[node_idx] = [*average]
-                self.mesh_total_areas[node_idx] = total_area
-
-                # Radius
-                radius = 0.0
-                for face in node.facelist.vertices:
-                    verts = [Vector(node.verts[i]) for i in face]
-                    for vert in verts:
-                        radius = max(radius, (vert - average).length)
-                self.mesh_radii[node_idx] = radius
+                if not saber:
+                    self.mdx_layout.add(
+                        "mdx",
+                        node_idx,
+                        mdx_dtype.itemsize * (num_verts + 1),
+                        partial(
+                            self.save_mdx_vertices,
+                            node,
+                            type_flags,
+                            mdx_dtype,
+                            group_to_bone if type_flags & NODE_SKIN else None,
+                        ),
+                    )
 
             # Skin Data
             if type_flags & NODE_SKIN:
                 num_bones = len(self.nodes)
 
                 # Bonemap
-                self.bonemap_offsets[node_idx] = self.mdl_pos
-                if self.xbox:
-                    self.mdl_pos += 2 * num_bones
-                else:
-                    self.mdl_pos += 4 * num_bones
-
-                # QBones
-                self.qbone_offsets[node_idx] = self.mdl_pos
-                self.mdl_pos += 4 * 4 * num_bones
+                layout.add(
+                    "bonemap",
+                    node_idx,
+                    (2 if self.xbox else 4) * num_bones,
+                    partial(self.save_bonemap, bonemap),
+                )
 
-                # TBones
-                self.tbone_offsets[node_idx] = self.mdl_pos
-                self.mdl_pos += 4 * 3 * num_bones
+                # QBones, TBones
+                qbones, tbones = self.get_skin_bone_transforms(node)
+                layout.add(
+                    "qbones",
+                    node_idx,
+                    4 * 4 * num_bones,
+                    partial(self.save_qbones, qbones),
+                )
+                layout.add(
+                    "tbones",
+                    node_idx,
+                    4 * 3 * num_bones,
+                    partial(self.mdl.write_records, "3f", tbones),
+                )
 
                 # Garbage
-                self.skin_garbage_offsets[node_idx] = self.mdl_pos
-                self.mdl_pos += 4 * num_bones
+                layout.add(
+                    "skin_garbage",
+                    node_idx,
+                    4 * num_bones,
+                    partial(self.mdl.write_bytes, bytes(4 * num_bones)),
+                )
 
             # Dangly Data
             if type_flags & NODE_DANGLY:
-                # Constraints
-                self.constraints_offsets[node_idx] = self.mdl_pos
-                self.mdl_pos += 4 * len(node.constraints)
-
-                # Vertices
-                self.dangly_verts_offsets[node_idx] = self.mdl_pos
-                self.mdl_pos += 4 * 3 * len(node.verts)
+                layout.add(
+                    "constraints",
+                    node_idx,
+                    4 * len(node.constraints),
+                    partial(self.mdl.write_float_array, node.constraints),
+                )
+                layout.add(
+                    "dangly_verts",
+                    node_idx,
+                    4 * 3 * len(node.verts),
+                    partial(self.mdl.write_records, "3f", node.verts),
+                )
 
             # AABB Data
             if type_flags & NODE_AABB:
-                self.aabb_offsets[node_idx] = []
-                aabbs = self.generate_aabb_tree(node)
-                for _ in range(len(aabbs)):
-                    self.aabb_offsets[node_idx].append(self.mdl_pos)
-                    self.mdl_pos += 40
-                self.aabbs[node_idx] = aabbs
+                layout.add(
+                    "aabb",
+                    node_idx,
+                    40 * len(aabbs),
+                    partial(self.save_aabbs, node_idx, aabbs),
+                )
 
             # Saber Data
             if type_flags & NODE_SABER:
-                self.saber_verts_offsets[node_idx] = self.mdl_pos
-                self.mdl_pos += 4 * 3 * NUM_SABER_VERTS
-
-                self.saber_uv_offsets[node_idx] = self.mdl_pos
-                self.mdl_pos += 4 * 2 * NUM_SABER_VERTS
-
-                self.saber_normals_offsets[node_idx] = self.mdl_pos
-                self.mdl_pos += 4 * 3 * NUM_SABER_VERTS
+                layout.add(
+                    "saber_verts",
+                    node_idx,
+                    4 * 3 * NUM_SABER_VERTS,
+                    partial(self.save_saber_values, node.verts),
+                )
+                layout.add(
+                    "saber_uv",
+                    node_idx,
+                    4 * 2 * NUM_SABER_VERTS,
+                    partial(self.save_saber_values, node.uv1),
+                )
+                layout.add(
+                    "saber_normals",
+                    node_idx,
+                    4 * 3 * NUM_SABER_VERTS,
+                    partial(self.save_saber_values, node.normals),
+                )
 
             # Children
-            self.children_offsets.append(self.mdl_pos)
-            self.mdl_pos += 4 * len(node.children)
+            layout.add(
+                "children",
+                node_idx,
+                4 * len(child_indices),
+                partial(self.save_children, child_indices),
+            )
 
             # Controllers
-            ctrl_keys = []
-            ctrl_data = []
-            self.peek_controllers(node, type_flags, ctrl_keys, ctrl_data)
-            ctrl_count = len(ctrl_keys)
-            ctrl_data_count = len(ctrl_data)
-            self.controller_keys.append(ctrl_keys)
-            self.controller_data.append(ctrl_data)
-            self.controller_counts.append(ctrl_count)
-            self.controller_data_counts.append(ctrl_data_count)
-            self.controller_offsets.append(self.mdl_pos)
-            self.mdl_pos += 16 * ctrl_count
+            layout.add(
+                "controllers",
+                node_idx,
+                16 * len(ctrl_keys),
+                partial(self.save_controllers, ctrl_keys, False),
+            )
 
             # Controller Data
-            self.controller_data_offsets.append(self.mdl_pos)
-            self.mdl_pos += 4 * ctrl_data_count
+            layout.add(
+                "controller_data",
+                node_idx,
+                4 * len(ctrl_data),
+                partial(self.save_controller_data, ctrl_data, False),
+            )
 
     def peek_controllers(self, node, type_flags, out_keys, out_data):
         if not node.parent:
@@ -680,8 +790,8 @@ class MdlWriter:
 
     def save_file_header(self):
         self.mdl.write_uint32(0)  # pseudo signature
-        self.mdl.write_uint32(self.mdl_size)
-        self.mdl.write_uint32(self.mdx_size)
+        self.mdl.write_uint32(self.mdl_layout.size)
+        self.mdl.write_uint32(self.mdx_layout.size)
 
     def save_geometry_header(self):
         if self.tsl:
@@ -700,7 +810,7 @@ class MdlWriter:
                 fn_ptr2 = MODEL_FN_PTR_2_K1_PC
 
         model_name = self.model.name.ljust(32, "\0")
-        off_root_node = self.node_offsets[0]
+        off_root_node = self.mdl_layout.offset("node_header", 0)
         total_num_nodes = len(self.nodes)
         ref_count = 0
         model_type = MODEL_MODEL
@@ -738,13 +848,13 @@ class MdlWriter:
             is_not_null(self.model.animroot)
             and self.node_names.count(self.model.animroot) > 0
         ):
-            off_anim_root = self.node_offsets[
-                self.node_names.index(self.model.animroot)
-            ]
+            off_anim_root = self.mdl_layout.offset(
+                "node_header", self.node_names.index(self.model.animroot)
+            )
         else:
-            off_anim_root = self.node_offsets[0]
+            off_anim_root = self.mdl_layout.offset("node_header", 0)
 
-        mdx_size = self.mdx_size
+        mdx_size = self.mdx_layout.size
         mdx_offset = 0
 
         self.mdl.write_uint8(classification)
@@ -753,7 +863,7 @@ class MdlWriter:
         self.mdl.write_uint8(affected_by_fog)
         self.mdl.write_uint32(num_child_models)
         self.put_array_def(
-            self.off_anim_offsets, len(self.model.animations)
+            self.mdl_layout.offset("anim_offsets"), len(self.model.animations)
         )  # animation offsets
         self.mdl.write_uint32(supermodel_ref)
         for val in bounding_box:
@@ -765,864 +875,547 @@ class MdlWriter:
         self.mdl.write_uint32(0)  # unknown
         self.mdl.write_uint32(mdx_size)
         self.mdl.write_uint32(mdx_offset)
-        self.put_array_def(self.off_name_offsets, len(self.nodes))  # name offsets
-
-    def save_names(self):
-        for offset in self.name_offsets:
-            self.mdl.write_uint32(offset)
-        for node in self.nodes:
-            self.mdl.write_c_string(node.name)
+        self.put_array_def(
+            self.mdl_layout.offset("name_offsets"), len(self.nodes)
+        )  # name offsets
+
+    def save_name_offsets(self):
+        self.mdl.write_uint32_array(
+            [
+                self.mdl_layout.offset("name", node_idx)
+                for node_idx in range(len(self.nodes))
+            ]
+        )
 
-    def save_animations(self):
-        for offset in self.anim_offsets:
-            self.mdl.write_uint32(offset)
+    def save_anim_offsets(self):
+        self.mdl.write_uint32_array(
+            [
+                self.mdl_layout.offset("anim_header", anim_idx)
+                for anim_idx in range(len(self.model.animations))
+            ]
+        )
 
-        for anim_idx, anim in enumerate(self.model.animations):
-            if self.tsl:
-                if self.xbox:
-                    fn_ptr1 = ANIM_FN_PTR_1_K2_XBOX
-                    fn_ptr2 = ANIM_FN_PTR_2_K2_XBOX
-                else:
-                    fn_ptr1 = ANIM_FN_PTR_1_K2_PC
-                    fn_ptr2 = ANIM_FN_PTR_2_K2_PC
+    def save_anim_header(self, anim_idx, anim):
+        if self.tsl:
+            if self.xbox:
+                fn_ptr1 = ANIM_FN_PTR_1_K2_XBOX
+                fn_ptr2 = ANIM_FN_PTR_2_K2_XBOX
             else:
-                if self.xbox:
-                    fn_ptr1 = ANIM_FN_PTR_1_K1_XBOX
-                    fn_ptr2 = ANIM_FN_PTR_2_K1_XBOX
-                else:
-                    fn_ptr1 = ANIM_FN_PTR_1_K1_PC
-                    fn_ptr2 = ANIM_FN_PTR_2_K1_PC
-
-            name = anim.name.ljust(32, "\0")
-            off_root_node = self.anim_node_offsets[anim_idx][0]
-            total_num_nodes = len(self.anim_nodes[anim_idx])
-            ref_count = 0
-            model_type = MODEL_ANIM
-            anim_root = anim.animroot.ljust(32, "\0")
-
-            self.mdl.write_uint32(fn_ptr1)
-            self.mdl.write_uint32(fn_ptr2)
-            self.mdl.write_string(name)
-            self.mdl.write_uint32(off_root_node)
-            self.mdl.write_uint32(total_num_nodes)
-            self.put_array_def(0, 0)  # runtime array
-            self.put_array_def(0, 0)  # runtime array
-            self.mdl.write_uint32(ref_count)
-            self.mdl.write_uint8(model_type)
-            for _ in range(3):
-                self.mdl.write_uint8(0)  # padding
-            self.mdl.write_float(anim.length)
-            self.mdl.write_float(anim.transtime)
-            self.mdl.write_string(anim_root)
-            self.put_array_def(self.anim_events_offsets[anim_idx], len(anim.events))
-            self.mdl.write_uint32(0)  # padding
-
-            for time, event in anim.events:
-                self.mdl.write_float(time)
-                self.mdl.write_string(event.ljust(32, "\0"))
-
-            self.save_anim_nodes(anim_idx)
-
-    def save_anim_nodes(self, anim_idx):
-        for node_idx, node in enumerate(self.anim_nodes[anim_idx]):
-            # Geometry Header
-
-            type_flags = NODE_BASE
-            name_index = self.node_names.index(node.name)
-            off_root = self.anim_offsets[anim_idx]
-            parent_idx = self.anim_parent_indices[anim_idx][node_idx]
-            off_parent = (
-                self.anim_node_offsets[anim_idx][parent_idx]
-                if parent_idx is not None
-                else 0
-            )
-            position = [0.0] * 3
-            orientation = [1.0, 0.0, 0.0, 0.0]
-            child_indices = self.anim_child_indices[anim_idx][node_idx]
-
-            self.mdl.write_uint16(type_flags)
-            self.mdl.write_uint16(node.node_number)
-            self.mdl.write_uint16(name_index)
-            self.mdl.write_uint16(0)  # padding
-            self.mdl.write_uint32(off_root)
-            self.mdl.write_uint32(off_parent)
-            for val in position:
-                self.mdl.write_float(val)
-            for val in orientation:
-                self.mdl.write_float(val)
-            self.put_array_def(
-                self.anim_children_offsets[anim_idx][node_idx], len(child_indices)
-            )
-            self.put_array_def(
-                self.anim_controller_offsets[anim_idx][node_idx],
-                self.anim_controller_counts[anim_idx][node_idx],
-            )
-            self.put_array_def(
-                self.anim_controller_data_offsets[anim_idx][node_idx],
-                self.anim_controller_data_counts[anim_idx][node_idx],
-            )
-
-            # Children
-
-            for child_idx in child_indices:
-                self.mdl.write_uint32(self.anim_node_offsets[anim_idx][child_idx])
-
-            # Controllers
-
-            for key in self.anim_controller_keys[anim_idx][node_idx]:
-                if key.ctrl_type in [CTRL_BASE_POSITION, CTRL_BASE_ORIENTATION]:
-                    unk1 = key.ctrl_type + 8
-                else:
-                    unk1 = 0xFFFF
-
-                self.mdl.write_uint32(key.ctrl_type)
-                self.mdl.write_uint16(unk1)
-                self.mdl.write_uint16(key.num_rows)
-                self.mdl.write_uint16(key.timekeys_start)
-                self.mdl.write_uint16(key.values_start)
-                self.mdl.write_uint8(key.num_columns)
-
-                for _ in range(3):
-                    self.mdl.write_uint8(0)  # padding
-
-            # Controller Data
-
-            for val in self.anim_controller_data[anim_idx][node_idx]:
-                if type(val) is int:
-                    self.mdl.write_uint32(val)
-                else:
-                    self.mdl.write_float(val)
-
-    def save_nodes(self):
-        num_meshes = 0
+                fn_ptr1 = ANIM_FN_PTR_1_K2_PC
+                fn_ptr2 = ANIM_FN_PTR_2_K2_PC
+        else:
+            if self.xbox:
+                fn_ptr1 = ANIM_FN_PTR_1_K1_XBOX
+                fn_ptr2 = ANIM_FN_PTR_2_K1_XBOX
+            else:
+                fn_ptr1 = ANIM_FN_PTR_1_K1_PC
+                fn_ptr2 = ANIM_FN_PTR_2_K1_PC
 
-        for node_idx, node in enumerate(self.nodes):
-            # Geometry Header
+        name = anim.name.ljust(32, "\0")
+        off_root_node = self.mdl_layout.offset("anim_node_header", (anim_idx, 0))
+        total_num_nodes = len(self.anim_nodes[anim_idx])
+        ref_count = 0
+        model_type = MODEL_ANIM
+        anim_root = anim.animroot.ljust(32, "\0")
 
-            type_flags = self.get_node_flags(node)
-            node_number = node.node_number
-            name_index = node_idx
-            off_root = 0
-            parent_idx = self.parent_indices[node_idx]
-            off_parent = self.node_offsets[parent_idx] if parent_idx is not None else 0
-            position = node.position
-            orientation = node.orientation
-            child_indices = self.child_indices[node_idx]
+        self.mdl.write_uint32(fn_ptr1)
+        self.mdl.write_uint32(fn_ptr2)
+        self.mdl.write_string(name)
+        self.mdl.write_uint32(off_root_node)
+        self.mdl.write_uint32(total_num_nodes)
+        self.put_array_def(0, 0)  # runtime array
+        self.put_array_def(0, 0)  # runtime array
+        self.mdl.write_uint32(ref_count)
+        self.mdl.write_uint8(model_type)
+        for _ in range(3):
+            self.mdl.write_uint8(0)  # padding
+        self.mdl.write_float(anim.length)
+        self.mdl.write_float(anim.transtime)
+        self.mdl.write_string(anim_root)
+        self.put_array_def(
+            self.mdl_layout.offset("anim_events", anim_idx), len(anim.events)
+        )
+        self.mdl.write_uint32(0)  # padding
+
+    def save_anim_events(self, anim):
+        for time, event in anim.events:
+            self.mdl.write_float(time)
+            self.mdl.write_string(event.ljust(32, "\0"))
+
+    def save_anim_node_header(self, anim_idx, node_idx, node, ctrl_count, data_count):
+        key = (anim_idx, node_idx)
+        type_flags = NODE_BASE
+        name_index = self.node_names.index(node.name)
+        off_root = self.mdl_layout.offset("anim_header", anim_idx)
+        parent_idx = self.anim_parent_indices[anim_idx][node_idx]
+        off_parent = (
+            self.mdl_layout.offset("anim_node_header", (anim_idx, parent_idx))
+            if parent_idx is not None
+            else 0
+        )
+        position = [0.0] * 3
+        orientation = [1.0, 0.0, 0.0, 0.0]
+        child_indices = self.anim_child_indices[anim_idx][node_idx]
+
+        self.mdl.write_uint16(type_flags)
+        self.mdl.write_uint16(node.node_number)
+        self.mdl.write_uint16(name_index)
+        self.mdl.write_uint16(0)  # padding
+        self.mdl.write_uint32(off_root)
+        self.mdl.write_uint32(off_parent)
+        for val in position:
+            self.mdl.write_float(val)
+        for val in orientation:
+            self.mdl.write_float(val)
+        self.put_array_def(
+            self.mdl_layout.offset("anim_children", key), len(child_indices)
+        )
+        self.put_array_def(self.mdl_layout.offset("anim_controllers", key), ctrl_count)
+        self.put_array_def(
+            self.mdl_layout.offset("anim_controller_data", key), data_count
+        )
 
-            self.mdl.write_uint16(type_flags)
-            self.mdl.write_uint16(node_number)
-            self.mdl.write_uint16(name_index)
-            self.mdl.write_uint16(0)  # padding
-            self.mdl.write_uint32(off_root)
-            self.mdl.write_uint32(off_parent)
-            for val in position:
-                self.mdl.write_float(val)
-            for val in orientation:
-                self.mdl.write_float(val)
-            self.put_array_def(self.children_offsets[node_idx], len(child_indices))
-            self.put_array_def(
-                self.controller_offsets[node_idx], self.controller_counts[node_idx]
-            )
-            self.put_array_def(
-                self.controller_data_offsets[node_idx],
-                self.controller_data_counts[node_idx],
+    def save_anim_children(self, anim_idx, child_indices):
+        for child_idx in child_indices:
+            self.mdl.write_uint32(
+                self.mdl_layout.offset("anim_node_header", (anim_idx, child_idx))
             )
 
-            # Light Header
-
-            if type_flags & NODE_LIGHT:
-                shadow = node.shadow
-                light_priority = node.lightpriority
-                ambient_only = node.ambientonly
-                dynamic_type = node.dynamictype
-                affect_dynamic = node.affectdynamic
-                fading_light = node.fadinglight
-                flare = 0  # always 0
-                flare_radius = node.flareradius
-
-                self.mdl.write_float(flare_radius)
-                self.put_array_def(0, 0)  # unknown
-                self.put_array_def(
-                    self.flare_sizes_offsets[node_idx] if node.lensflares else 0,
-                    len(node.flare_list.sizes),
-                )
-                self.put_array_def(
-                    self.flare_positions_offsets[node_idx] if node.lensflares else 0,
-                    len(node.flare_list.positions),
-                )
-                self.put_array_def(
-                    self.flare_colorshifts_offsets[node_idx] if node.lensflares else 0,
-                    len(node.flare_list.colorshifts),
-                )
-                self.put_array_def(
-                    (
-                        self.flare_texture_offset_offsets[node_idx]
-                        if node.lensflares
-                        else 0
-                    ),
-                    len(node.flare_list.textures),
-                )
-                self.mdl.write_int32(light_priority)
-                self.mdl.write_uint32(ambient_only)
-                self.mdl.write_uint32(dynamic_type)
-                self.mdl.write_uint32(affect_dynamic)
-                self.mdl.write_uint32(shadow)
-                self.mdl.write_uint32(flare)
-                self.mdl.write_uint32(fading_light)
-
-                # Lens Flares
-                if node.lensflares:
-                    for size in node.flare_list.sizes:
-                        self.mdl.write_float(size)
-                    for position in node.flare_list.positions:
-                        self.mdl.write_float(position)
-                    for colorshift in node.flare_list.colorshifts:
-                        for val in colorshift:
-                            self.mdl.write_float(val)
-                    for i in range(len(node.flare_list.textures)):
-                        off_tex = self.flare_textures_offsets[node_idx][i]
-                        self.mdl.write_uint32(off_tex)
-                    for tex in node.flare_list.textures:
-                        self.mdl.write_c_string(tex)
+    def save_controllers(self, ctrl_keys, anim):
+        for key in ctrl_keys:
+            if anim and key.ctrl_type in [CTRL_BASE_POSITION, CTRL_BASE_ORIENTATION]:
+                unk1 = key.ctrl_type + 8
+            else:
+                unk1 = 0xFFFF
 
-            # Emitter Header
+            self.mdl.write_uint32(key.ctrl_type)
+            self.mdl.write_uint16(unk1)
+            self.mdl.write_uint16(key.num_rows)
+            self.mdl.write_uint16(key.timekeys_start)
+            self.mdl.write_uint16(key.values_start)
+            self.mdl.write_uint8(key.num_columns)
 
-            if type_flags & NODE_EMITTER:
-                update = node.update.ljust(32, "\0")
-                render = node.emitter_render.ljust(32, "\0")
-                blend = node.blend.ljust(32, "\0")
-                texture = node.texture.ljust(32, "\0")
-                chunk_name = node.chunk_name.ljust(16, "\0")
-                twosided_tex = 1 if node.twosidedtex else 0
-                loop = 1 if node.loop else 0
-                frame_blending = 1 if node.frame_blending else 0
-                depth_texture_name = node.depth_texture_name.ljust(32, "\0")
-
-                flags = 0
-                if node.p2p:
-                    flags |= EMITTER_FLAG_P2P
-                if node.p2p_sel:
-                    flags |= EMITTER_FLAG_P2P_SEL
-                if node.affected_by_wind:
-                    flags |= EMITTER_FLAG_AFFECTED_WIND
-                if node.tinted:
-                    flags |= EMITTER_FLAG_TINTED
-                if node.bounce:
-                    flags |= EMITTER_FLAG_BOUNCE
-                if node.random:
-                    flags |= EMITTER_FLAG_RANDOM
-                if node.inherit:
-                    flags |= EMITTER_FLAG_INHERIT
-                if node.inheritvel:
-                    flags |= EMITTER_FLAG_INHERIT_VEL
-                if node.inherit_local:
-                    flags |= EMITTER_FLAG_INHERIT_LOCAL
-                if node.splat:
-                    flags |= EMITTER_FLAG_SPLAT
-                if node.inherit_part:
-                    flags |= EMITTER_FLAG_INHERIT_PART
-                if node.depth_texture:
-                    flags |= EMITTER_FLAG_DEPTH_TEXTURE
-
-                self.mdl.write_float(node.deadspace)
-                self.mdl.write_float(node.blastradius)
-                self.mdl.write_float(node.blastlength)
-                self.mdl.write_uint32(node.num_branches)
-                self.mdl.write_float(node.controlptsmoothing)
-                self.mdl.write_uint32(node.xgrid)
-                self.mdl.write_uint32(node.ygrid)
-                self.mdl.write_uint32(node.spawntype)
-                self.mdl.write_string(update)
-                self.mdl.write_string(render)
-                self.mdl.write_string(blend)
-                self.mdl.write_string(texture)
-                self.mdl.write_string(chunk_name)
-                self.mdl.write_uint32(twosided_tex)
-                self.mdl.write_uint32(loop)
-                self.mdl.write_uint16(node.renderorder)
-                self.mdl.write_uint8(frame_blending)
-                self.mdl.write_string(depth_texture_name)
+            for _ in range(3):
                 self.mdl.write_uint8(0)  # padding
-                self.mdl.write_uint32(flags)
-
-            # Reference Header
-
-            if type_flags & NODE_REFERENCE:
-                ref_model = node.refmodel.ljust(32, "\0")
-                reattachable = node.reattachable
-
-                self.mdl.write_string(ref_model)
-                self.mdl.write_uint32(reattachable)
-
-            # Mesh Header
-
-            if type_flags & NODE_MESH:
-                fn_ptr1, fn_ptr2 = self.get_mesh_fn_ptr(type_flags)
-
-                bounding_box = self.mesh_bounding_boxes[node_idx]
-                radius = self.mesh_radii[node_idx]
-                average = self.mesh_averages[node_idx]
-                diffuse = node.diffuse
-                ambient = node.ambient
-                transparency_hint = node.transparencyhint
-                bitmap = node.bitmap.ljust(32, "\0")
-                bitmap2 = node.bitmap2.ljust(32, "\0")
-                bitmap3 = "".ljust(12, "\0")
-                bitmap4 = "".ljust(12, "\0")
-                animate_uv = node.animateuv
-                uv_dir_x = node.uvdirectionx
-                uv_dir_y = node.uvdirectiony
-                uv_jitter = node.uvjitter
-                uv_jitter_speed = node.uvjitterspeed
-
-                mdx_data_size = 0
-                mdx_data_bitmap = 0
-                off_mdx_verts = 0xFFFFFFFF
-                off_mdx_normals = 0xFFFFFFFF
-                off_mdx_colors = 0xFFFFFFFF
-                off_mdx_uv1 = 0xFFFFFFFF
-                off_mdx_uv2 = 0xFFFFFFFF
-                off_mdx_uv3 = 0xFFFFFFFF
-                off_mdx_uv4 = 0xFFFFFFFF
-                off_mdx_tan_space1 = 0xFFFFFFFF
-                off_mdx_tan_space2 = 0xFFFFFFFF
-                off_mdx_tan_space3 = 0xFFFFFFFF
-                off_mdx_tan_space4 = 0xFFFFFFFF
-                if not type_flags & NODE_SABER:
-                    # Vertex Coordinates
-                    mdx_data_bitmap = MDX_FLAG_VERTEX
-                    off_mdx_verts = 0
-                    mdx_data_size += 4 * 3
-                    # Normal
-                    mdx_data_bitmap |= MDX_FLAG_NORMAL
-                    off_mdx_normals = 4 * 3
-                    if self.xbox:
-                        mdx_data_size += 4
-                    else:
-                        mdx_data_size += 4 * 3
-                    # UV1
-                    if node.uv1:
-                        mdx_data_bitmap |= MDX_FLAG_UV1
-                        off_mdx_uv1 = mdx_data_size
-                        mdx_data_size += 4 * 2
-                    # UV2
-                    if node.uv2:
-                        mdx_data_bitmap |= MDX_FLAG_UV2
-                        off_mdx_uv2 = mdx_data_size
-                        mdx_data_size += 4 * 2
-                    # Tangent Space
-                    if node.tangentspace:
-                        mdx_data_bitmap |= MDX_FLAG_TANGENT1
-                        off_mdx_tan_space1 = mdx_data_size
-                        if self.xbox:
-                            mdx_data_size += 4 * 3
-                        else:
-                            mdx_data_size += 4 * 9
-                    # Bone Weights + Bone Indices
-                    if type_flags & NODE_SKIN:
-                        mdx_data_size += 4 * 4
-                        if self.xbox:
-                            mdx_data_size += 4 * 2
-                        else:
-                            mdx_data_size += 4 * 4
-
-                if type_flags & NODE_SABER:
-                    saber_vert_indices = []
-                    for i in range(8):
-                        saber_vert_indices.append(i)
-                    for i in range(20):
-                        for j in range(4):
-                            saber_vert_indices.append(j)
-                    for i in range(8, 16):
-                        saber_vert_indices.append(i)
-                    for i in range(20):
-                        for j in range(8, 12):
-                            saber_vert_indices.append(j)
-                    num_verts = NUM_SABER_VERTS
-                else:
-                    num_verts = len(node.verts)
-
-                num_faces = len(node.facelist.vertices)
-
-                num_textures = 0
-                if node.uv1:
-                    num_textures += 1
-                if node.uv2:
-                    num_textures += 1
-
-                has_lightmap = node.lightmapped
-                rotate_texture = node.rotatetexture
-                background_geometry = node.background_geometry
-                shadow = node.shadow
-                beaming = node.beaming
-                render = node.render
-                dirt_enabled = node.dirt_enabled
-                dirt_texture = node.dirt_texture
-                dirt_coord_space = node.dirt_worldspace
-                hide_in_holograms = node.hologram_donotdraw
-                total_area = self.mesh_total_areas[node_idx]
-                mdx_offset = self.mdx_offsets[node_idx]
-                if not self.xbox:
-                    off_vert_array = self.verts_offsets[node_idx]
-
-                self.mdl.write_uint32(fn_ptr1)
-                self.mdl.write_uint32(fn_ptr2)
-                self.put_array_def(self.faces_offsets[node_idx], num_faces)  # faces
-                for val in bounding_box:
-                    self.mdl.write_float(val)
-                self.mdl.write_float(radius)
-                for val in average:
-                    self.mdl.write_float(val)
-                for val in diffuse:
-                    self.mdl.write_float(val)
-                for val in ambient:
-                    self.mdl.write_float(val)
-                self.mdl.write_uint32(transparency_hint)
-                self.mdl.write_string(bitmap)
-                self.mdl.write_string(bitmap2)
-                self.mdl.write_string(bitmap3)
-                self.mdl.write_string(bitmap4)
-
-                if type_flags & NODE_SABER:
-                    self.put_array_def(
-                        self.index_count_offsets[node_idx], 0
-                    )  # indices count
-                    self.put_array_def(
-                        self.index_offset_offsets[node_idx], 0
-                    )  # indices offset
-                    self.put_array_def(
-                        self.inv_count_offsets[node_idx], 0
-                    )  # inverted counter
-                else:
-                    self.put_array_def(
-                        self.index_count_offsets[node_idx], 1
-                    )  # indices count
-                    self.put_array_def(
-                        self.index_offset_offsets[node_idx], 1
-                    )  # indices offset
-                    self.put_array_def(
-                        self.inv_count_offsets[node_idx], 1
-                    )  # inverted counter
-
-                self.mdl.write_uint32(0xFFFFFFFF)  # unknown
-                self.mdl.write_uint32(0xFFFFFFFF)  # unknown
-                self.mdl.write_uint32(0)  # unknown
-                self.mdl.write_uint8(3)  # saber unknown
-                for _ in range(7):
-                    self.mdl.write_uint8(0)  # saber unknown
-                self.mdl.write_uint32(animate_uv)
-                self.mdl.write_float(uv_dir_x)
-                self.mdl.write_float(uv_dir_y)
-                self.mdl.write_float(uv_jitter)
-                self.mdl.write_float(uv_jitter_speed)
-                self.mdl.write_uint32(mdx_data_size)
-                self.mdl.write_uint32(mdx_data_bitmap)
-                self.mdl.write_uint32(off_mdx_verts)
-                self.mdl.write_uint32(off_mdx_normals)
-                self.mdl.write_uint32(off_mdx_colors)
-                self.mdl.write_uint32(off_mdx_uv1)
-                self.mdl.write_uint32(off_mdx_uv2)
-                self.mdl.write_uint32(off_mdx_uv3)
-                self.mdl.write_uint32(off_mdx_uv4)
-                self.mdl.write_uint32(off_mdx_tan_space1)
-                self.mdl.write_uint32(off_mdx_tan_space2)
-                self.mdl.write_uint32(off_mdx_tan_space3)
-                self.mdl.write_uint32(off_mdx_tan_space4)
-                self.mdl.write_uint16(num_verts)
-                self.mdl.write_uint16(num_textures)
-                self.mdl.write_uint8(has_lightmap)
-                self.mdl.write_uint8(rotate_texture)
-                self.mdl.write_uint8(background_geometry)
-                self.mdl.write_uint8(shadow)
-                self.mdl.write_uint8(beaming)
-                self.mdl.write_uint8(render)
-
-                if self.tsl:
-                    self.mdl.write_uint8(dirt_enabled)
-                    self.mdl.write_uint8(0)  # padding
-                    self.mdl.write_uint16(dirt_texture)
-                    self.mdl.write_uint16(dirt_coord_space)
-                    self.mdl.write_uint8(hide_in_holograms)
-                    self.mdl.write_uint8(0)  # padding
-
-                self.mdl.write_uint16(0)  # padding
-                self.mdl.write_float(total_area)
-                self.mdl.write_uint32(0)  # padding
-                self.mdl.write_uint32(mdx_offset)
-                if not self.xbox:
-                    self.mdl.write_uint32(off_vert_array)
-
-            # Skin Header
-
-            if type_flags & NODE_SKIN:
-                bone_names = set()
-                for vert_weights in node.weights:
-                    for bone_name, _ in vert_weights:
-                        bone_names.add(bone_name)
-                bone_indices = []
-                for bone_name in bone_names:
-                    bone_indices.append(self.node_idx_by_name[bone_name])
-                bonemap = [-1] * len(self.nodes)
-                for bone_idx, bone_node_idx in enumerate(bone_indices):
-                    bonemap[bone_node_idx] = bone_idx
-
-                if self.xbox:
-                    off_mdx_bone_indices = mdx_data_size - 2 * 4
-                    off_mdx_bone_weights = off_mdx_bone_indices - 4 * 4
-                else:
-                    off_mdx_bone_indices = mdx_data_size - 4 * 4
-                    off_mdx_bone_weights = off_mdx_bone_indices - 4 * 4
-                off_bonemap = self.bonemap_offsets[node_idx]
-                num_bones = len(self.nodes)
-
-                self.put_array_def(0, 0)  # unknown
-                self.mdl.write_uint32(off_mdx_bone_weights)
-                self.mdl.write_uint32(off_mdx_bone_indices)
-                self.mdl.write_uint32(off_bonemap)
-                self.mdl.write_uint32(num_bones)
-                self.put_array_def(self.qbone_offsets[node_idx], num_bones)  # QBones
-                self.put_array_def(self.tbone_offsets[node_idx], num_bones)  # TBones
-                self.put_array_def(
-                    self.skin_garbage_offsets[node_idx], num_bones
-                )  # garbage
-                for i in range(16):
-                    if i < len(bone_indices):
-                        self.mdl.write_uint16(bone_indices[i])
-                    else:
-                        self.mdl.write_uint16(0xFFFF)
-                self.mdl.write_uint32(0)  # padding
-
-            # Dangly Header
-
-            if type_flags & NODE_DANGLY:
-                displacement = node.displacement
-                tightness = node.tightness
-                period = node.period
-                off_vert_data = self.dangly_verts_offsets[node_idx]
-
-                self.put_array_def(
-                    self.constraints_offsets[node_idx], len(node.constraints)
-                )
-                self.mdl.write_float(displacement)
-                self.mdl.write_float(tightness)
-                self.mdl.write_float(period)
-                self.mdl.write_uint32(off_vert_data)
-
-            # AABB Header
-
-            if type_flags & NODE_AABB:
-                self.mdl.write_uint32(self.aabb_offsets[node_idx][0])
-
-            # Saber Header
-
-            if type_flags & NODE_SABER:
-                saber_inv_count1 = self.get_inverted_counter(num_meshes + 1)
-                saber_inv_count2 = self.get_inverted_counter(num_meshes + 2)
-                num_meshes += 2
-
-                self.mdl.write_uint32(self.saber_verts_offsets[node_idx])
-                self.mdl.write_uint32(self.saber_uv_offsets[node_idx])
-                self.mdl.write_uint32(self.saber_normals_offsets[node_idx])
-                self.mdl.write_uint32(saber_inv_count1)
-                self.mdl.write_uint32(saber_inv_count2)
-
-            # Mesh Data
-
-            if type_flags & NODE_MESH:
-                # Face Adjacencies
-                face_adjacencies = []
-                for face_idx in range(num_faces):
-                    face_adjacencies.append([-1, -1, -1])
-                for face_idx, face in enumerate(node.facelist.vertices):
-                    edges = [
-                        tuple(sorted(edge))
-                        for edge in [
-                            (face[0], face[1]),
-                            (face[1], face[2]),
-                            (face[2], face[0]),
-                        ]
-                    ]
-                    for other_face_idx in range(face_idx + 1, num_faces):
-                        other_face = node.facelist.vertices[other_face_idx]
-                        other_edges = [
-                            tuple(sorted(edge))
-                            for edge in [
-                                (other_face[0], other_face[1]),
-                                (other_face[1], other_face[2]),
-                                (other_face[2], other_face[0]),
-                            ]
-                        ]
-                        num_adj_faces = 0
-                        for i in range(3):
-                            if face_adjacencies[face_idx][i] != -1:
-                                num_adj_faces += 1
-                                continue
-                            for j in range(3):
-                                if edges[i] == other_edges[j]:
-                                    face_adjacencies[face_idx][i] = other_face_idx
-                                    face_adjacencies[other_face_idx][j] = face_idx
-                                    num_adj_faces += 1
-                                    break
-                        if num_adj_faces == 3:
-                            break
-
-                # Faces
-                for face_idx, face in enumerate(node.facelist.vertices):
-                    vert1 = Vector(node.verts[face[0]])
-                    normal = Vector(node.facelist.normals[face_idx])
-                    distance = -1.0 * (normal @ vert1)
-                    material_id = node.facelist.materials[face_idx]
-
-                    for val in normal:
-                        self.mdl.write_float(val)
-                    self.mdl.write_float(distance)
-                    self.mdl.write_uint32(material_id)
-                    for val in face_adjacencies[face_idx]:
-                        self.mdl.write_int16(val)
-                    for val in face:
-                        self.mdl.write_uint16(val)
-
-                # Vertex Indices Offset
-                if not type_flags & NODE_SABER:
-                    self.mdl.write_uint32(self.indices_offsets[node_idx])
-
-                # Vertices
-                if not self.xbox:
-                    if type_flags & NODE_SABER:
-                        for vert_idx in saber_vert_indices:
-                            for val in node.verts[vert_idx]:
-                                self.mdl.write_float(val)
-                    else:
-                        for vert in node.verts:
-                            for val in vert:
-                                self.mdl.write_float(val)
-
-                # Vertex Indices Count, Inverted Mesh Counter, Vertex Indices
-                if not type_flags & NODE_SABER:
-                    num_meshes += 1
-                    mesh_inv_count = self.get_inverted_counter(num_meshes)
-
-                    self.mdl.write_uint32(
-                        3 * len(node.facelist.vertices)
-                    )  # vertex index count
-                    self.mdl.write_uint32(mesh_inv_count)  # inverted mesh counter
-
-                    # Vertex Indices
-                    for face in node.facelist.vertices:
-                        for val in face:
-                            self.mdl.write_uint16(val)
-
-                # MDX data
-                if not type_flags & NODE_SABER:
-                    for vert_idx, vert in enumerate(node.verts):
-                        for val in vert:
-                            self.mdx.write_float(val)
-                        if self.xbox:
-                            comp = self.compress_vector_xbox(node.normals[vert_idx])
-                            self.mdx.write_uint32(comp)
-                        else:
-                            for val in node.normals[vert_idx]:
-                                self.mdx.write_float(val)
-                        if node.uv1:
-                            for val in node.uv1[vert_idx]:
-                                self.mdx.write_float(val)
-                        if node.uv2:
-                            for val in node.uv2[vert_idx]:
-                                self.mdx.write_float(val)
-                        if node.tangentspace:
-                            if self.xbox:
-                                comp = self.compress_vector_xbox(
-                                    node.bitangents[vert_idx]
-                                )
-                                self.mdx.write_uint32(comp)
-                                comp = self.compress_vector_xbox(
-                                    node.tangents[vert_idx]
-                                )
-                                self.mdx.write_uint32(comp)
-                                comp = self.compress_vector_xbox(
-                                    node.tangentspacenormals[vert_idx]
-                                )
-                                self.mdx.write_uint32(comp)
-                            else:
-                                for val in node.bitangents[vert_idx]:
-                                    self.mdx.write_float(val)
-                                for val in node.tangents[vert_idx]:
-                                    self.mdx.write_float(val)
-                                for val in node.tangentspacenormals[vert_idx]:
-                                    self.mdx.write_float(val)
-                        if type_flags & NODE_SKIN:
-                            vert_weights = node.weights[vert_idx]
-                            bone_weights = []
-                            for bone_name, weight in vert_weights:
-                                bone_node_idx = self.node_idx_by_name[bone_name]
-                                bone_idx = bonemap[bone_node_idx]
-                                bone_weights.append((bone_idx, weight))
-                            for i in range(4):
-                                if i < len(bone_weights):
-                                    self.mdx.write_float(bone_weights[i][1])
-                                else:
-                                    self.mdx.write_float(0.0)
-                            if self.xbox:
-                                for i in range(4):
-                                    if i < len(bone_weights):
-                                        self.mdx.write_uint16(bone_weights[i][0])
-                                    else:
-                                        self.mdx.write_uint16(0xFFFF)
-                            else:
-                                for i in range(4):
-                                    if i < len(bone_weights):
-                                        self.mdx.write_float(float(bone_weights[i][0]))
-                                    else:
-                                        self.mdx.write_float(-1.0)
-                    # Extra MDX data
-                    for _ in range(3):
-                        self.mdx.write_float(1e7)
-                    if self.xbox:
-                        self.mdx.write_uint32(0)
-                    else:
-                        for _ in range(3):
-                            self.mdx.write_float(0.0)
-                    if node.uv1:
-                        for _ in range(2):
-                            self.mdx.write_float(0.0)
-                    if node.uv2:
-                        for _ in range(2):
-                            self.mdx.write_float(0.0)
-                    if node.tangentspace:
-                        if self.xbox:
-                            for _ in range(3):
-                                self.mdx.write_uint32(0)
-                        else:
-                            for _ in range(9):
-                                self.mdx.write_float(0.0)
-                    if type_flags & NODE_SKIN:
-                        weights = (1.0, 0.0, 0.0, 0.0)
-                        for val in weights:
-                            self.mdx.write_float(val)
-                        if self.xbox:
-                            for _ in range(4):
-                                self.mdx.write_uint16(0)
-                        else:
-                            for _ in range(4):
-                                self.mdx.write_float(0.0)
-
-            # Skin Data
 
-            if type_flags & NODE_SKIN:
-                # Bonemap
-                for bone_idx in bonemap:
-                    if self.xbox:
-                        self.mdl.write_uint16(bone_idx if bone_idx != -1 else 0xFFFF)
-                    else:
-                        self.mdl.write_float(float(bone_idx))
-
-                num_bones = len(bonemap)
-
-                # QBones, TBones
-                qbones = [None] * num_bones
-                tbones = [None] * num_bones
-                for i in range(num_bones):
-                    bone_trans = self.nodes[i].from_root.inverted() @ node.from_root
-                    tbones[i], qbones[i], _ = bone_trans.decompose()
-                for i in range(num_bones):
-                    qbone = qbones[i]
-                    self.mdl.write_float(qbone.w)
-                    self.mdl.write_float(qbone.x)
-                    self.mdl.write_float(qbone.y)
-                    self.mdl.write_float(qbone.z)
-                for i in range(num_bones):
-                    tbone = tbones[i]
-                    self.mdl.write_float(tbone.x)
-                    self.mdl.write_float(tbone.y)
-                    self.mdl.write_float(tbone.z)
-
-                # Garbage
-                for _ in range(num_bones):
-                    self.mdl.write_uint32(0)
+    def save_controller_data(self, ctrl_data, anim):
+        for val in ctrl_data:
+            if anim and type(val) is int:
+                self.mdl.write_uint32(val)
+            else:
+                self.mdl.write_float(val)
 
-            # Dangly Data
+    def save_node_header(self, node_idx, node, type_flags, ctrl_count, data_count):
+        node_number = node.node_number
+        name_index = node_idx
+        off_root = 0
+        parent_idx = self.parent_indices[node_idx]
+        off_parent = (
+            self.mdl_layout.offset("node_header", parent_idx)
+            if parent_idx is not None
+            else 0
+        )
+        position = node.position
+        orientation = node.orientation
+        child_indices = self.child_indices[node_idx]
+
+        self.mdl.write_uint16(type_flags)
+        self.mdl.write_uint16(node_number)
+        self.mdl.write_uint16(name_index)
+        self.mdl.write_uint16(0)  # padding
+        self.mdl.write_uint32(off_root)
+        self.mdl.write_uint32(off_parent)
+        for val in position:
+            self.mdl.write_float(val)
+        for val in orientation:
+            self.mdl.write_float(val)
+        self.put_array_def(
+            self.mdl_layout.offset("children", node_idx), len(child_indices)
+        )
+        self.put_array_def(self.mdl_layout.offset("controllers", node_idx), ctrl_count)
+        self.put_array_def(
+            self.mdl_layout.offset("controller_data", node_idx), data_count
+        )
 
-            if type_flags & NODE_DANGLY:
-                for val in node.constraints:
-                    self.mdl.write_float(val)
-                for vert in node.verts:
-                    for val in vert:
-                        self.mdl.write_float(val)
+    def save_light_header(self, node_idx, node):
+        shadow = node.shadow
+        light_priority = node.lightpriority
+        ambient_only = node.ambientonly
+        dynamic_type = node.dynamictype
+        affect_dynamic = node.affectdynamic
+        fading_light = node.fadinglight
+        flare = 0  # always 0
+        flare_radius = node.flareradius
+
+        def flare_offset(kind):
+            return self.mdl_layout.offset(kind, node_idx) if node.lensflares else 0
+
+        self.mdl.write_float(flare_radius)
+        self.put_array_def(0, 0)  # unknown
+        self.put_array_def(flare_offset("flare_sizes"), len(node.flare_list.sizes))
+        self.put_array_def(
+            flare_offset("flare_positions"), len(node.flare_list.positions)
+        )
+        self.put_array_def(
+            flare_offset("flare_colorshifts"), len(node.flare_list.colorshifts)
+        )
+        self.put_array_def(
+            flare_offset("flare_texture_offsets"), len(node.flare_list.textures)
+        )
+        self.mdl.write_int32(light_priority)
+        self.mdl.write_uint32(ambient_only)
+        self.mdl.write_uint32(dynamic_type)
+        self.mdl.write_uint32(affect_dynamic)
+        self.mdl.write_uint32(shadow)
+        self.mdl.write_uint32(flare)
+        self.mdl.write_uint32(fading_light)
+
+    def save_flare_texture_offsets(self, node_idx, node):
+        for tex_idx in range(len(node.flare_list.textures)):
+            self.mdl.write_uint32(
+                self.mdl_layout.offset("flare_texture", (node_idx, tex_idx))
+            )
 
-            # AABB Data
+    def save_emitter_header(self, node):
+        update = node.update.ljust(32, "\0")
+        render = node.emitter_render.ljust(32, "\0")
+        blend = node.blend.ljust(32, "\0")
+        texture = node.texture.ljust(32, "\0")
+        chunk_name = node.chunk_name.ljust(16, "\0")
+        twosided_tex = 1 if node.twosidedtex else 0
+        loop = 1 if node.loop else 0
+        frame_blending = 1 if node.frame_blending else 0
+        depth_texture_name = node.depth_texture_name.ljust(32, "\0")
+
+        flags = 0
+        if node.p2p:
+            flags |= EMITTER_FLAG_P2P
+        if node.p2p_sel:
+            flags |= EMITTER_FLAG_P2P_SEL
+        if node.affected_by_wind:
+            flags |= EMITTER_FLAG_AFFECTED_WIND
+        if node.tinted:
+            flags |= EMITTER_FLAG_TINTED
+        if node.bounce:
+            flags |= EMITTER_FLAG_BOUNCE
+        if node.random:
+            flags |= EMITTER_FLAG_RANDOM
+        if node.inherit:
+            flags |= EMITTER_FLAG_INHERIT
+        if node.inheritvel:
+            flags |= EMITTER_FLAG_INHERIT_VEL
+        if node.inherit_local:
+            flags |= EMITTER_FLAG_INHERIT_LOCAL
+        if node.splat:
+            flags |= EMITTER_FLAG_SPLAT
+        if node.inherit_part:
+            flags |= EMITTER_FLAG_INHERIT_PART
+        if node.depth_texture:
+            flags |= EMITTER_FLAG_DEPTH_TEXTURE
+
+        self.mdl.write_float(node.deadspace)
+        self.mdl.write_float(node.blastradius)
+        self.mdl.write_float(node.blastlength)
+        self.mdl.write_uint32(node.num_branches)
+        self.mdl.write_float(node.controlptsmoothing)
+        self.mdl.write_uint32(node.xgrid)
+        self.mdl.write_uint32(node.ygrid)
+        self.mdl.write_uint32(node.spawntype)
+        self.mdl.write_string(update)
+        self.mdl.write_string(render)
+        self.mdl.write_string(blend)
+        self.mdl.write_string(texture)
+        self.mdl.write_string(chunk_name)
+        self.mdl.write_uint32(twosided_tex)
+        self.mdl.write_uint32(loop)
+        self.mdl.write_uint16(node.renderorder)
+        self.mdl.write_uint8(frame_blending)
+        self.mdl.write_string(depth_texture_name)
+        self.mdl.write_uint8(0)  # padding
+        self.mdl.write_uint32(flags)
+
+    def save_reference_header(self, node):
+        ref_model = node.refmodel.ljust(32, "\0")
+        reattachable = node.reattachable
+
+        self.mdl.write_string(ref_model)
+        self.mdl.write_uint32(reattachable)
+
+    def save_mesh_header(self, node_idx, node, type_flags, mdx_dtype):
+        layout = self.mdl_layout
+        fn_ptr1, fn_ptr2 = self.get_mesh_fn_ptr(type_flags)
+
+        bounding_box, average, radius, total_area = self.get_export_data(
+            node, "bounds", partial(self.get_mesh_bounds, node)
+        )
+        diffuse = node.diffuse
+        ambient = node.ambient
+        transparency_hint = node.transparencyhint
+        bitmap = node.bitmap.ljust(32, "\0")
+        bitmap2 = node.bitmap2.ljust(32, "\0")
+        bitmap3 = "".ljust(12, "\0")
+        bitmap4 = "".ljust(12, "\0")
+        animate_uv = node.animateuv
+        uv_dir_x = node.uvdirectionx
+        uv_dir_y = node.uvdirectiony
+        uv_jitter = node.uvjitter
+        uv_jitter_speed = node.uvjitterspeed
+
+        mdx_data_size = 0
+        mdx_data_bitmap = 0
+        mdx_field_offsets = dict()
+        if mdx_dtype is not None:
+            mdx_data_size = mdx_dtype.itemsize
+            for name, flag in MDX_FIELD_FLAGS:
+                if name in mdx_dtype.fields:
+                    mdx_data_bitmap |= flag
+                    mdx_field_offsets[name] = mdx_dtype.fields[name][1]
+        off_mdx_verts = mdx_field_offsets.get("position", 0xFFFFFFFF)
+        off_mdx_normals = mdx_field_offsets.get("normal", 0xFFFFFFFF)
+        off_mdx_colors = 0xFFFFFFFF
+        off_mdx_uv1 = mdx_field_offsets.get("uv1", 0xFFFFFFFF)
+        off_mdx_uv2 = mdx_field_offsets.get("uv2", 0xFFFFFFFF)
+        off_mdx_uv3 = 0xFFFFFFFF
+        off_mdx_uv4 = 0xFFFFFFFF
+        off_mdx_tan_space1 = mdx_field_offsets.get("tangent_space", 0xFFFFFFFF)
+        off_mdx_tan_space2 = 0xFFFFFFFF
+        off_mdx_tan_space3 = 0xFFFFFFFF
+        off_mdx_tan_space4 = 0xFFFFFFFF
+
+        if type_flags & NODE_SABER:
+            num_verts = NUM_SABER_VERTS
+            num_indices = 0
+        else:
+            num_verts = len(node.verts)
+            num_indices = 1
+        num_faces = len(node.facelist.vertices)
+
+        num_textures = 0
+        if node.uv1:
+            num_textures += 1
+        if node.uv2:
+            num_textures += 1
+
+        has_lightmap = node.lightmapped
+        rotate_texture = node.rotatetexture
+        background_geometry = node.background_geometry
+        shadow = node.shadow
+        beaming = node.beaming
+        render = node.render
+        dirt_enabled = node.dirt_enabled
+        dirt_texture = node.dirt_texture
+        dirt_coord_space = node.dirt_worldspace
+        hide_in_holograms = node.hologram_donotdraw
+        if type_flags & NODE_SABER:
+            mdx_offset = 0
+        else:
+            mdx_offset = self.mdx_layout.offset("mdx", node_idx)
 
-            if type_flags & NODE_AABB:
-                for aabb in self.aabbs[node_idx]:
-                    child_idx1 = aabb[6]
-                    child_idx2 = aabb[7]
-                    face_idx = aabb[8]
-                    split_axis = aabb[9]
-
-                    if face_idx == -1:
-                        off_child1 = self.aabb_offsets[node_idx][child_idx1]
-                        off_child2 = self.aabb_offsets[node_idx][child_idx2]
-                    else:
-                        off_child1 = 0
-                        off_child2 = 0
-
-                    switch = {
-                        -3: AABB_NEGATIVE_Z,
-                        -2: AABB_NEGATIVE_Y,
-                        -1: AABB_NEGATIVE_X,
-                        0: AABB_NO_CHILDREN,
-                        1: AABB_POSITIVE_X,
-                        2: AABB_POSITIVE_Y,
-                        3: AABB_POSITIVE_Z,
-                    }
-                    most_significant_plane = switch[split_axis]
-
-                    # Bounding Box
-                    for val in aabb[:6]:
-                        self.mdl.write_float(val)
-
-                    self.mdl.write_uint32(off_child1)
-                    self.mdl.write_uint32(off_child2)
-                    self.mdl.write_int32(face_idx)
-                    self.mdl.write_uint32(most_significant_plane)
+        self.mdl.write_uint32(fn_ptr1)
+        self.mdl.write_uint32(fn_ptr2)
+        self.put_array_def(layout.offset("faces", node_idx), num_faces)  # faces
+        for val in bounding_box:
+            self.mdl.write_float(val)
+        self.mdl.write_float(radius)
+        for val in average:
+            self.mdl.write_float(val)
+        for val in diffuse:
+            self.mdl.write_float(val)
+        for val in ambient:
+            self.mdl.write_float(val)
+        self.mdl.write_uint32(transparency_hint)
+        self.mdl.write_string(bitmap)
+        self.mdl.write_string(bitmap2)
+        self.mdl.write_string(bitmap3)
+        self.mdl.write_string(bitmap4)
+        self.put_array_def(
+            layout.offset("index_count", node_idx), num_indices
+        )  # indices count
+        self.put_array_def(
+            layout.offset("index_offset", node_idx), num_indices
+        )  # indices offset
+        self.put_array_def(
+            layout.offset("inv_count", node_idx), num_indices
+        )  # inverted counter
+        self.mdl.write_uint32(0xFFFFFFFF)  # unknown
+        self.mdl.write_uint32(0xFFFFFFFF)  # unknown
+        self.mdl.write_uint32(0)  # unknown
+        self.mdl.write_uint8(3)  # saber unknown
+        for _ in range(7):
+            self.mdl.write_uint8(0)  # saber unknown
+        self.mdl.write_uint32(animate_uv)
+        self.mdl.write_float(uv_dir_x)
+        self.mdl.write_float(uv_dir_y)
+        self.mdl.write_float(uv_jitter)
+        self.mdl.write_float(uv_jitter_speed)
+        self.mdl.write_uint32(mdx_data_size)
+        self.mdl.write_uint32(mdx_data_bitmap)
+        self.mdl.write_uint32(off_mdx_verts)
+        self.mdl.write_uint32(off_mdx_normals)
+        self.mdl.write_uint32(off_mdx_colors)
+        self.mdl.write_uint32(off_mdx_uv1)
+        self.mdl.write_uint32(off_mdx_uv2)
+        self.mdl.write_uint32(off_mdx_uv3)
+        self.mdl.write_uint32(off_mdx_uv4)
+        self.mdl.write_uint32(off_mdx_tan_space1)
+        self.mdl.write_uint32(off_mdx_tan_space2)
+        self.mdl.write_uint32(off_mdx_tan_space3)
+        self.mdl.write_uint32(off_mdx_tan_space4)
+        self.mdl.write_uint16(num_verts)
+        self.mdl.write_uint16(num_textures)
+        self.mdl.write_uint8(has_lightmap)
+        self.mdl.write_uint8(rotate_texture)
+        self.mdl.write_uint8(background_geometry)
+        self.mdl.write_uint8(shadow)
+        self.mdl.write_uint8(beaming)
+        self.mdl.write_uint8(render)
 
-            # Saber Data
+        if self.tsl:
+            self.mdl.write_uint8(dirt_enabled)
+            self.mdl.write_uint8(0)  # padding
+            self.mdl.write_uint16(dirt_texture)
+            self.mdl.write_uint16(dirt_coord_space)
+            self.mdl.write_uint8(hide_in_holograms)
+            self.mdl.write_uint8(0)  # padding
 
-            if type_flags & NODE_SABER:
-                for vert_idx in saber_vert_indices:
-                    for val in node.verts[vert_idx]:
-                        self.mdl.write_float(val)
-                for vert_idx in saber_vert_indices:
-                    for val in node.uv1[vert_idx]:
-                        self.mdl.write_float(val)
-                for vert_idx in saber_vert_indices:
-                    for val in node.normals[vert_idx]:
-                        self.mdl.write_float(val)
+        self.mdl.write_uint16(0)  # padding
+        self.mdl.write_float(total_area)
+        self.mdl.write_uint32(0)  # padding
+        self.mdl.write_uint32(mdx_offset)
+        if not self.xbox:
+            self.mdl.write_uint32(layout.offset("verts", node_idx))
+
+    def save_skin_header(self, node_idx, bone_indices, mdx_dtype):
+        layout = self.mdl_layout
+        off_mdx_bone_weights = mdx_dtype.fields["bone_weights"][1]
+        off_mdx_bone_indices = mdx_dtype.fields["bone_indices"][1]
+        num_bones = len(self.nodes)
+
+        self.put_array_def(0, 0)  # unknown
+        self.mdl.write_uint32(off_mdx_bone_weights)
+        self.mdl.write_uint32(off_mdx_bone_indices)
+        self.mdl.write_uint32(layout.offset("bonemap", node_idx))
+        self.mdl.write_uint32(num_bones)
+        self.put_array_def(layout.offset("qbones", node_idx), num_bones)  # QBones
+        self.put_array_def(layout.offset("tbones", node_idx), num_bones)  # TBones
+        self.put_array_def(
+            layout.offset("skin_garbage", node_idx), num_bones
+        )  # garbage
+        for i in range(16):
+            if i < len(bone_indices):
+                self.mdl.write_uint16(bone_indices[i])
+            else:
+                self.mdl.write_uint16(0xFFFF)
+        self.mdl.write_uint32(0)  # padding
 
-            # Children
+    def save_dangly_header(self, node_idx, node):
+        displacement = node.displacement
+        tightness = node.tightness
+        period = node.period
+        off_vert_data = self.mdl_layout.offset("dangly_verts", node_idx)
 
-            for child_idx in child_indices:
-                self.mdl.write_uint32(self.node_offsets[child_idx])
+        self.put_array_def(
+            self.mdl_layout.offset("constraints", node_idx), len(node.constraints)
+        )
+        self.mdl.write_float(displacement)
+        self.mdl.write_float(tightness)
+        self.mdl.write_float(period)
+        self.mdl.write_uint32(off_vert_data)
+
+    def save_aabb_header(self, node_idx):
+        self.mdl.write_uint32(self.mdl_layout.offset("aabb", node_idx))
+
+    def save_saber_header(self, node_idx, saber_inv_count1, saber_inv_count2):
+        self.mdl.write_uint32(self.mdl_layout.offset("saber_verts", node_idx))
+        self.mdl.write_uint32(self.mdl_layout.offset("saber_uv", node_idx))
+        self.mdl.write_uint32(self.mdl_layout.offset("saber_normals", node_idx))
+        self.mdl.write_uint32(saber_inv_count1)
+        self.mdl.write_uint32(saber_inv_count2)
+
+    def save_faces(self, node):
+        self.mdl.write_bytes(
+            self.get_export_data(node, "faces", partial(self.get_face_block, node))
+        )
 
-            # Controllers
+    def get_face_block(self, node):
+        # Face Adjacencies
+        face_adjacencies = [
+            [edge_idx // 3 if edge_idx != -1 else -1 for edge_idx in edges]
+            for edges in find_adjacent_edges(node.facelist.vertices)
+        ]
+
+        face_struct = self.mdl.get_struct("4fI3h3H")
+        block = bytearray()
+        for face_idx, face in enumerate(node.facelist.vertices):
+            vert1 = Vector(node.verts[face[0]])
+            normal = Vector(node.facelist.normals[face_idx])
+            distance = -1.0 * (normal @ vert1)
+            material_id = node.facelist.materials[face_idx]
+
+            block += face_struct.pack(
+                *normal, distance, material_id, *face_adjacencies[face_idx], *face
+            )
+        return bytes(block)
 
-            for key in self.controller_keys[node_idx]:
-                unk1 = 0xFFFF
+    def save_index_offset(self, node_idx):
+        self.mdl.write_uint32(self.mdl_layout.offset("indices", node_idx))
 
-                self.mdl.write_uint32(key.ctrl_type)
-                self.mdl.write_uint16(unk1)
-                self.mdl.write_uint16(key.num_rows)
-                self.mdl.write_uint16(key.timekeys_start)
-                self.mdl.write_uint16(key.values_start)
-                self.mdl.write_uint8(key.num_columns)
+    def save_verts(self, node, type_flags):
+        if type_flags & NODE_SABER:
+            self.save_saber_values(node.verts)
+        else:
+            self.mdl.write_records("3f", node.verts)
 
-                for _ in range(3):
-                    self.mdl.write_uint8(0)  # padding
+    def save_mdx_vertices(self, node, type_flags, mdx_dtype, group_to_bone):
+        if group_to_bone is None:
+            key = ("mdx", self.xbox)
+        else:
+            key = ("mdx", self.xbox, tuple(group_to_bone.tolist()))
+        block = self.get_export_data(
+            node,
+            key,
+            partial(self.get_mdx_block, node, type_flags, mdx_dtype, group_to_bone),
+        )
+        self.mdx.write_bytes(block)
 
-            # Controller Data
+    def get_mdx_block(self, node, type_flags, mdx_dtype, group_to_bone):
+        vertices = self.get_mdx_vertices(node, type_flags, mdx_dtype)
+        if type_flags & NODE_SKIN:
+            self.set_mdx_bones(vertices, node, group_to_bone)
+        return vertices.tobytes()
 
-            for val in self.controller_data[node_idx]:
+    def save_bonemap(self, bonemap):
+        for bone_idx in bonemap:
+            if self.xbox:
+                self.mdl.write_uint16(bone_idx if bone_idx != -1 else 0xFFFF)
+            else:
+                self.mdl.write_float(float(bone_idx))
+
+    def save_qbones(self, qbones):
+        for qbone in qbones:
+            self.mdl.write_float(qbone.w)
+            self.mdl.write_float(qbone.x)
+            self.mdl.write_float(qbone.y)
+            self.mdl.write_float(qbone.z)
+
+    def save_aabbs(self, node_idx, aabbs):
+        # Child offsets are stored relative to the first AABB node
+        records = aabbs.copy()
+        off_aabbs = self.mdl_layout.offset("aabb", node_idx)
+        inner = records["face"] == -1
+        records["child1"][inner] += off_aabbs
+        records["child2"][inner] += off_aabbs
+        self.mdl.write_bytes(records.tobytes())
+
+    def save_saber_values(self, values):
+        for vert_idx in SABER_VERT_INDICES:
+            for val in values[vert_idx]:
                 self.mdl.write_float(val)
 
+    def save_children(self, child_indices):
+        for child_idx in child_indices:
+            self.mdl.write_uint32(self.mdl_layout.offset("node_header", child_idx))
+
     def get_node_flags(self, node):
         switch = {
             NodeType.DUMMY: NODE_BASE,
@@ -1700,22 +1493,40 @@ class MdlWriter:
         area2 = s * (s - a) * (s - b) * (s - c)
         return math.sqrt(area2)
 
-    def generate_aabb_tree(self, node):
-        face_list = []
-        face_idx = 0
-
-        for face in node.facelist.vertices:
-            v0 = Vector(node.verts[face[0]])
-            v1 = Vector(node.verts[face[1]])
-            v2 = Vector(node.verts[face[2]])
-            centroid = (v0 + v1 + v2) / 3
-            face_list.append((face_idx, [v0, v1, v2], centroid))
-            face_idx += 1
-
-        aabbs = []
-        generate_tree(aabbs, face_list)
-
-        return aabbs
+    def get_aabb_records(self, node):
+        aabbs = generate_tree(node.verts, node.facelist.vertices, self.aabb_split_mode)
+        bo = self.mdl.bo_literal
+        records = np.zeros(
+            len(aabbs),
+            dtype=[
+                ("bounding_box", bo + "f4", 6),
+                ("child1", bo + "u4"),
+                ("child2", bo + "u4"),
+                ("face", bo + "i4"),
+                ("plane", bo + "u4"),
+            ],
+        )
+        if not aabbs:
+            return records
+        aabbs = np.array(aabbs, dtype=np.float64)
+        records["bounding_box"] = aabbs[:, :6]
+        face_indices = aabbs[:, 8].astype(np.int32)
+        inner = face_indices == -1
+        records["child1"][inner] = 40 * aabbs[inner, 6].astype(np.uint32)
+        records["child2"][inner] = 40 * aabbs[inner, 7].astype(np.uint32)
+        records["face"] = face_indices
+        records["plane"] = AABB_PLANES[aabbs[:, 9].astype(np.int32) + 3]
+        return records
+
+    def get_export_data(self, node, key, compute):
+        # Reuses data computed in a previous incremental export of an unchanged
+        # mesh
+        blocks = node.export_blocks
+        if blocks is None:
+            return compute()
+        if key not in blocks:
+            blocks[key] = compute()
+        return blocks[key]
 
     def get_inverted_counter(self, count):
         quo = count // 100
@@ -1729,24 +1540,152 @@ class MdlWriter:
         self.mdl.write_uint32(count)
         self.mdl.write_uint32(count)
 
-    def compress_vector_xbox(self, vec):
-        x, y, z = vec
-        if abs(x) > 1.0 or abs(y) > 1.0 or abs(z) > 1.0:
-            return 0
-
-        tmp = round(511.0 * z)
-        if z < 0.0:
-            tmp = 1023 + tmp
-        comp = tmp
-
-        tmp = round(1023.0 * y)
-        if y < 0.0:
-            tmp = 2047 + tmp
-        comp = (comp << 11) | tmp
-
-        tmp = round(1023.0 * x)
-        if x < 0.0:
-            tmp = 2047 + tmp
-        comp = (comp << 11) | tmp
+    def get_mesh_bounds(self, node):
+        # Bounding Box, Average, Total Area
+        bb_min = Vector()
+        bb_max = Vector()
+        average = Vector()
+        total_area = 0.0
+        if node.facelist.vertices:
+            for face in node.facelist.vertices:
+                verts = [Vector(node.verts[i]) for i in face]
+                for vert in verts:
+                    bb_min.x = min(bb_min.x, vert.x)
+                    bb_min.y = min(bb_min.y, vert.y)
+                    bb_min.z = min(bb_min.z, vert.z)
+                    bb_max.x = max(bb_max.x, vert.x)
+                    bb_max.y = max(bb_max.y, vert.y)
+                    bb_max.z = max(bb_max.z, vert.z)
+                    average += vert
+                edge1 = verts[1] - verts[0]
+                edge2 = verts[2] - verts[0]
+                edge3 = verts[2] - verts[1]
+                area = self.calculate_face_area(edge1, edge2, edge3)
+                if area != 1.0:
+                    total_area += area
+            average /= 3 * len(node.facelist.vertices)
+
+        # Radius
+        radius = 0.0
+        for face in node.facelist.vertices:
+            verts = [Vector(node.verts[i]) for i in face]
+            for vert in verts:
+                radius = max(radius, (vert - average).length)
+
+        return [*bb_min, *bb_max], [*average], radius, total_area
+
+    def get_skin_bones(self, node):
+        # Node indices of used bones, bonemap and a lookup from the node's
+        # bone indices to indices into the bonemap
+        vert_bone_indices = np.asarray(node.bone_indices, dtype=np.int32)
+        used_bones = vert_bone_indices[vert_bone_indices != -1]
+        _, first_use = np.unique(used_bones, return_index=True)
+        bone_names = set()
+        for bone_idx in used_bones[np.sort(first_use)].tolist():
+            bone_names.add(node.bone_names[bone_idx])
+        bone_indices = []
+        for bone_name in bone_names:
+            bone_indices.append(self.node_idx_by_name[bone_name])
+        bonemap = [-1] * len(self.nodes)
+        for bone_idx, bone_node_idx in enumerate(bone_indices):
+            bonemap[bone_node_idx] = bone_idx
+        group_to_bone = np.full(len(node.bone_names), -1, dtype=np.int32)
+        for group_idx in np.unique(used_bones).tolist():
+            bone_node_idx = self.node_idx_by_name[node.bone_names[group_idx]]
+            group_to_bone[group_idx] = bonemap[bone_node_idx]
+        return bone_indices, bonemap, group_to_bone
+
+    def get_skin_bone_transforms(self, node):
+        qbones = []
+        tbones = []
+        for bone_node in self.nodes:
+            bone_trans = bone_node.from_root.inverted() @ node.from_root
+            tbone, qbone, _ = bone_trans.decompose()
+            qbones.append(qbone)
+            tbones.append(tbone)
+        return qbones, tbones
+
+    # Record type of the interleaved MDX vertex block of a mesh node
+    def get_mdx_dtype(self, node, type_flags):
+        float_format = self.mdx.bo_literal + "f4"
+        uint_format = self.mdx.bo_literal + "u4"
+        fields = [("position", (float_format, 3))]
+        if self.xbox:
+            fields.append(("normal", uint_format))
+        else:
+            fields.append(("normal", (float_format, 3)))
+        if node.uv1:
+            fields.append(("uv1", (float_format, 2)))
+        if node.uv2:
+            fields.append(("uv2", (float_format, 2)))
+        if node.tangentspace:
+            if self.xbox:
+                fields.append(("tangent_space", (uint_format, 3)))
+            else:
+                fields.append(("tangent_space", (float_format, 9)))
+        if type_flags & NODE_SKIN:
+            fields.append(("bone_weights", (float_format, 4)))
+            if self.xbox:
+                fields.append(("bone_indices", (self.mdx.bo_literal + "u2", 4)))
+            else:
+                fields.append(("bone_indices", (float_format, 4)))
+        return np.dtype(fields)
+
+    # Builds the interleaved MDX vertex block of a mesh node, followed by the
+    # terminating vertex the engine expects
+    def get_mdx_vertices(self, node, type_flags, mdx_dtype):
+        num_verts = len(node.verts)
+        vertices = np.zeros(num_verts + 1, dtype=mdx_dtype)
+        vertices["position"][:num_verts] = np.reshape(node.verts, (-1, 3))
+        vertices["position"][num_verts] = 1e7
+        normals = np.reshape(node.normals, (-1, 3))
+        if self.xbox:
+            vertices["normal"][:num_verts] = self.compress_vectors_xbox(normals)
+        else:
+            vertices["normal"][:num_verts] = normals
+        if node.uv1:
+            vertices["uv1"][:num_verts] = np.reshape(node.uv1, (-1, 2))
+        if node.uv2:
+            vertices["uv2"][:num_verts] = np.reshape(node.uv2, (-1, 2))
+        if node.tangentspace:
+            tangent_space = np.stack(
+                (
+                    np.reshape(node.bitangents, (-1, 3)),
+                    np.reshape(node.tangents, (-1, 3)),
+                    np.reshape(node.tangentspacenormals, (-1, 3)),
+                ),
+                axis=1,
+            )
+            if self.xbox:
+                tangent_space = self.compress_vectors_xbox(tangent_space)
+            vertices["tangent_space"][:num_verts] = tangent_space.reshape(num_verts, -1)
+        if type_flags & NODE_SKIN:
+            vertices["bone_weights"][num_verts, 0] = 1.0
+        return vertices
 
-        return comp
+    def set_mdx_bones(self, vertices, node, group_to_bone):
+        num_verts = len(node.verts)
+        if not num_verts:
+            return
+        bone_indices = np.asarray(node.bone_indices)
+        unused = bone_indices == -1
+        vertices["bone_weights"][:num_verts] = np.where(unused, 0.0, node.bone_weights)
+        bone_indices = group_to_bone[np.where(unused, 0, bone_indices)]
+        pad = 0xFFFF if self.xbox else -1.0
+        vertices["bone_indices"][:num_verts] = np.where(unused, pad, bone_indices)
+
+    def compress_vectors_xbox(self, vectors):
+        # Packs unit vectors into 11-11-10 bit integers, zero if out of range
+        vectors = np.asarray(vectors, dtype=np.float64)
+        x = vectors[..., 0]
+        y = vectors[..., 1]
+        z = vectors[..., 2]
+        comp_x = np.rint(1023.0 * x).astype(np.int64)
+        comp_x = np.where(x < 0.0, 2047 + comp_x, comp_x)
+        comp_y = np.rint(1023.0 * y).astype(np.int64)
+        comp_y = np.where(y < 0.0, 2047 + comp_y, comp_y)
+        comp_z = np.rint(511.0 * z).astype(np.int64)
+        comp_z = np.where(z < 0.0, 1023 + comp_z, comp_z)
+        comp = (comp_z << 22) | (comp_y << 11) | comp_x
+        in_range = np.all(np.abs(vectors) <= 1.0, axis=-1)
+        return np.where(in_range, comp, 0).astype(np.uint32)
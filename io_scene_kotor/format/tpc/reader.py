@@ -17,7 +17,8 @@
 # ##### END GPL LICENSE BLOCK #####
 
 from enum import Enum
-from struct import unpack
+
+import numpy as np
 
 from ..binreader import BinaryReader, SeekOrigin
 
@@ -39,13 +40,15 @@ class TpcImage:
     def __init__(self, w, h, pixels):
         self.w = w
         self.h = h
-        self.pixels = pixels
+        self.pixels = pixels  # flat float32 RGBA array
         self.txi_lines = []
 
 
 class TpcReader:
-    def __init__(self, path):
+    def __init__(self, path, mip_bias=0, max_resolution=0):
         self.reader = BinaryReader(path)
+        self.mip_bias = mip_bias
+        self.max_resolution = max_resolution
 
     def load(self):
         self.compressed_size = self.reader.read_uint32()
@@ -55,22 +58,32 @@ class TpcReader:
         image_h = self.reader.read_uint16()
         self.encoding = TpcEncoding(self.reader.read_uint8())
         self.num_mips = self.reader.read_uint8()
-        self.reader.seek(128)
 
+        # Mip levels of each cubemap face follow one another
         cubemap = image_h // image_w == 6
+        num_faces = 6 if cubemap else 1
+        face_h = image_w if cubemap else image_h
+        mip_sizes = [
+            self.mip_pixels_size(level, *self.mip_size(image_w, face_h, level))
+            for level in range(0, self.num_mips)
+        ]
+        face_size = sum(mip_sizes)
+
+        # Seek directly to the selected mip level of every face
+        level = self.select_mip_level(image_w, face_h)
+        mip_w, mip_h = self.mip_size(image_w, face_h, level)
+        faces = []
+        for face in range(0, num_faces):
+            self.reader.seek(128 + face * face_size + sum(mip_sizes[:level]))
+            mip = self.read_mip(mip_w, mip_h, level)
+            faces.append(self.decompress_mip_if_compressed(mip))
         if cubemap:
-            sides = []
-            for _ in range(0, 6):
-                mips = self.read_mips(image_w, image_w)
-                top_decomp = self.decompress_mip_if_compressed(mips[0])
-                sides.append(top_decomp)
-            mip = self.merge_cubemap(image_w, image_h, sides)
+            mip = self.merge_cubemap(mip_w, 6 * mip_h, faces)
         else:
-            mips = self.read_mips(image_w, image_h)
-            mip = self.decompress_mip_if_compressed(mips[0])
+            mip = faces[0]
         image = self.mip_to_image(mip)
 
-        current = self.reader.tell()
+        current = 128 + num_faces * face_size
         self.reader.seek(0, SeekOrigin.END)
         filesize = self.reader.tell()
         if filesize > current:
@@ -81,13 +94,14 @@ class TpcReader:
 
         return image
 
-    def read_mips(self, image_w, image_h):
-        mips = []
-        for mip_level in range(0, self.num_mips):
-            mip_w, mip_h = self.mip_size(image_w, image_h, mip_level)
-            mip = self.read_mip(mip_w, mip_h, mip_level)
-            mips.append(mip)
-        return mips
+    def select_mip_level(self, image_w, image_h):
+        level = self.mip_bias
+        if self.max_resolution > 0:
+            while level < self.num_mips - 1 and self.max_resolution < max(
+                self.mip_size(image_w, image_h, level)
+            ):
+                level += 1
+        return max(0, min(level, self.num_mips - 1))
 
     def mip_size(self, image_w, image_h, level):
         return (max(1, image_w >> level), max(1, image_h >> level))
@@ -115,33 +129,30 @@ class TpcReader:
         raise RuntimeError("Unable to calculate size of pixel buffer")
 
     def merge_cubemap(self, w, h, sides):
-        pixels = []
-        for side in sides:
-            pixels.extend(side.pixels)
+        pixels = np.concatenate(
+            [np.frombuffer(side.pixels, dtype=np.uint8) for side in sides]
+        )
         return TpcMip(w, h, pixels)
 
     def mip_to_image(self, mip):
+        # Expands mip pixels to RGBA floats, as stored by Blender images
         if self.encoding == TpcEncoding.GRAYSCALE:
-            pixels = []
-            for i in range(0, mip.w * mip.h):
-                val = mip.pixels[i]
-                pixels.append(val / 255)
-                pixels.append(val / 255)
-                pixels.append(val / 255)
-                pixels.append(1.0)
+            num_channels = 1
         elif self.encoding == TpcEncoding.RGB:
-            pixels = []
-            for i in range(0, mip.w * mip.h):
-                r, g, b = mip.pixels[(3 * i) : (3 * i + 3)]
-                pixels.append(r / 255)
-                pixels.append(g / 255)
-                pixels.append(b / 255)
-                pixels.append(1.0)
+            num_channels = 3
         elif self.encoding == TpcEncoding.RGBA:
-            pixels = [val / 255 for val in mip.pixels]
+            num_channels = 4
         else:
             raise RuntimeError("Unable to convert mip to image")
-        return TpcImage(mip.w, mip.h, pixels)
+        num_pixels = mip.w * mip.h
+        values = np.frombuffer(
+            mip.pixels, dtype=np.uint8, count=num_channels * num_pixels
+        ).reshape(num_pixels, num_channels)
+        pixels = np.empty((num_pixels, 4), dtype=np.float32)
+        pixels[:, 0:3] = values[:, 0:3]
+        pixels[:, 3] = values[:, 3] if num_channels == 4 else 255
+        pixels /= 255
+        return TpcImage(mip.w, mip.h, pixels.reshape(-1))
 
     def decompress_mip_if_compressed(self, mip):
         if not self.compressed:
@@ -152,107 +163,68 @@ class TpcReader:
         raise RuntimeError("Unable to decompress mip")
 
     def decompress_mip_dxt15(self, mip, has_alpha):
+        # Decodes all 4x4 blocks at once: palettes are built per block, then
+        # indexed by per-pixel codes
         num_blocks_x = (mip.w + 3) // 4
         num_blocks_y = (mip.h + 3) // 4
-        pixels_idx = 0
-        out_pixels_size = mip.w * mip.h * (4 if has_alpha else 3)
-        out_pixels = [None] * out_pixels_size
-        for block_y in range(0, num_blocks_y):
-            for block_x in range(0, num_blocks_x):
-                self.decompress_dxt15_block(
-                    mip.w,
-                    mip.pixels,
-                    pixels_idx + (16 if has_alpha else 8) * block_x,
-                    has_alpha,
-                    4 * block_x,
-                    4 * block_y,
-                    out_pixels,
-                )
-            pixels_idx += (16 if has_alpha else 8) * num_blocks_x
-        return out_pixels
+        num_blocks = num_blocks_x * num_blocks_y
+        block_size = 16 if has_alpha else 8
+        blocks = np.frombuffer(
+            mip.pixels, dtype=np.uint8, count=block_size * num_blocks
+        ).reshape(num_blocks, block_size)
+        block_indices = np.arange(num_blocks)[:, np.newaxis]
+
+        # Color palettes
+        colors = blocks[:, -8:-4].copy().view("<u2").astype(np.int32)
+        color_codes = blocks[:, -4:].copy().view("<u4").astype(np.int64)
+        tmp = (colors >> 11) * 255 + 16
+        r = (tmp // 32 + tmp) // 32
+        tmp = ((colors & 0x07E0) >> 5) * 255 + 32
+        g = (tmp // 64 + tmp) // 64
+        tmp = (colors & 0x001F) * 255 + 16
+        b = (tmp // 32 + tmp) // 32
+        endpoints = np.stack([r, g, b], axis=-1)
+        rgb0 = endpoints[:, 0]
+        rgb1 = endpoints[:, 1]
+        # DXT5 blocks always use four colors
+        four_colors = has_alpha | (colors[:, 0:1] > colors[:, 1:2])
+        color_palette = np.stack(
+            [
+                rgb0,
+                rgb1,
+                np.where(four_colors, (2 * rgb0 + rgb1) // 3, (rgb0 + rgb1) // 2),
+                np.where(four_colors, (rgb0 + 2 * rgb1) // 3, 0),
+            ],
+            axis=1,
+        ).astype(np.uint8)
+        color_codes = (color_codes >> (2 * np.arange(16))) & 0x03
+        out_pixels = color_palette[block_indices, color_codes]
 
-    def decompress_dxt15_block(
-        self, mip_w, pixels, pixels_idx, has_alpha, pixel_x, pixel_y, out_pixels
-    ):
         if has_alpha:
-            alphas = pixels[pixels_idx : pixels_idx + 2]
-            alpha_codes = unpack("<Q", pixels[pixels_idx + 2 : pixels_idx + 10])[0]
-            colors = unpack("<HH", pixels[pixels_idx + 8 : pixels_idx + 12])
-            color_codes = unpack("<L", pixels[pixels_idx + 12 : pixels_idx + 16])[0]
-        else:
-            colors = unpack("<HH", pixels[pixels_idx : pixels_idx + 4])
-            color_codes = unpack("<L", pixels[pixels_idx + 4 : pixels_idx + 8])[0]
-        r = []
-        g = []
-        b = []
-        for i in range(0, 2):
-            tmp = (colors[i] >> 11) * 255 + 16
-            r.append((tmp // 32 + tmp) // 32)
-            tmp = ((colors[i] & 0x07E0) >> 5) * 255 + 32
-            g.append((tmp // 64 + tmp) // 64)
-            tmp = (colors[i] & 0x001F) * 255 + 16
-            b.append((tmp // 32 + tmp) // 32)
-        for block_pixel_y in range(0, 4):
-            for block_pixel_x in range(0, 4):
-                if has_alpha:
-                    alpha_code_idx = 3 * (4 * block_pixel_y + block_pixel_x)
-                    alpha_code = (alpha_codes >> alpha_code_idx) & 0x07
-                    if alpha_code == 0:
-                        alpha = alphas[0]
-                    elif alpha_code == 1:
-                        alpha = alphas[1]
-                    elif alphas[0] > alphas[1]:
-                        alpha = (
-                            (8 - alpha_code) * alphas[0] + (alpha_code - 1) * alphas[1]
-                        ) // 7
-                    elif alpha_code == 6:
-                        alpha = 0
-                    elif alpha_code == 7:
-                        alpha = 255
-                    else:
-                        alpha = (
-                            (6 - alpha_code) * alphas[0] + (alpha_code - 1) * alphas[1]
-                        ) // 5
-                else:
-                    alpha = 255
-                color_code_idx = 2 * (4 * block_pixel_y + block_pixel_x)
-                color_code = (color_codes >> color_code_idx) & 0x03
-                if has_alpha or colors[0] > colors[1]:
-                    if color_code == 0:
-                        rgb = (r[0], g[0], b[0])
-                    elif color_code == 1:
-                        rgb = (r[1], g[1], b[1])
-                    elif color_code == 2:
-                        rgb = (
-                            (2 * r[0] + r[1]) // 3,
-                            (2 * g[0] + g[1]) // 3,
-                            (2 * b[0] + b[1]) // 3,
-                        )
-                    elif color_code == 3:
-                        rgb = (
-                            (r[0] + 2 * r[1]) // 3,
-                            (g[0] + 2 * g[1]) // 3,
-                            (b[0] + 2 * b[1]) // 3,
-                        )
-                else:
-                    if color_code == 0:
-                        rgb = (r[0], g[0], b[0])
-                    elif color_code == 1:
-                        rgb = (r[1], g[1], b[1])
-                    elif color_code == 2:
-                        rgb = (
-                            (r[0] + r[1]) // 2,
-                            (g[0] + g[1]) // 2,
-                            (b[0] + b[1]) // 2,
-                        )
-                    elif color_code == 3:
-                        rgb = (0, 0, 0)
-                if pixel_x + block_pixel_x < mip_w:
-                    out_pixels_idx = (pixel_y + block_pixel_y) * mip_w
-                    out_pixels_idx += pixel_x + block_pixel_x
-                    out_pixels_idx *= 4 if has_alpha else 3
-                    out_pixels[out_pixels_idx + 0] = rgb[0]
-                    out_pixels[out_pixels_idx + 1] = rgb[1]
-                    out_pixels[out_pixels_idx + 2] = rgb[2]
-                    if has_alpha:
-                        out_pixels[out_pixels_idx + 3] = alpha
+            # Alpha palettes
+            alphas = blocks[:, 0:2].astype(np.int32)
+            alpha0 = alphas[:, 0:1]
+            alpha1 = alphas[:, 1:2]
+            alpha_codes = np.zeros((num_blocks, 8), dtype=np.uint8)
+            alpha_codes[:, 0:6] = blocks[:, 2:8]
+            alpha_codes = alpha_codes.view("<u8").astype(np.int64)
+            alpha_codes = (alpha_codes >> (3 * np.arange(16))) & 0x07
+            steps = np.arange(2, 8)
+            eight_alphas = ((8 - steps) * alpha0 + (steps - 1) * alpha1) // 7
+            steps = np.arange(2, 6)
+            six_alphas = ((6 - steps) * alpha0 + (steps - 1) * alpha1) // 5
+            six_alphas = np.hstack([six_alphas, np.tile([0, 255], (num_blocks, 1))])
+            alpha_palette = np.hstack(
+                [alphas, np.where(alpha0 > alpha1, eight_alphas, six_alphas)]
+            ).astype(np.uint8)
+            alpha = alpha_palette[block_indices, alpha_codes]
+            out_pixels = np.concatenate([out_pixels, alpha[:, :, np.newaxis]], axis=-1)
+
+        # Rearrange blocks into rows of pixels, cropping partial blocks
+        num_channels = out_pixels.shape[-1]
+        out_pixels = (
+            out_pixels.reshape(num_blocks_y, num_blocks_x, 4, 4, num_channels)
+            .transpose(0, 2, 1, 3, 4)
+            .reshape(4 * num_blocks_y, 4 * num_blocks_x, num_channels)
+        )
+        return out_pixels[: mip.h, : mip.w].reshape(-1)
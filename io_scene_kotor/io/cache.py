@@ -0,0 +1,227 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from mathutils import Matrix
+
+from ..diskcache import evict_entries, get_files_key, touch_entry
+from ..format.mdl.reader import NODE_CLASS_BY_TYPE
+from ..scene.model import Model
+from ..scene.modelnode.aabb import AabbNode
+from ..scene.modelnode.light import LightNode
+from ..scene.modelnode.trimesh import TrimeshNode
+from ..scene.walkmesh import Walkmesh
+from ..utils import logger
+
+# Entries consist of a JSON header and NumPy arrays. The header holds plain
+# attributes of a model and of its nodes, in depth-first order. Mesh data of
+# a node is stored as one array per attribute, named "<node index>.<name>"
+# and "<node index>.facelist.<name>". Animations are not stored, so that
+# they are only decoded when imported.
+CACHE_VERSION = 5
+CACHE_EXT = ".npz"
+
+DEF_CACHE_DIR = os.path.join(tempfile.gettempdir(), "kotorblender", "models")
+
+MESH_ARRAYS = [
+    "verts",
+    "normals",
+    "uv1",
+    "uv2",
+    "tangents",
+    "bitangents",
+    "tangentspacenormals",
+    "bone_indices",
+    "bone_weights",
+    "constraints",
+]
+FACELIST_ARRAYS = ["vertices", "uv", "materials", "normals"]
+
+# Attributes that are not plain values and are stored separately, if at all
+MODEL_OBJECT_ATTRS = ["root_node", "animations"]
+NODE_OBJECT_ATTRS = [
+    "parent",
+    "children",
+    "from_root",
+    "facelist",
+    "flare_list",
+    "roomlinks",
+    "edge_loop_mesh",
+    "export_blocks",
+] + MESH_ARRAYS
+
+
+# Stores parsed models and walkmeshes on disk, so that importing the same
+# file again skips binary parsing. Entries are keyed by the source files.
+class ModelCache:
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    @classmethod
+    def from_options(cls, options):
+        if not options.use_model_cache:
+            return None
+        return ModelCache(
+            options.model_cache_dir or DEF_CACHE_DIR,
+            options.model_cache_size * 1024 * 1024,
+        )
+
+    def get_key(self, kind, paths, extra=""):
+        return get_files_key("{}:{}:{}".format(CACHE_VERSION, kind, extra), paths)
+
+    def load(self, key):
+        path = os.path.join(self.cache_dir, key + CACHE_EXT)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                header = json.loads(npz["header"].tobytes().decode("utf-8"))
+                if header["version"] != CACHE_VERSION:
+                    return None
+                model = decode_model(header, npz)
+            touch_entry([path])
+            return model
+        except Exception:
+            logger().exception(f"Error loading cache entry [{path}]")
+            return None
+
+    def save(self, key, model):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            header, arrays = encode_model(model)
+            header = json.dumps(header).encode("utf-8")
+            path = os.path.join(self.cache_dir, key + CACHE_EXT)
+            temp_path = path + ".tmp"
+            with open(temp_path, "wb") as f:
+                np.savez(f, header=np.frombuffer(header, dtype=np.uint8), **arrays)
+            os.replace(temp_path, path)
+            self.evict()
+        except Exception:
+            logger().exception(f"Error saving cache entry [{key}]")
+
+    def evict(self):
+        evict_entries(self.cache_dir, self.max_size, [CACHE_EXT])
+
+
+def encode_model(model):
+    arrays = dict()
+    nodes = []
+    stack = [(model.root_node, -1)]
+    while stack:
+        node, parent_idx = stack.pop()
+        node_idx = len(nodes)
+        nodes.append(encode_node(node, node_idx, parent_idx, arrays))
+        for child in reversed(node.children):
+            stack.append((child, node_idx))
+    header = {
+        "version": CACHE_VERSION,
+        "walkmesh": isinstance(model, Walkmesh),
+        "attrs": get_plain_attrs(model, MODEL_OBJECT_ATTRS),
+        "nodes": nodes,
+    }
+    return header, arrays
+
+
+def encode_node(node, node_idx, parent_idx, arrays):
+    record = {
+        "type": node.nodetype,
+        "parent": parent_idx,
+        "attrs": get_plain_attrs(node, NODE_OBJECT_ATTRS),
+        "from_root": [list(row) for row in node.from_root],
+    }
+    if isinstance(node, TrimeshNode):
+        for name in MESH_ARRAYS:
+            add_array(arrays, "{}.{}".format(node_idx, name), getattr(node, name))
+        for name in FACELIST_ARRAYS:
+            add_array(
+                arrays,
+                "{}.facelist.{}".format(node_idx, name),
+                getattr(node.facelist, name),
+            )
+    if isinstance(node, LightNode):
+        record["flare_list"] = vars(node.flare_list)
+    if isinstance(node, AabbNode):
+        record["roomlinks"] = list(node.roomlinks.items())
+    return record
+
+
+def get_plain_attrs(obj, object_attrs):
+    return {
+        name: value for name, value in vars(obj).items() if name not in object_attrs
+    }
+
+
+def add_array(arrays, name, values):
+    if not len(values):
+        return
+    array = np.asarray(values)
+    # Most values are read from 32-bit fields, so narrowing them is lossless
+    if array.dtype == np.float64:
+        narrow = array.astype(np.float32)
+        if np.array_equal(narrow, array):
+            array = narrow
+    elif array.dtype == np.int64:
+        if array.min() >= -(2**31) and array.max() < 2**31:
+            array = array.astype(np.int32)
+    arrays[name] = array
+
+
+def decode_model(header, npz):
+    attrs = header["attrs"]
+    model = Walkmesh(attrs["walkmesh_type"]) if header["walkmesh"] else Model()
+    set_attrs(model, attrs)
+
+    array_names = set(npz.files)
+    nodes = []
+    for node_idx, record in enumerate(header["nodes"]):
+        node = NODE_CLASS_BY_TYPE[record["type"]]()
+        set_attrs(node, record["attrs"])
+        node.from_root = Matrix(record["from_root"])
+        if isinstance(node, TrimeshNode):
+            for name in MESH_ARRAYS:
+                array_name = "{}.{}".format(node_idx, name)
+                if array_name in array_names:
+                    setattr(node, name, npz[array_name])
+            for name in FACELIST_ARRAYS:
+                array_name = "{}.facelist.{}".format(node_idx, name)
+                if array_name in array_names:
+                    setattr(node.facelist, name, npz[array_name])
+        if isinstance(node, LightNode):
+            set_attrs(node.flare_list, record["flare_list"])
+        if isinstance(node, AabbNode):
+            node.roomlinks = dict(record["roomlinks"])
+
+        parent_idx = record["parent"]
+        if parent_idx != -1:
+            node.parent = nodes[parent_idx]
+            node.parent.children.append(node)
+        nodes.append(node)
+    model.root_node = nodes[0]
+
+    return model
+
+
+def set_attrs(obj, attrs):
+    for name, value in attrs.items():
+        setattr(obj, name, value)
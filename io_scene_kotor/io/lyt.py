@@ -61,7 +61,7 @@ def load_lyt(operator, filepath, options):
         mdl.load_mdl(operator, mdl_path, options, room[1:])
 
 
-def save_lyt(operator, filepath):
+def save_lyt(operator, filepath, objects=None):
     def describe_object(obj):
         parent = find_mdl_root_of(obj)
         orientation = obj.rotation_euler.to_quaternion()
@@ -79,11 +79,12 @@ def save_lyt(operator, filepath):
         doors = []
         others = []
 
-        objects = (
-            bpy.context.selected_objects
-            if len(bpy.context.selected_objects) > 0
-            else bpy.context.collection.objects
-        )
+        if objects is None:
+            objects = (
+                bpy.context.selected_objects
+                if len(bpy.context.selected_objects) > 0
+                else bpy.context.collection.objects
+            )
         for obj in objects:
             if obj.type == "EMPTY":
                 if obj.kb.dummytype == DummyType.MDLROOT:
@@ -17,6 +17,9 @@
 # ##### END GPL LICENSE BLOCK #####
 
 import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
 
 import bpy
 
@@ -27,14 +30,18 @@ from ..format.mdl.reader import MdlReader
 from ..format.mdl.writer import MdlWriter
 from ..scene.modelnode.aabb import AabbNode
 from ..scene.model import Model
+from ..scene.snapshot import ObjectSnapshot
 from ..scene.walkmesh import Walkmesh
-from ..utils import is_mdl_root, is_pwk_root, is_dwk_root, find_objects
+from ..utils import is_mdl_root, is_pwk_root, logger
+
+from .cache import ModelCache
 
 
 def load_mdl(operator, filepath, options, position=(0.0, 0.0, 0.0)):
+    cache = ModelCache.from_options(options)
+
     operator.report({"INFO"}, "Loading model from '{}'".format(filepath))
-    mdl = MdlReader(filepath)
-    model = mdl.load()
+    model = read_mdl(filepath, cache)
 
     pwk_walkmesh = None
     dwk_walkmesh1 = None
@@ -44,8 +51,7 @@ def load_mdl(operator, filepath, options, position=(0.0, 0.0, 0.0)):
     if options.import_geometry and options.import_walkmeshes:
         wok_path = filepath[:-4] + ".wok"
         if os.path.exists(wok_path):
-            wok = BwmReader(wok_path, model.name)
-            walkmesh = wok.load()
+            walkmesh = read_bwm(wok_path, model.name, cache)
             aabb = model.find_node(lambda n: isinstance(n, AabbNode))
             aabb_wok = walkmesh.find_node(lambda n: isinstance(n, AabbNode))
             if aabb and aabb_wok:
@@ -55,8 +61,7 @@ def load_mdl(operator, filepath, options, position=(0.0, 0.0, 0.0)):
         pwk_path = filepath[:-4] + ".pwk"
         if os.path.exists(pwk_path):
             operator.report({"INFO"}, "Loading walkmesh from '{}'".format(pwk_path))
-            pwk = BwmReader(pwk_path, model.name)
-            pwk_walkmesh = pwk.load()
+            pwk_walkmesh = read_bwm(pwk_path, model.name, cache)
 
         dwk0_path = filepath[:-4] + "0.dwk"
         dwk1_path = filepath[:-4] + "1.dwk"
@@ -67,14 +72,11 @@ def load_mdl(operator, filepath, options, position=(0.0, 0.0, 0.0)):
             and os.path.exists(dwk2_path)
         ):
             operator.report({"INFO"}, "Loading walkmesh from '{}'".format(dwk0_path))
-            dwk1 = BwmReader(dwk0_path, model.name)
+            dwk_walkmesh1 = read_bwm(dwk0_path, model.name, cache)
             operator.report({"INFO"}, "Loading walkmesh from '{}'".format(dwk1_path))
-            dwk2 = BwmReader(dwk1_path, model.name)
+            dwk_walkmesh2 = read_bwm(dwk1_path, model.name, cache)
             operator.report({"INFO"}, "Loading walkmesh from '{}'".format(dwk2_path))
-            dwk3 = BwmReader(dwk2_path, model.name)
-            dwk_walkmesh1 = dwk1.load()
-            dwk_walkmesh2 = dwk2.load()
-            dwk_walkmesh3 = dwk3.load()
+            dwk_walkmesh3 = read_bwm(dwk2_path, model.name, cache)
 
     collection = bpy.context.collection
     model_root = model.add_to_collection(collection, options, position)
@@ -92,6 +94,38 @@ def load_mdl(operator, filepath, options, position=(0.0, 0.0, 0.0)):
     bpy.context.scene.frame_set(0)
 
 
+def read_mdl(filepath, cache=None):
+    mdx_path = os.path.splitext(filepath)[0] + ".mdx"
+    if not cache or not os.path.exists(mdx_path):
+        return MdlReader(filepath).load()
+
+    key = cache.get_key("mdl", [filepath, mdx_path])
+    model = cache.load(key)
+    if model:
+        MdlReader(filepath).load_animations_into(model)
+        return model
+
+    model = MdlReader(filepath).load()
+    cache.save(key, model)
+
+    return model
+
+
+def read_bwm(filepath, model_name, cache=None):
+    if not cache:
+        return BwmReader(filepath, model_name).load()
+
+    key = cache.get_key("bwm", [filepath], model_name)
+    walkmesh = cache.load(key)
+    if walkmesh:
+        return walkmesh
+
+    walkmesh = BwmReader(filepath, model_name).load()
+    cache.save(key, walkmesh)
+
+    return walkmesh
+
+
 def save_mdl(operator, filepath, options):
     # Reset pose
     bpy.context.scene.frame_set(0)
@@ -114,8 +148,110 @@ def save_mdl(operator, filepath, options):
     bpy.context.view_layer.objects.active = mdl_root
     bpy.ops.object.mode_set(mode="OBJECT")
 
+    model, walkmeshes = snapshot_mdl(mdl_root, filepath, options)
+    write_mdl(operator, filepath, model, walkmeshes, options)
+
+
+def save_mdl_batch(operator, directory, mdl_roots, options):
+    # Reset pose
+    bpy.context.scene.frame_set(0)
+
+    # Ensure OBJECT mode
+    bpy.context.view_layer.objects.active = mdl_roots[0]
+    bpy.ops.object.mode_set(mode="OBJECT")
+
+    start_time = time.perf_counter()
+
+    # Read Blender data on the main thread
+    results = []
+    jobs = []
+    for mdl_root in mdl_roots:
+        filepath = os.path.join(directory, mdl_root.name + ".mdl")
+        result = BatchResult(mdl_root.name, filepath)
+        results.append(result)
+        try:
+            snapshot_start = time.perf_counter()
+            model, walkmeshes = snapshot_mdl(mdl_root, filepath, options)
+            result.snapshot_time = time.perf_counter() - snapshot_start
+            jobs.append((result, model, walkmeshes))
+        except Exception as ex:
+            logger().exception(f"Error reading model [{mdl_root.name}]")
+            result.error = str(ex)
+
+    # Convert and write models in parallel
+    with ThreadPoolExecutor(max_workers=options.batch_workers or None) as executor:
+        for result, model, walkmeshes in jobs:
+            executor.submit(write_mdl_job, result, model, walkmeshes, options)
+
+    for result in results:
+        if result.error:
+            operator.report(
+                {"ERROR"}, "Error exporting '{}': {}".format(result.name, result.error)
+            )
+            continue
+        for report_type, message in result.reports:
+            operator.report(report_type, message)
+        logger().info(
+            "Exported model [{}] in {:.3f}s (read {:.3f}s, write {:.3f}s)".format(
+                result.name,
+                result.snapshot_time + result.write_time,
+                result.snapshot_time,
+                result.write_time,
+            )
+        )
+    num_failed = sum(1 for result in results if result.error)
+    operator.report(
+        {"WARNING"} if num_failed else {"INFO"},
+        "Exported {} of {} models to '{}' in {:.2f}s".format(
+            len(results) - num_failed,
+            len(results),
+            directory,
+            time.perf_counter() - start_time,
+        ),
+    )
+
+    return results
+
+
+def write_mdl_job(result, model, walkmeshes, options):
+    try:
+        write_start = time.perf_counter()
+        write_mdl(result, result.filepath, model, walkmeshes, options)
+        result.write_time = time.perf_counter() - write_start
+    except Exception as ex:
+        logger().exception(f"Error saving MDL file [{result.filepath}]")
+        result.error = str(ex)
+
+
+def snapshot_mdl(mdl_root, filepath, options):
+    # Reads everything needed to write the model and its walkmeshes from
+    # Blender data, which is only safe to access from the main thread
+    snapshot = ObjectSnapshot(mdl_root)
+    model = Model.from_snapshot(snapshot, options)
+
+    walkmeshes = []
+    if options.export_walkmeshes:
+        for xwk_root in snapshot.xwk_roots:
+            base_path, _ = os.path.splitext(filepath)
+            if is_pwk_root(xwk_root):
+                xwk_path = base_path + ".pwk"
+            else:
+                if xwk_root.name.endswith("open1"):
+                    dwk_state = 1
+                elif xwk_root.name.endswith("open2"):
+                    dwk_state = 2
+                elif xwk_root.name.endswith("closed"):
+                    dwk_state = 0
+                xwk_path = "{}{}.dwk".format(base_path, dwk_state)
+            walkmesh = Walkmesh.from_root_object(xwk_root, options)
+            walkmeshes.append((xwk_path, walkmesh))
+
+    return model, walkmeshes
+
+
+def write_mdl(operator, filepath, model, walkmeshes, options):
     # Export MDL
-    model = Model.from_mdl_root(mdl_root, options)
+    model.convert_meshes(options)
     operator.report({"INFO"}, "Saving model to '{}'".format(filepath))
     mdl = MdlWriter(
         filepath,
@@ -123,6 +259,7 @@ def save_mdl(operator, filepath, options):
         options.export_for_tsl,
         options.export_for_xbox,
         options.compress_quaternions,
+        options.aabb_split_mode,
     )
     mdl.save()
 
@@ -134,26 +271,28 @@ def save_mdl(operator, filepath, options):
             wok_path = base_path + ".wok"
             walkmesh = Walkmesh.from_aabb_node(aabb_node)
             operator.report({"INFO"}, "Saving walkmesh to '{}'".format(wok_path))
-            bwm = BwmWriter(wok_path, walkmesh)
+            bwm = BwmWriter(wok_path, walkmesh, options.aabb_split_mode)
             bwm.save()
 
         # Export PWK or DWK
-        xwk_roots = find_objects(
-            mdl_root, lambda obj: is_pwk_root(obj) or is_dwk_root(obj)
-        )
-        for xwk_root in xwk_roots:
-            base_path, _ = os.path.splitext(filepath)
-            if is_pwk_root(xwk_root):
-                xwk_path = base_path + ".pwk"
-            else:
-                if xwk_root.name.endswith("open1"):
-                    dwk_state = 1
-                elif xwk_root.name.endswith("open2"):
-                    dwk_state = 2
-                elif xwk_root.name.endswith("closed"):
-                    dwk_state = 0
-                xwk_path = "{}{}.dwk".format(base_path, dwk_state)
-            walkmesh = Walkmesh.from_root_object(xwk_root, options)
+        for xwk_path, walkmesh in walkmeshes:
+            walkmesh.convert_meshes(options)
             operator.report({"INFO"}, "Saving walkmesh to '{}'".format(xwk_path))
             bwm = BwmWriter(xwk_path, walkmesh)
             bwm.save()
+
+
+# Outcome of exporting a single model in a batch. Operators can only report
+# from the main thread, so reports of worker threads are collected here.
+class BatchResult:
+    def __init__(self, name, filepath):
+        self.name = name
+        self.filepath = filepath
+        self.snapshot_time = 0.0
+        self.write_time = 0.0
+        self.error = None
+        self.reports = []
+
+    def report(self, report_type, message):
+        if report_type != {"INFO"}:
+            self.reports.append((report_type, message))
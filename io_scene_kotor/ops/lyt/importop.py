@@ -24,7 +24,7 @@ from bpy_extras.io_utils import ImportHelper
 
 from ...constants import PACKAGE_NAME, ImportOptions
 from ...io import lyt
-from ...utils import logger, semicolon_separated_to_absolute_paths
+from ...utils import logger
 
 
 class KB_OT_import_lyt(bpy.types.Operator, ImportHelper):
@@ -56,12 +56,10 @@ class KB_OT_import_lyt(bpy.types.Operator, ImportHelper):
 
         preferences = context.preferences
         addon_preferences = preferences.addons[PACKAGE_NAME].preferences
-        options.texture_search_paths = semicolon_separated_to_absolute_paths(
-            addon_preferences.texture_search_paths, os.path.dirname(self.filepath)
-        )
-        options.lightmap_search_paths = semicolon_separated_to_absolute_paths(
-            addon_preferences.lightmap_search_paths, os.path.dirname(self.filepath)
-        )
+        addon_preferences.set_texture_options(options, os.path.dirname(self.filepath))
+        options.use_model_cache = addon_preferences.use_model_cache
+        options.model_cache_dir = bpy.path.abspath(addon_preferences.model_cache_path)
+        options.model_cache_size = addon_preferences.model_cache_size
 
         try:
             lyt.load_lyt(self, self.filepath, options)
@@ -0,0 +1,130 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import os
+
+import bpy
+
+from bpy_extras.io_utils import ExportHelper
+
+from ...constants import AabbSplitMode, ExportOptions
+from ...io import lyt, mdl
+from ...utils import is_mdl_root, logger
+
+
+class KB_OT_export_mdl_batch(bpy.types.Operator, ExportHelper):
+    bl_idname = "kb.mdlbatchexport"
+    bl_label = "Batch Export KotOR MDL"
+    bl_description = (
+        "Export selected MDL roots, or all MDL roots in the scene, "
+        "to the directory of a layout file"
+    )
+
+    filename_ext = ".lyt"
+
+    filter_glob: bpy.props.StringProperty(default="*.lyt", options={"HIDDEN"})
+
+    export_for_tsl: bpy.props.BoolProperty(
+        name="Export for TSL", description="Use The Sith Lords MDL format"
+    )
+
+    export_for_xbox: bpy.props.BoolProperty(
+        name="Export for Xbox", description="Use Xbox MDL format"
+    )
+
+    export_animations: bpy.props.BoolProperty(name="Export Animations", default=True)
+
+    export_walkmeshes: bpy.props.BoolProperty(
+        name="Export Walkmeshes",
+        description="Export area, door and placeable walkmeshes",
+        default=True,
+    )
+
+    export_layout: bpy.props.BoolProperty(
+        name="Export Layout",
+        description="Write area layout of exported models",
+        default=True,
+    )
+
+    compress_quaternions: bpy.props.BoolProperty(
+        name="Compress Quaternions", default=False
+    )
+
+    incremental_export: bpy.props.BoolProperty(
+        name="Incremental Export",
+        description="Reuse converted meshes of objects that did not change "
+        "since a previous export in this session",
+    )
+
+    aabb_split_mode: bpy.props.EnumProperty(
+        name="AABB Split",
+        description="How to split faces when building AABB trees of walkmeshes",
+        items=(
+            (
+                AabbSplitMode.CENTER,
+                "Center",
+                "Split at the mean of face centers, like the original toolset",
+            ),
+            (
+                AabbSplitMode.SAH,
+                "Surface Area",
+                "Split by surface area heuristic, producing tighter trees",
+            ),
+        ),
+        default=AabbSplitMode.CENTER,
+    )
+
+    batch_workers: bpy.props.IntProperty(
+        name="Worker Threads",
+        description="Number of models to convert and write at the same time, "
+        "0 to decide automatically",
+        min=0,
+    )
+
+    def execute(self, context):
+        options = ExportOptions()
+        options.export_for_tsl = self.export_for_tsl
+        options.export_for_xbox = self.export_for_xbox
+        options.export_animations = self.export_animations
+        options.export_walkmeshes = self.export_walkmeshes
+        options.compress_quaternions = self.compress_quaternions
+        options.incremental_export = self.incremental_export
+        options.aabb_split_mode = self.aabb_split_mode
+        options.batch_workers = self.batch_workers
+
+        objects = (
+            context.selected_objects
+            if len(context.selected_objects) > 0
+            else context.scene.objects
+        )
+        mdl_roots = [obj for obj in objects if is_mdl_root(obj)]
+        if not mdl_roots:
+            self.report({"WARNING"}, "No MDL roots to export")
+            return {"CANCELLED"}
+
+        directory = os.path.dirname(self.filepath)
+        try:
+            mdl.save_mdl_batch(self, directory, mdl_roots, options)
+            if self.export_layout:
+                # Describe the same objects that were exported
+                lyt.save_lyt(self, self.filepath, objects)
+        except Exception as ex:
+            logger().exception(f"Error batch exporting to [{directory}]")
+            self.report({"ERROR"}, str(ex))
+
+        return {"FINISHED"}
@@ -20,7 +20,7 @@ import bpy
 
 from bpy_extras.io_utils import ExportHelper
 
-from ...constants import ExportOptions
+from ...constants import AabbSplitMode, ExportOptions
 from ...io import mdl
 from ...utils import logger
 
@@ -53,6 +53,30 @@ class KB_OT_export_mdl(bpy.types.Operator, ExportHelper):
         name="Compress Quaternions", default=False
     )
 
+    incremental_export: bpy.props.BoolProperty(
+        name="Incremental Export",
+        description="Reuse converted meshes of objects that did not change "
+        "since a previous export in this session",
+    )
+
+    aabb_split_mode: bpy.props.EnumProperty(
+        name="AABB Split",
+        description="How to split faces when building AABB trees of walkmeshes",
+        items=(
+            (
+                AabbSplitMode.CENTER,
+                "Center",
+                "Split at the mean of face centers, like the original toolset",
+            ),
+            (
+                AabbSplitMode.SAH,
+                "Surface Area",
+                "Split by surface area heuristic, producing tighter trees",
+            ),
+        ),
+        default=AabbSplitMode.CENTER,
+    )
+
     def execute(self, context):
         options = ExportOptions()
         options.export_for_tsl = self.export_for_tsl
@@ -60,6 +84,8 @@ class KB_OT_export_mdl(bpy.types.Operator, ExportHelper):
         options.export_animations = self.export_animations
         options.export_walkmeshes = self.export_walkmeshes
         options.compress_quaternions = self.compress_quaternions
+        options.incremental_export = self.incremental_export
+        options.aabb_split_mode = self.aabb_split_mode
 
         try:
             mdl.save_mdl(self, self.filepath, options)
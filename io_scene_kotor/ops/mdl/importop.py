@@ -24,7 +24,7 @@ from bpy_extras.io_utils import ImportHelper
 
 from ...constants import PACKAGE_NAME, ImportOptions
 from ...io import mdl
-from ...utils import logger, semicolon_separated_to_absolute_paths
+from ...utils import logger
 
 
 class KB_OT_import_mdl(bpy.types.Operator, ImportHelper):
@@ -44,6 +44,12 @@ class KB_OT_import_mdl(bpy.types.Operator, ImportHelper):
 
     import_animations: bpy.props.BoolProperty(name="Import Animations", default=True)
 
+    animation_filter: bpy.props.StringProperty(
+        name="Animation Filter",
+        description="Semicolon-separated animation names to import, * and ? "
+        "wildcards allowed. Leave empty to import all",
+    )
+
     import_walkmeshes: bpy.props.BoolProperty(
         name="Import Walkmeshes",
         description="Import area, door and placeable walkmeshes",
@@ -62,18 +68,19 @@ class KB_OT_import_mdl(bpy.types.Operator, ImportHelper):
         options = ImportOptions()
         options.import_geometry = self.import_geometry
         options.import_animations = self.import_animations
+        options.animation_filter = [
+            name.strip() for name in self.animation_filter.split(";") if name.strip()
+        ]
         options.import_walkmeshes = self.import_walkmeshes
         options.build_materials = self.build_materials
         options.build_armature = self.build_armature
 
         preferences = context.preferences
         addon_preferences = preferences.addons[PACKAGE_NAME].preferences
-        options.texture_search_paths = semicolon_separated_to_absolute_paths(
-            addon_preferences.texture_search_paths, os.path.dirname(self.filepath)
-        )
-        options.lightmap_search_paths = semicolon_separated_to_absolute_paths(
-            addon_preferences.lightmap_search_paths, os.path.dirname(self.filepath)
-        )
+        addon_preferences.set_texture_options(options, os.path.dirname(self.filepath))
+        options.use_model_cache = addon_preferences.use_model_cache
+        options.model_cache_dir = bpy.path.abspath(addon_preferences.model_cache_path)
+        options.model_cache_size = addon_preferences.model_cache_size
 
         try:
             mdl.load_mdl(self, self.filepath, options)
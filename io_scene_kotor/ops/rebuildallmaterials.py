@@ -18,6 +18,7 @@
 
 import bpy
 
+from ..addonprefs import texture_options_from_blend_file
 from ..constants import MeshType
 from ..scene import material
 from ..utils import is_mdl_root, find_objects
@@ -32,11 +33,12 @@ class KB_OT_rebuild_all_materials(bpy.types.Operator):
         return is_mdl_root(context.object)
 
     def execute(self, context):
+        options = texture_options_from_blend_file(context)
         objects = find_objects(
             context.object,
             lambda obj: obj.type == "MESH"
             and obj.kb.meshtype not in [MeshType.EMITTER],
         )
         for obj in objects:
-            material.rebuild_object_materials(obj)
+            material.rebuild_object_materials(obj, options)
         return {"FINISHED"}
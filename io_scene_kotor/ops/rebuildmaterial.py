@@ -18,6 +18,7 @@
 
 import bpy
 
+from ..addonprefs import texture_options_from_blend_file
 from ..constants import MeshType
 from ..scene import material
 
@@ -32,5 +33,6 @@ class KB_OT_rebuild_material(bpy.types.Operator):
         return obj and obj.type == "MESH" and obj.kb.meshtype not in [MeshType.EMITTER]
 
     def execute(self, context):
-        material.rebuild_object_materials(context.object)
+        options = texture_options_from_blend_file(context)
+        material.rebuild_object_materials(context.object, options)
         return {"FINISHED"}
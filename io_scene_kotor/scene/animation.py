@@ -19,7 +19,7 @@
 import math
 import re
 
-from ..constants import DummyType, ANIM_PADDING, NULL
+from ..constants import ANIM_PADDING, NULL
 from ..utils import find_object, time_to_frame, frame_to_time
 
 from .animnode import AnimationNode
@@ -32,6 +32,7 @@ class Animation:
         self.transtime = 0.25
         self.animroot = NULL
         self.root_node = None
+        self.root_node_loader = None
 
         self.events = []
 
@@ -42,7 +43,14 @@ class Animation:
         for time, name in self.events:
             Animation.append_event_to_object_anim(list_anim, name, time)
 
-        self.add_nodes_to_objects(list_anim, self.root_node, mdl_root, animscale)
+        self.add_nodes_to_objects(list_anim, self.load_root_node(), mdl_root, animscale)
+
+    def load_root_node(self):
+        # Animations read from MDL only decode their node tree on first use
+        if self.root_node is None and self.root_node_loader:
+            self.root_node = self.root_node_loader()
+            self.root_node_loader = None
+        return self.root_node
 
     def add_nodes_to_objects(
         self, anim, node, mdl_root, animscale, below_animroot=False
@@ -81,12 +89,12 @@ class Animation:
         return int(math.ceil((last_frame + ANIM_PADDING) / 10.0)) * 10
 
     @classmethod
-    def from_list_anim(cls, list_anim, mdl_root):
+    def from_list_anim(cls, list_anim, snapshot):
         anim = Animation(list_anim.name)
         anim.length = frame_to_time(list_anim.frame_end - list_anim.frame_start)
         anim.transtime = list_anim.transtime
         anim.animroot = list_anim.root
-        anim.root_node = Animation.animation_node_from_object(list_anim, mdl_root)
+        anim.root_node = Animation.animation_nodes_from_snapshot(list_anim, snapshot)
 
         for event in list_anim.event_list:
             time = frame_to_time(event.frame - list_anim.frame_start)
@@ -95,6 +103,23 @@ class Animation:
 
         return anim
 
+    @classmethod
+    def animation_nodes_from_snapshot(cls, anim, snapshot):
+        nodes = []
+        for obj, parent_idx in zip(snapshot.objects, snapshot.parent_indices):
+            parent = nodes[parent_idx] if parent_idx != -1 else None
+            node = Animation.animation_node_from_object(anim, obj, parent)
+            if parent:
+                parent.children.append(node)
+            nodes.append(node)
+
+        # Node is animated when either it or any of its descendants is
+        for node in reversed(nodes):
+            if node.animated and node.parent:
+                node.parent.animated = True
+
+        return nodes[0]
+
     @classmethod
     def animation_node_from_object(cls, anim, obj, parent=None):
         name = obj.name
@@ -110,15 +135,4 @@ class Animation:
             node.load_keyframes_from_object(anim, obj.data)
         node.animated = bool(node.keyframes)
 
-        for child_obj in sorted(obj.children, key=lambda o: o.kb.export_order):
-            if child_obj.type == "EMPTY" and child_obj.kb.dummytype in [
-                DummyType.PWKROOT,
-                DummyType.DWKROOT,
-            ]:
-                continue
-            child = Animation.animation_node_from_object(anim, child_obj, node)
-            if not node.animated and child.animated:
-                node.animated = True
-            node.children.append(child)
-
         return node
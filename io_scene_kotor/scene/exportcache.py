@@ -0,0 +1,112 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_ENTRIES = 256
+
+# Mesh node attributes produced by TrimeshNode.edge_loop_to_mdl_mesh
+MESH_ATTRS = [
+    "verts",
+    "normals",
+    "uv1",
+    "uv2",
+    "tangents",
+    "bitangents",
+    "tangentspacenormals",
+    "bone_names",
+    "bone_indices",
+    "bone_weights",
+    "constraints",
+    "facelist",
+]
+
+
+class ExportCacheEntry:
+    def __init__(self, mesh_attrs):
+        self.mesh_attrs = mesh_attrs
+        self.blocks = dict()  # encoded by MdlWriter, e.g. MDX vertices
+
+
+# Keeps converted meshes, and blocks that MdlWriter encodes from them, for the
+# rest of the session. Entries are keyed by a hash of mesh data extracted from
+# Blender, so that incremental exports only convert and encode meshes that
+# changed since a previous export. Only the most recently used entries are
+# kept.
+class ExportCache:
+    instance = None
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_options(cls, options):
+        if not options.incremental_export:
+            return None
+        if not cls.instance:
+            cls.instance = ExportCache()
+        return cls.instance
+
+    def get_key(self, node, mesh):
+        hasher = hashlib.sha1()
+        hasher.update(
+            "{}:{}:{}:{}".format(
+                type(node).__name__,
+                node.compression,
+                node.tangentspace,
+                node.lightmapped,
+            ).encode("utf-8")
+        )
+        for name, value in sorted(vars(mesh).items()):
+            hasher.update(name.encode("utf-8"))
+            if name == "bone_names":
+                hasher.update("\0".join(value).encode("utf-8"))
+                continue
+            array = np.ascontiguousarray(value)
+            hasher.update("{}{}".format(array.dtype, array.shape).encode("utf-8"))
+            hasher.update(array.tobytes())
+        return hasher.hexdigest()
+
+    def load(self, key, node):
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+            self.entries.move_to_end(key)
+        for name, value in entry.mesh_attrs.items():
+            setattr(node, name, value)
+        return entry
+
+    def save(self, key, node):
+        entry = ExportCacheEntry({name: getattr(node, name) for name in MESH_ATTRS})
+        with self.lock:
+            self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -16,13 +16,11 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
-import os
-
 import bpy
 
 from bpy_extras import image_utils
 
-from ..constants import UV_MAP_LIGHTMAP, WALKMESH_MATERIALS
+from ..constants import UV_MAP_LIGHTMAP, WALKMESH_MATERIALS, ImportOptions
 from ..format.tpc.reader import TpcReader
 from ..utils import (
     color_to_hex,
@@ -32,6 +30,8 @@ from ..utils import (
     is_not_null,
     logger,
 )
+from .texturecache import TextureCache
+from .textureindex import TextureIndex
 
 
 class NodeName:
@@ -60,15 +60,17 @@ class WalkmeshNodeName:
     OPACITY = "opacity"
 
 
-def rebuild_object_materials(obj, texture_search_paths=[], lightmap_search_paths=[]):
+def rebuild_object_materials(obj, options=None):
+    if not options:
+        options = ImportOptions()
     try:
-        rebuild_object_materials0(obj, texture_search_paths, lightmap_search_paths)
+        rebuild_object_materials0(obj, options)
     except:
         logger().exception(f"Error building object [{obj.name}] materials")
         obj.data.materials.clear()
 
 
-def rebuild_object_materials0(obj, texture_search_paths=[], lightmap_search_paths=[]):
+def rebuild_object_materials0(obj, options):
     mesh = obj.data
     polygon_materials = [polygon.material_index for polygon in mesh.polygons]
     mesh.materials.clear()
@@ -81,9 +83,7 @@ def rebuild_object_materials0(obj, texture_search_paths=[], lightmap_search_path
     if is_not_null(obj.kb.bitmap):
         material = get_or_create_material(obj.name)
         mesh.materials.append(material)
-        rebuild_material_textured(
-            material, obj, texture_search_paths, lightmap_search_paths
-        )
+        rebuild_material_textured(material, obj, options)
     else:
         diffuse = color_to_hex(obj.kb.diffuse)
         alpha = int_to_hex(float_to_byte(obj.kb.alpha))
@@ -158,9 +158,7 @@ def rebuild_material_solid(material, obj):
     material.diffuse_color = [*obj.kb.diffuse, 1.0]
 
 
-def rebuild_material_textured(
-    material, obj, texture_search_paths, lightmap_search_paths
-):
+def rebuild_material_textured(material, obj, options):
     material.use_nodes = True
 
     links = material.node_tree.links
@@ -181,7 +179,7 @@ def rebuild_material_textured(
         diffuse_tex.name = NodeName.DIFFUSE_TEX
         diffuse_tex.location = (x, 0)
         diffuse_tex.image = get_or_create_texture(
-            obj.kb.bitmap, texture_search_paths
+            obj.kb.bitmap, options.texture_search_paths, options
         ).image
         envmapped = diffuse_tex.image.kb.envmap
         if diffuse_tex.image.kb.bumpmap:
@@ -190,7 +188,7 @@ def rebuild_material_textured(
             bumpmap_tex.name = NodeName.BUMPMAP_TEX
             bumpmap_tex.location = (x, 300)
             bumpmap_tex.image = get_or_create_texture(
-                diffuse_tex.image.kb.bumpmap, texture_search_paths
+                diffuse_tex.image.kb.bumpmap, options.texture_search_paths, options
             ).image
             normal_map = nodes.new("ShaderNodeNormalMap")
             normal_map.name = NodeName.NORMAL_MAP
@@ -209,7 +207,7 @@ def rebuild_material_textured(
         lightmap_tex.name = NodeName.LIGHTMAP_TEX
         lightmap_tex.location = (x, -300)
         lightmap_tex.image = get_or_create_texture(
-            obj.kb.bitmap2, lightmap_search_paths
+            obj.kb.bitmap2, options.lightmap_search_paths, options
         ).image
         links.new(lightmap_tex.inputs[0], lightmap_uv.outputs[0])
 
@@ -345,14 +343,14 @@ def rebuild_material_textured(
     material.blend_method = "BLEND" if additive else "HASHED"
 
 
-def get_or_create_texture(name, search_paths):
+def get_or_create_texture(name, search_paths, options):
     if name in bpy.data.textures:
         return bpy.data.textures[name]
 
     if name in bpy.data.images:
         image = bpy.data.images[name]
     else:
-        image = create_image(name, search_paths)
+        image = create_image(name, search_paths, options)
 
     texture = bpy.data.textures.new(name, type="IMAGE")
     texture.image = image
@@ -361,24 +359,18 @@ def get_or_create_texture(name, search_paths):
     return texture
 
 
-def create_image(name, search_paths):
+def create_image(name, search_paths, options):
     tga_filename = (name + ".tga").lower()
     txi_filename = (name + ".txi").lower()
     tpc_filename = (name + ".tpc").lower()
+    index = TextureIndex.get()
     for search_path in search_paths:
-        if not os.path.exists(search_path):
+        files = index.get_files(search_path)
+        if files is None:
             continue
-        tga_path = None
-        txi_path = None
-        tpc_path = None
-        for filename in os.listdir(search_path):
-            lower_filename = filename.lower()
-            if lower_filename == tga_filename:
-                tga_path = os.path.join(search_path, filename)
-            elif lower_filename == txi_filename:
-                txi_path = os.path.join(search_path, filename)
-            elif lower_filename == tpc_filename:
-                tpc_path = os.path.join(search_path, filename)
+        tga_path = files.get(tga_filename)
+        txi_path = files.get(txi_filename)
+        tpc_path = files.get(tpc_filename)
         if tga_path:
             logger().debug(f"Loading TGA image [{tga_path}]")
             image = image_utils.load_image(tga_path)
@@ -390,18 +382,57 @@ def create_image(name, search_paths):
                     apply_txi_to_image(txi_lines, image)
             return image
         elif tpc_path:
-            logger().debug(f"Loading TPC image [{tpc_path}]")
-            tpc_image = TpcReader(tpc_path).load()
-            image = bpy.data.images.new(name, tpc_image.w, tpc_image.h)
-            image.pixels = tpc_image.pixels
-            image.update()
-            image.pack()
-            apply_txi_to_image(tpc_image.txi_lines, image)
-            return image
+            return create_image_from_tpc(name, tpc_path, options)
 
     return bpy.data.images.new(name, 512, 512)
 
 
+def create_image_from_tpc(name, tpc_path, options):
+    cache = TextureCache.from_options(options)
+    if cache:
+        key = cache.get_key(
+            tpc_path, options.texture_mip_bias, options.texture_max_resolution
+        )
+        cached = cache.load(key)
+        if cached:
+            logger().debug(f"Loading TPC image [{tpc_path}] from cache")
+            image = load_cached_image(name, *cached)
+            if image:
+                return image
+
+    logger().debug(f"Loading TPC image [{tpc_path}]")
+    tpc_image = TpcReader(
+        tpc_path, options.texture_mip_bias, options.texture_max_resolution
+    ).load()
+
+    # Reference decoded image in the cache instead of packing it
+    if cache:
+        cached = cache.save(key, tpc_image)
+        if cached:
+            image = load_cached_image(name, *cached)
+            if image:
+                return image
+
+    image = bpy.data.images.new(name, tpc_image.w, tpc_image.h)
+    image.pixels.foreach_set(tpc_image.pixels)
+    image.update()
+    image.pack()
+    apply_txi_to_image(tpc_image.txi_lines, image)
+    return image
+
+
+def load_cached_image(name, image_path, txi_lines):
+    try:
+        image = bpy.data.images.load(image_path, check_existing=False)
+    except RuntimeError:
+        # Fall back to decoding and packing pixels
+        logger().exception(f"Error loading cached image [{image_path}]")
+        return None
+    image.name = name
+    apply_txi_to_image(txi_lines, image)
+    return image
+
+
 def apply_txi_to_image(txi, image):
     for line in txi:
         tokens = line.split()
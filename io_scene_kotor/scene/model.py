@@ -18,12 +18,14 @@
 
 import re
 
+from fnmatch import fnmatch
+
 import bpy
 
 from mathutils import Matrix
 
 from ..constants import DummyType, MeshType, NodeType, Classification, NULL
-from ..utils import is_mdl_root, is_pwk_root, is_dwk_root, logger
+from ..utils import is_mdl_root, logger
 from .animation import Animation
 from .modelnode.aabb import AabbNode
 from .modelnode.danglymesh import DanglymeshNode
@@ -94,7 +96,7 @@ class Model:
             animscale = root_obj.kb.animscale
 
         if options.import_animations:
-            self.create_animations(root_obj, animscale)
+            self.create_animations(root_obj, animscale, options.animation_filter)
 
         if options.build_armature:
             armature_obj = armature.rebuild_armature(root_obj)
@@ -112,19 +114,30 @@ class Model:
         for child in node.children:
             self.import_nodes_to_collection(child, obj, collection, options)
 
-    def create_animations(self, mdl_root, animscale):
+    def create_animations(self, mdl_root, animscale, name_filter=None):
         for anim in self.animations:
+            if name_filter and not any(
+                fnmatch(anim.name.lower(), pattern.lower()) for pattern in name_filter
+            ):
+                continue
             anim.add_to_objects(mdl_root, animscale)
 
     def find_node(self, test):
         return self.root_node.find_node(test)
 
+    def convert_meshes(self, options):
+        node_stack = [self.root_node]
+        while node_stack:
+            node = node_stack.pop()
+            if isinstance(node, TrimeshNode):
+                node.convert_edge_loop_mesh(options)
+            node_stack.extend(node.children)
+
     @classmethod
-    def from_mdl_root(cls, root_obj, options):
+    def from_snapshot(cls, snapshot, options):
+        root_obj = snapshot.root_obj
         logger().info(f"Loading model from object [{root_obj.name}]")
 
-        cls.sanitize_model(root_obj)
-
         model = Model()
         model.name = root_obj.name
         model.supermodel = root_obj.kb.supermodel
@@ -133,53 +146,32 @@ class Model:
         model.affected_by_fog = root_obj.kb.affected_by_fog
         model.animroot = root_obj.kb.animroot
         model.animscale = root_obj.kb.animscale
-        model.root_node = cls.model_node_from_object(root_obj, options)
+        model.root_node = cls.model_nodes_from_snapshot(snapshot, options)
 
         if options.export_animations:
             model.animations = [
-                Animation.from_list_anim(anim, root_obj)
+                Animation.from_list_anim(anim, snapshot)
                 for anim in root_obj.kb.anim_list
             ]
 
         return model
 
     @classmethod
-    def sanitize_model(cls, root_obj):
-        # Make a set of unique node numbers
-        node_numbers = set()
-        obj_stack = []
-        obj_stack.append(root_obj)
-        while obj_stack:
-            obj = obj_stack.pop()
-            if obj.kb.node_number in node_numbers:
-                logger().warning(
-                    f"Duplicate node number [{obj.kb.node_number}] in object [{obj.name}]"
-                )
-            if obj.kb.node_number != -1:
-                node_numbers.add(obj.kb.node_number)
-            for child in obj.children:
-                obj_stack.append(child)
-        sorted_node_numbers = sorted(node_numbers)
-        if sorted_node_numbers:
-            next_node_number = sorted_node_numbers[-1] + 1
-        else:
-            next_node_number = 0
-
-        # Generate node numbers when undefined
-        obj_stack.append(root_obj)
-        while obj_stack:
-            obj = obj_stack.pop()
-            if obj.kb.node_number == -1:
-                obj.kb.node_number = next_node_number
-                next_node_number += 1
-            for child in obj.children:
-                obj_stack.append(child)
+    def model_nodes_from_snapshot(cls, snapshot, options):
+        # Parents precede their children in a snapshot
+        nodes = []
+        for obj, eval_obj, parent_idx in zip(
+            snapshot.objects, snapshot.eval_objects, snapshot.parent_indices
+        ):
+            parent = nodes[parent_idx] if parent_idx != -1 else None
+            node = cls.model_node_from_object(obj, eval_obj, options, parent)
+            if parent:
+                parent.children.append(node)
+            nodes.append(node)
+        return nodes[0]
 
     @classmethod
-    def model_node_from_object(cls, obj, options, parent=None, exclude_xwk=True):
-        if exclude_xwk and (is_pwk_root(obj) or is_dwk_root(obj)):
-            return None
-
+    def model_node_from_object(cls, obj, eval_obj, options, parent=None):
         logger().debug(f"Loading model node from object [{obj.name}]")
 
         if obj.type == "EMPTY":
@@ -222,8 +214,6 @@ class Model:
         node = switch[node_type](name)
         node.parent = parent
 
-        depsgraph = bpy.context.evaluated_depsgraph_get()
-        eval_obj = obj.evaluated_get(depsgraph)
         node.load_object_data(obj, eval_obj, options)
 
         # Ignore transformations up to MDL root
@@ -232,9 +222,4 @@ class Model:
             node.orientation = (1.0, 0.0, 0.0, 0.0)
             node.from_root = Matrix()
 
-        for child_obj in sorted(obj.children, key=lambda o: o.kb.export_order):
-            child = cls.model_node_from_object(child_obj, options, node, exclude_xwk)
-            if child:
-                node.children.append(child)
-
         return node
@@ -16,6 +16,8 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
+import numpy as np
+
 from ...constants import MeshType, NodeType
 from .trimesh import TrimeshNode
 
@@ -31,15 +33,42 @@ class SkinmeshNode(TrimeshNode):
         self.apply_bone_weights(mesh, obj)
 
     def apply_bone_weights(self, mesh, obj):
+        if not len(mesh.bone_indices):
+            return
+
+        # Create vertex groups in order of first use
+        bone_indices = np.asarray(mesh.bone_indices)
+        used_bones = bone_indices[bone_indices != -1]
+        _, first_use = np.unique(used_bones, return_index=True)
         groups = dict()
-        for vert_idx, vert_weights in enumerate(mesh.weights):
-            for bone_name, weight in vert_weights:
-                if bone_name in groups:
-                    groups[bone_name].add([vert_idx], weight, "REPLACE")
-                else:
-                    group = obj.vertex_groups.new(name=bone_name)
-                    group.add([vert_idx], weight, "REPLACE")
-                    groups[bone_name] = group
+        for bone_idx in used_bones[np.sort(first_use)].tolist():
+            groups[bone_idx] = obj.vertex_groups.new(name=mesh.bone_names[bone_idx])
+
+        # Add vertices sharing bone and weight in one call. Go through bone
+        # slots in order, so that every vertex gets its groups in the same
+        # order as if added one by one.
+        bone_weights = np.asarray(mesh.bone_weights)
+        for slot in range(bone_indices.shape[1]):
+            vert_indices = np.flatnonzero(bone_indices[:, slot] != -1)
+            if not len(vert_indices):
+                continue
+            slot_bones = bone_indices[vert_indices, slot]
+            slot_weights = bone_weights[vert_indices, slot]
+            order = np.lexsort((slot_weights, slot_bones))
+            vert_indices = vert_indices[order]
+            slot_bones = slot_bones[order]
+            slot_weights = slot_weights[order]
+            changes = (slot_bones[1:] != slot_bones[:-1]) | (
+                slot_weights[1:] != slot_weights[:-1]
+            )
+            starts = np.flatnonzero(np.concatenate(([True], changes)))
+            ends = np.append(starts[1:], len(vert_indices))
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                groups[int(slot_bones[start])].add(
+                    vert_indices[start:end].tolist(),
+                    float(slot_weights[start]),
+                    "REPLACE",
+                )
 
     def unapply_edge_loop_mesh(self, obj):
         mesh = TrimeshNode.unapply_edge_loop_mesh(self, obj)
@@ -47,19 +76,40 @@ class SkinmeshNode(TrimeshNode):
         return mesh
 
     def unapply_bone_weights(self, obj, mesh):
-        mesh.weights = [[]] * len(mesh.verts)
-        for vert_idx in range(len(mesh.verts)):
-            vert = obj.data.vertices[vert_idx]
-            vert_weights = []
-            for group_weight in vert.groups:
-                if group_weight == 0.0:
-                    continue
-                group = obj.vertex_groups[group_weight.group]
-                vert_weights.append((group.name, group_weight.weight))
-            vert_weights.sort(key=lambda x: x[1], reverse=True)
-            if len(vert_weights) > 4:
-                vert_weights = vert_weights[0:3]
-            total_weight = sum([v[1] for v in vert_weights])
-            if total_weight != 0.0:
-                vert_weights = [(v[0], v[1] / total_weight) for v in vert_weights]
-            mesh.weights[vert_idx] = vert_weights
+        vert_groups = [
+            [(group.group, group.weight) for group in vert.groups]
+            for vert in obj.data.vertices
+        ]
+        num_verts = len(vert_groups)
+        num_groups = np.array([len(groups) for groups in vert_groups], dtype=np.int64)
+        max_groups = max(4, int(num_groups.max())) if num_verts else 4
+
+        # Pad group memberships of every vertex into fixed-width rows
+        rows = np.repeat(np.arange(num_verts), num_groups)
+        columns = np.arange(len(rows)) - np.repeat(
+            np.cumsum(num_groups) - num_groups, num_groups
+        )
+        memberships = np.array(
+            [group for groups in vert_groups for group in groups], dtype=np.float64
+        ).reshape(-1, 2)
+        bone_indices = np.full((num_verts, max_groups), -1, dtype=np.int32)
+        bone_weights = np.full((num_verts, max_groups), -np.inf)
+        bone_indices[rows, columns] = memberships[:, 0]
+        bone_weights[rows, columns] = memberships[:, 1]
+
+        # Sort by weight, keeping at most 3 bones when there are more than 4,
+        # and normalize
+        order = np.argsort(-bone_weights, axis=1, kind="stable")[:, :4]
+        bone_indices = np.take_along_axis(bone_indices, order, axis=1)
+        bone_weights = np.take_along_axis(bone_weights, order, axis=1)
+        num_kept = np.where(num_groups > 4, 3, num_groups)
+        unused = np.arange(4) >= num_kept[:, None]
+        bone_indices[unused] = -1
+        bone_weights[unused] = 0.0
+        total_weights = bone_weights.sum(axis=1)
+        normalize = total_weights != 0.0
+        bone_weights[normalize] /= total_weights[normalize, None]
+
+        mesh.bone_names = [group.name for group in obj.vertex_groups]
+        mesh.bone_indices = bone_indices
+        mesh.bone_weights = bone_weights
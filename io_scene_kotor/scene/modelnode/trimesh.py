@@ -17,8 +17,8 @@
 # ##### END GPL LICENSE BLOCK #####
 
 import bpy
+import numpy as np
 
-from bpy_extras.io_utils import unpack_list
 from mathutils import Vector
 
 from ...constants import (
@@ -29,8 +29,9 @@ from ...constants import (
     RootType,
     MeshType,
 )
-from ...utils import is_not_null
+from ...utils import foreach_get_array, is_not_null
 from .. import material
+from ..exportcache import ExportCache
 from .base import BaseNode
 
 
@@ -47,10 +48,14 @@ class FaceList:
         self.normals = []
 
 
+# Mesh as a flat list of triangle loops. Vertex, loop and face attributes
+# are NumPy arrays, except for constraints, which are a list.
 class EdgeLoopMesh:
     def __init__(self):
         self.verts = []  # vertex coordinates
-        self.weights = []  # vertex bone weights
+        self.bone_names = []  # bones referenced by bone_indices (skinmesh)
+        self.bone_indices = []  # up to 4 bones per vertex, -1 if unused
+        self.bone_weights = []
         self.constraints = []  # vertex constraints (danglymesh)
 
         self.loop_verts = []  # vertex indices
@@ -73,36 +78,6 @@ class EdgeLoopMesh:
         return len(self.verts)
 
 
-class SimilarMdlVertex:
-    def __init__(self, coords):
-        self.coords = coords
-        self.value = tuple(int(val * 10000) for val in self.coords)
-
-    def __hash__(self):
-        return hash(self.value)
-
-    def __eq__(self, rhs):
-        return self.value == rhs.value
-
-
-class SimilarEdgeLoopMeshVertex:
-    def __init__(self, coords, normal, uv1, uv2):
-        self.coords = coords
-        self.normal = normal
-        self.uv1 = uv1
-        self.uv2 = uv2
-        self.value = tuple(
-            int(val * 10000)
-            for val in (*self.coords, *self.normal, *self.uv1, *self.uv2)
-        )
-
-    def __hash__(self):
-        return hash(self.value)
-
-    def __eq__(self, rhs):
-        return self.value == rhs.value
-
-
 class TrimeshNode(BaseNode):
     def __init__(self, name="UNNAMED"):
         BaseNode.__init__(self, name)
@@ -144,10 +119,17 @@ class TrimeshNode(BaseNode):
         self.tangents = []
         self.bitangents = []
         self.tangentspacenormals = []
-        self.weights = []
+        self.bone_names = []
+        self.bone_indices = []
+        self.bone_weights = []
         self.constraints = []
         self.facelist = FaceList()
 
+        # Mesh extracted from Blender, until converted by convert_edge_loop_mesh
+        self.edge_loop_mesh = None
+        # Blocks encoded from this mesh, kept across incremental exports
+        self.export_blocks = None
+
     def add_to_collection(self, collection, options):
         mesh = self.mdl_to_edge_loop_mesh()
         bl_mesh = self.create_blender_mesh(self.name, mesh)
@@ -155,99 +137,116 @@ class TrimeshNode(BaseNode):
         self.apply_edge_loop_mesh(mesh, obj)
         self.set_object_data(obj, options)
         if options.build_materials and self.roottype == RootType.MODEL:
-            material.rebuild_object_materials(
-                obj, options.texture_search_paths, options.lightmap_search_paths
-            )
+            material.rebuild_object_materials(obj, options)
         collection.objects.link(obj)
         return obj
 
     def mdl_to_edge_loop_mesh(self):
-        num_faces = len(self.facelist.vertices)
-        num_loops = 3 * num_faces
+        face_verts = np.asarray(self.facelist.vertices, dtype=np.int64).reshape(-1, 3)
+        loop_src_verts = face_verts.reshape(-1)
+        num_loops = len(loop_src_verts)
         mesh = EdgeLoopMesh()
-        mesh.loop_verts = [-1] * num_loops
-        mesh.loop_normals = [(0, 0, 0)] * num_loops
-        mesh.loop_uv1 = [(0, 0)] * num_loops if self.uv1 else []
-        mesh.loop_uv2 = [(0, 0)] * num_loops if self.uv2 else []
         if self.compression != Compression.DISABLED:
-            attrs_to_vert_idx = dict()
-            for face_idx in range(num_faces):
-                face_verts = self.facelist.vertices[face_idx]
-                uniq_loop_verts = set()
-                for i in range(3):
-                    loop_idx = 3 * face_idx + i
-                    vert_idx = face_verts[i]
-                    vert = self.verts[vert_idx]
-                    attrs = SimilarMdlVertex(vert)
-                    if attrs in attrs_to_vert_idx and (
-                        attrs_to_vert_idx[attrs] not in uniq_loop_verts
-                    ):
-                        uniq_loop_verts.add(attrs_to_vert_idx[attrs])
-                        mesh.loop_verts[loop_idx] = attrs_to_vert_idx[attrs]
-                    else:
-                        num_verts = len(mesh.verts)
-                        mesh.verts.append(vert)
-                        if self.weights:
-                            mesh.weights.append(self.weights[vert_idx])
-                        if self.constraints:
-                            mesh.constraints.append(self.constraints[vert_idx])
-                        if attrs not in attrs_to_vert_idx:
-                            attrs_to_vert_idx[attrs] = num_verts
-                        uniq_loop_verts.add(num_verts)
-                        mesh.loop_verts[loop_idx] = num_verts
-                    if self.normals:
-                        mesh.loop_normals[loop_idx] = self.normals[vert_idx]
-                    if self.uv1:
-                        mesh.loop_uv1[loop_idx] = self.uv1[vert_idx]
-                    if self.uv2:
-                        mesh.loop_uv2[loop_idx] = self.uv2[vert_idx]
-                    if self.tangents and self.bitangents:
-                        mesh.loop_tangents[loop_idx] = self.tangents[vert_idx]
-                        mesh.loop_bitangents[loop_idx] = self.bitangents[vert_idx]
+            # Merge vertices with similar coordinates, unless they belong to
+            # the same face
+            positions = np.asarray(self.verts, dtype=np.float64).reshape(-1, 3)
+            quantized = np.trunc(positions * 10000.0).astype(np.int64)
+            _, first_verts, src_to_unique = np.unique(
+                quantized, axis=0, return_index=True, return_inverse=True
+            )
+            src_to_unique = src_to_unique.reshape(-1)
+            unique_faces = src_to_unique[face_verts]
+            loop_is_duplicate = np.zeros(face_verts.shape, dtype=bool)
+            loop_is_duplicate[:, 1] = unique_faces[:, 1] == unique_faces[:, 0]
+            loop_is_duplicate[:, 2] = (unique_faces[:, 2] == unique_faces[:, 0]) | (
+                unique_faces[:, 2] == unique_faces[:, 1]
+            )
+            loop_is_duplicate = loop_is_duplicate.reshape(-1)
+
+            # New vertex is created by the first loop of every unique
+            # position, and by every duplicate loop
+            loop_unique = unique_faces.reshape(-1)
+            unique_first_loop = np.full(len(first_verts), num_loops, dtype=np.int64)
+            np.minimum.at(unique_first_loop, loop_unique, np.arange(num_loops))
+            creates_vert = loop_is_duplicate.copy()
+            creates_vert[unique_first_loop[unique_first_loop < num_loops]] = True
+            loop_new_vert = np.cumsum(creates_vert) - 1
+            mesh.loop_verts = np.where(
+                loop_is_duplicate,
+                loop_new_vert,
+                loop_new_vert[unique_first_loop[loop_unique]],
+            ).astype(np.int32)
+
+            new_to_src_vert = loop_src_verts[creates_vert]
+            mesh.verts = positions[new_to_src_vert].astype(np.float32)
+            if len(self.bone_indices):
+                mesh.bone_names = self.bone_names
+                mesh.bone_indices = self.bone_indices[new_to_src_vert]
+                mesh.bone_weights = self.bone_weights[new_to_src_vert]
+            if len(self.constraints):
+                mesh.constraints = [
+                    self.constraints[i] for i in new_to_src_vert.tolist()
+                ]
         else:
-            mesh.verts = self.verts
-            mesh.weights = self.weights
+            mesh.verts = np.asarray(self.verts, dtype=np.float32).reshape(-1, 3)
+            mesh.bone_names = self.bone_names
+            mesh.bone_indices = self.bone_indices
+            mesh.bone_weights = self.bone_weights
             mesh.constraints = self.constraints
-            for face_idx in range(num_faces):
-                face_verts = self.facelist.vertices[face_idx]
-                for i in range(3):
-                    loop_idx = 3 * face_idx + i
-                    vert_idx = face_verts[i]
-                    mesh.loop_verts[loop_idx] = vert_idx
-                    if self.normals:
-                        mesh.loop_normals[loop_idx] = self.normals[vert_idx]
-                    if self.uv1:
-                        mesh.loop_uv1[loop_idx] = self.uv1[vert_idx]
-                    if self.uv2:
-                        mesh.loop_uv2[loop_idx] = self.uv2[vert_idx]
-                    if self.tangents and self.bitangents:
-                        mesh.loop_tangents[loop_idx] = self.tangents[vert_idx]
-                        mesh.loop_bitangents[loop_idx] = self.bitangents[vert_idx]
+            mesh.loop_verts = loop_src_verts.astype(np.int32)
+        if len(self.normals):
+            mesh.loop_normals = np.asarray(self.normals, dtype=np.float32)[
+                loop_src_verts
+            ]
+        else:
+            mesh.loop_normals = np.zeros((num_loops, 3), dtype=np.float32)
+        if len(self.uv1):
+            mesh.loop_uv1 = np.asarray(self.uv1, dtype=np.float32)[loop_src_verts]
+        if len(self.uv2):
+            mesh.loop_uv2 = np.asarray(self.uv2, dtype=np.float32)[loop_src_verts]
+        if len(self.tangents) and len(self.bitangents):
+            mesh.loop_tangents = np.asarray(self.tangents, dtype=np.float32)[
+                loop_src_verts
+            ]
+            mesh.loop_bitangents = np.asarray(self.bitangents, dtype=np.float32)[
+                loop_src_verts
+            ]
         mesh.face_materials = self.facelist.materials
         mesh.face_normals = self.facelist.normals
         return mesh
 
     def create_blender_mesh(self, name, mesh):
+        num_faces = mesh.num_faces()
         bl_mesh = bpy.data.meshes.new(name)
         bl_mesh.vertices.add(mesh.num_verts())
-        bl_mesh.vertices.foreach_set("co", unpack_list(mesh.verts))
+        bl_mesh.vertices.foreach_set(
+            "co", np.ascontiguousarray(mesh.verts, dtype=np.float32).reshape(-1)
+        )
         bl_mesh.loops.add(mesh.num_loops())
-        bl_mesh.loops.foreach_set("vertex_index", mesh.loop_verts)
-        bl_mesh.polygons.add(mesh.num_faces())
-        bl_mesh.polygons.foreach_set("loop_start", range(0, mesh.num_loops(), 3))
-        bl_mesh.polygons.foreach_set("loop_total", [3] * mesh.num_faces())
-        bl_mesh.polygons.foreach_set("use_smooth", [True] * mesh.num_faces())
+        bl_mesh.loops.foreach_set(
+            "vertex_index", np.ascontiguousarray(mesh.loop_verts, dtype=np.int32)
+        )
+        bl_mesh.polygons.add(num_faces)
+        bl_mesh.polygons.foreach_set(
+            "loop_start", np.arange(0, 3 * num_faces, 3, dtype=np.int32)
+        )
+        bl_mesh.polygons.foreach_set("loop_total", np.full(num_faces, 3, np.int32))
+        bl_mesh.polygons.foreach_set("use_smooth", np.ones(num_faces, dtype=bool))
         bl_mesh.update()
-        if mesh.loop_normals:
+        if len(mesh.loop_normals):
             bl_mesh.normals_split_custom_set(mesh.loop_normals)
             if bpy.app.version < (4, 1):
                 bl_mesh.use_auto_smooth = True
-        if mesh.loop_uv1:
+        if len(mesh.loop_uv1):
             uv_layer = bl_mesh.uv_layers.new(name=UV_MAP_MAIN, do_init=False)
-            uv_layer.data.foreach_set("uv", unpack_list(mesh.loop_uv1))
-        if mesh.loop_uv2:
+            uv_layer.data.foreach_set(
+                "uv", np.ascontiguousarray(mesh.loop_uv1, dtype=np.float32).reshape(-1)
+            )
+        if len(mesh.loop_uv2):
             uv_layer = bl_mesh.uv_layers.new(name=UV_MAP_LIGHTMAP, do_init=False)
-            uv_layer.data.foreach_set("uv", unpack_list(mesh.loop_uv2))
+            uv_layer.data.foreach_set(
+                "uv", np.ascontiguousarray(mesh.loop_uv2, dtype=np.float32).reshape(-1)
+            )
         return bl_mesh
 
     def apply_edge_loop_mesh(self, mesh, obj):
@@ -309,8 +308,22 @@ class TrimeshNode(BaseNode):
         self.diffuse = obj.kb.diffuse
         self.ambient = obj.kb.ambient
 
-        mesh = self.unapply_edge_loop_mesh(eval_obj)
-        self.edge_loop_to_mdl_mesh(mesh)
+        self.edge_loop_mesh = self.unapply_edge_loop_mesh(eval_obj)
+
+    def convert_edge_loop_mesh(self, options):
+        # Only works on extracted mesh data, so that it can run off the main thread
+        mesh = self.edge_loop_mesh
+        self.edge_loop_mesh = None
+        export_cache = ExportCache.from_options(options)
+        if not export_cache:
+            self.edge_loop_to_mdl_mesh(mesh)
+            return
+        key = export_cache.get_key(self, mesh)
+        entry = export_cache.load(key, self)
+        if not entry:
+            self.edge_loop_to_mdl_mesh(mesh)
+            entry = export_cache.save(key, self)
+        self.export_blocks = entry.blocks
 
     def unapply_edge_loop_mesh(self, obj):
         bl_mesh = obj.data
@@ -319,32 +332,33 @@ class TrimeshNode(BaseNode):
             bl_mesh.calc_normals_split()
         if self.tangentspace and bl_mesh.uv_layers:
             bl_mesh.calc_tangents(uvmap=bl_mesh.uv_layers[0].name)
+        triangles = bl_mesh.loop_triangles
         mesh = EdgeLoopMesh()
-        for vert in bl_mesh.vertices:
-            mesh.verts.append(vert.co[:3])
-        for face in bl_mesh.loop_triangles:
-            for i in range(3):
-                mesh.loop_verts.append(face.vertices[i])
-                mesh.loop_normals.append(face.split_normals[i])
-                loop_idx = face.loops[i]
-                if UV_MAP_MAIN in bl_mesh.uv_layers:
-                    mesh.loop_uv1.append(
-                        bl_mesh.uv_layers[UV_MAP_MAIN].data[loop_idx].uv[:2]
-                    )
-                if self.lightmapped:
-                    if UV_MAP_LIGHTMAP not in bl_mesh.uv_layers:
-                        raise RuntimeError(
-                            f"Lightmapped object [{obj.name}] is missing UV map [${UV_MAP_LIGHTMAP}]"
-                        )
-                    mesh.loop_uv2.append(
-                        bl_mesh.uv_layers[UV_MAP_LIGHTMAP].data[loop_idx].uv[:2]
-                    )
-                if self.tangentspace:
-                    loop = bl_mesh.loops[loop_idx]
-                    mesh.loop_tangents.append(loop.tangent)
-                    mesh.loop_bitangents.append(loop.bitangent)
-            mesh.face_materials.append(face.material_index)
-            mesh.face_normals.append(face.normal)
+        mesh.verts = foreach_get_array(bl_mesh.vertices, "co", np.float32, 3)
+        mesh.loop_verts = foreach_get_array(triangles, "vertices", np.int32, 3).ravel()
+        mesh.loop_normals = foreach_get_array(
+            triangles, "split_normals", np.float32, 9
+        ).reshape(-1, 3)
+        loops = foreach_get_array(triangles, "loops", np.int32, 3).ravel()
+        if UV_MAP_MAIN in bl_mesh.uv_layers:
+            uv_data = bl_mesh.uv_layers[UV_MAP_MAIN].data
+            mesh.loop_uv1 = foreach_get_array(uv_data, "uv", np.float32, 2)[loops]
+        if self.lightmapped and len(triangles):
+            if UV_MAP_LIGHTMAP not in bl_mesh.uv_layers:
+                raise RuntimeError(
+                    f"Lightmapped object [{obj.name}] is missing UV map [${UV_MAP_LIGHTMAP}]"
+                )
+            uv_data = bl_mesh.uv_layers[UV_MAP_LIGHTMAP].data
+            mesh.loop_uv2 = foreach_get_array(uv_data, "uv", np.float32, 2)[loops]
+        if self.tangentspace and len(triangles):
+            mesh.loop_tangents = foreach_get_array(
+                bl_mesh.loops, "tangent", np.float32, 3
+            )[loops]
+            mesh.loop_bitangents = foreach_get_array(
+                bl_mesh.loops, "bitangent", np.float32, 3
+            )[loops]
+        mesh.face_materials = foreach_get_array(triangles, "material_index", np.int32)
+        mesh.face_normals = foreach_get_array(triangles, "normal", np.float32, 3)
         return mesh
 
     def edge_loop_to_mdl_mesh(self, mesh):
@@ -355,78 +369,88 @@ class TrimeshNode(BaseNode):
         self.tangents = []
         self.bitangents = []
         self.tangentspacenormals = []
-        self.weights = []
+        self.bone_names = []
+        self.bone_indices = []
+        self.bone_weights = []
         self.constraints = []
         self.facelist = FaceList()
 
         if self.compression != Compression.DISABLED:
-            attrs_to_vert_idx = dict()
-            for face_idx in range(mesh.num_faces()):
-                vert_indices = [0] * 3
-                for i in range(3):
-                    loop_idx = 3 * face_idx + i
-                    vert_idx = mesh.loop_verts[loop_idx]
-                    vert = mesh.verts[vert_idx]
-                    normal = mesh.loop_normals[loop_idx]
-                    uv1 = mesh.loop_uv1[loop_idx] if mesh.loop_uv1 else (0.0, 0.0)
-                    uv2 = mesh.loop_uv2[loop_idx] if mesh.loop_uv2 else (0.0, 0.0)
-                    attrs = SimilarEdgeLoopMeshVertex(vert, normal, uv1, uv2)
-                    if attrs in attrs_to_vert_idx:
-                        vert_indices[i] = attrs_to_vert_idx[attrs]
-                    else:
-                        num_verts = len(self.verts)
-                        attrs_to_vert_idx[attrs] = num_verts
-                        vert_indices[i] = num_verts
-                        self.verts.append(vert)
-                        self.normals.append(normal)
-                        if mesh.loop_uv1:
-                            self.uv1.append(uv1)
-                        if mesh.loop_uv2:
-                            self.uv2.append(uv2)
-                        if mesh.loop_tangents and mesh.loop_bitangents:
-                            self.tangents.append(mesh.loop_tangents[loop_idx])
-                            self.bitangents.append(mesh.loop_bitangents[loop_idx])
-                            self.tangentspacenormals.append(mesh.loop_normals[loop_idx])
-                        if mesh.weights:
-                            self.weights.append(mesh.weights[vert_idx])
-                        if mesh.constraints:
-                            self.constraints.append(mesh.constraints[vert_idx])
-                self.facelist.vertices.append(vert_indices)
-                self.facelist.uv.append(vert_indices)
+            # Merge loops with similar coordinates, normals and UV
+            loop_attrs = [
+                np.asarray(mesh.verts, dtype=np.float64).reshape(-1, 3)[
+                    mesh.loop_verts
+                ],
+                np.asarray(mesh.loop_normals, dtype=np.float64).reshape(-1, 3),
+            ]
+            if len(mesh.loop_uv1):
+                loop_attrs.append(np.asarray(mesh.loop_uv1, dtype=np.float64))
+            if len(mesh.loop_uv2):
+                loop_attrs.append(np.asarray(mesh.loop_uv2, dtype=np.float64))
+            unique_loops, loop_to_vert = weld_loops(np.hstack(loop_attrs))
+
+            vert_indices = np.asarray(mesh.loop_verts)[unique_loops]
+            self.verts = array_to_tuples(np.asarray(mesh.verts)[vert_indices])
+            self.normals = array_to_tuples(mesh.loop_normals[unique_loops])
+            if len(mesh.loop_uv1):
+                self.uv1 = array_to_tuples(mesh.loop_uv1[unique_loops])
+            if len(mesh.loop_uv2):
+                self.uv2 = array_to_tuples(mesh.loop_uv2[unique_loops])
+            if len(mesh.loop_tangents) and len(mesh.loop_bitangents):
+                self.tangents = array_to_tuples(mesh.loop_tangents[unique_loops])
+                self.bitangents = array_to_tuples(mesh.loop_bitangents[unique_loops])
+                self.tangentspacenormals = list(self.normals)
+            if len(mesh.bone_indices):
+                self.bone_names = mesh.bone_names
+                self.bone_indices = mesh.bone_indices[vert_indices]
+                self.bone_weights = mesh.bone_weights[vert_indices]
+            if mesh.constraints:
+                self.constraints = [mesh.constraints[i] for i in vert_indices.tolist()]
+            self.facelist.vertices = loop_to_vert.reshape(-1, 3).tolist()
+            self.facelist.uv = list(self.facelist.vertices)
         else:
             num_verts = len(mesh.verts)
-            self.verts = mesh.verts
-            self.weights = mesh.weights
+            self.verts = array_to_tuples(mesh.verts)
+            self.bone_names = mesh.bone_names
+            self.bone_indices = mesh.bone_indices
+            self.bone_weights = mesh.bone_weights
             self.constraints = mesh.constraints
+            loop_verts = np.asarray(mesh.loop_verts).tolist()
+            loop_normals = array_to_tuples(mesh.loop_normals)
+            loop_uv1 = array_to_tuples(mesh.loop_uv1)
+            loop_uv2 = array_to_tuples(mesh.loop_uv2)
+            has_tangents = len(mesh.loop_tangents) and len(mesh.loop_bitangents)
             normals = [Vector((0, 0, 0))] * num_verts
-            if mesh.loop_tangents and mesh.loop_bitangents:
+            if has_tangents:
+                loop_tangents = array_to_tuples(mesh.loop_tangents)
+                loop_bitangents = array_to_tuples(mesh.loop_bitangents)
                 tangents = [Vector((0, 0, 0))] * num_verts
                 bitangents = [Vector((0, 0, 0))] * num_verts
                 tanspacenormals = [Vector((0, 0, 0))] * num_verts
-            if mesh.loop_uv1:
+            if loop_uv1:
                 self.uv1 = [(0, 0)] * num_verts
-            if mesh.loop_uv2:
+            if loop_uv2:
                 self.uv2 = [(0, 0)] * num_verts
             for face_idx in range(mesh.num_faces()):
                 start_loop_idx = 3 * face_idx
-                face_verts = mesh.loop_verts[start_loop_idx : (start_loop_idx + 3)]
+                face_verts = loop_verts[start_loop_idx : (start_loop_idx + 3)]
                 for i in range(3):
                     loop_idx = start_loop_idx + i
                     vert_idx = face_verts[i]
-                    normals[vert_idx] += Vector(mesh.loop_normals[loop_idx])
-                    if mesh.loop_uv1:
-                        self.uv1[vert_idx] = mesh.loop_uv1[loop_idx]
-                    if mesh.loop_uv2:
-                        self.uv2[vert_idx] = mesh.loop_uv2[loop_idx]
-                    if mesh.loop_tangents and mesh.loop_bitangents:
-                        tangents[vert_idx] += Vector(mesh.loop_tangents[loop_idx])
-                        bitangents[vert_idx] += Vector(mesh.loop_bitangents[loop_idx])
-                        tanspacenormals[vert_idx] += Vector(mesh.loop_normals[loop_idx])
+                    normals[vert_idx] += Vector(loop_normals[loop_idx])
+                    if loop_uv1:
+                        self.uv1[vert_idx] = loop_uv1[loop_idx]
+                    if loop_uv2:
+                        self.uv2[vert_idx] = loop_uv2[loop_idx]
+                    if has_tangents:
+                        tangents[vert_idx] += Vector(loop_tangents[loop_idx])
+                        bitangents[vert_idx] += Vector(loop_bitangents[loop_idx])
+                        tanspacenormals[vert_idx] += Vector(loop_normals[loop_idx])
                 self.facelist.vertices.append(face_verts)
                 self.facelist.uv.append(face_verts)
             normals = [normal.normalized() for normal in normals]
             self.normals = [normal[:3] for normal in normals]
-            if mesh.loop_tangents and mesh.loop_bitangents:
+            if has_tangents:
                 tangents = [tangent.normalized() for tangent in tangents]
                 bitangents = [bitangent.normalized() for bitangent in bitangents]
                 tanspacenormals = [normal.normalized() for normal in tanspacenormals]
@@ -434,5 +458,25 @@ class TrimeshNode(BaseNode):
                 self.bitangents = [bitangent[:3] for bitangent in bitangents]
                 self.tangentspacenormals = [normal[:3] for normal in tanspacenormals]
 
-        self.facelist.materials = mesh.face_materials
-        self.facelist.normals = mesh.face_normals
+        self.facelist.materials = np.asarray(mesh.face_materials).tolist()
+        self.facelist.normals = array_to_tuples(mesh.face_normals)
+
+
+def weld_loops(loop_attrs):
+    # Merges loops whose attributes are equal up to 4 decimal places. Returns
+    # indices of loops that become vertices, in order of first occurrence,
+    # and vertex index of every loop.
+    if not len(loop_attrs):
+        return [], np.zeros(0, dtype=np.int64)
+    quantized = np.trunc(loop_attrs * 10000.0).astype(np.int64)
+    _, first_loops, unique_to_loop = np.unique(
+        quantized, axis=0, return_index=True, return_inverse=True
+    )
+    order = np.argsort(first_loops)
+    unique_to_vert = np.empty(len(order), dtype=np.int64)
+    unique_to_vert[order] = np.arange(len(order))
+    return first_loops[order].tolist(), unique_to_vert[unique_to_loop.reshape(-1)]
+
+
+def array_to_tuples(values):
+    return list(map(tuple, np.asarray(values).tolist()))
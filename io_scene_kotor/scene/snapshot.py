@@ -0,0 +1,81 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+
+from ..utils import is_pwk_root, is_dwk_root, logger
+
+
+# Flattens the object hierarchy under a root object into parallel lists, in
+# export order, evaluating the dependency graph only once. Object.children
+# scans every object in the file, so children are looked up in a map that is
+# built in a single pass instead.
+class ObjectSnapshot:
+    def __init__(self, root_obj, exclude_xwk=True):
+        self.root_obj = root_obj
+        self.objects = []
+        self.eval_objects = []
+        self.parent_indices = []
+        self.xwk_roots = []
+
+        children = dict()
+        for obj in bpy.data.objects:
+            if obj.parent:
+                children.setdefault(obj.parent, []).append(obj)
+
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        subtree = []
+        obj_stack = [(root_obj, -1, False)]
+        while obj_stack:
+            obj, parent_idx, excluded = obj_stack.pop()
+            subtree.append(obj)
+            if is_pwk_root(obj) or is_dwk_root(obj):
+                self.xwk_roots.append(obj)
+                excluded = excluded or exclude_xwk
+            if excluded:
+                obj_idx = -1
+            else:
+                obj_idx = len(self.objects)
+                self.objects.append(obj)
+                self.eval_objects.append(obj.evaluated_get(depsgraph))
+                self.parent_indices.append(parent_idx)
+            obj_children = sorted(
+                children.get(obj, []), key=lambda o: o.kb.export_order
+            )
+            for child in reversed(obj_children):
+                obj_stack.append((child, obj_idx, excluded))
+
+        self.sanitize_node_numbers(subtree)
+
+    def sanitize_node_numbers(self, objects):
+        # Make a set of unique node numbers
+        node_numbers = set()
+        for obj in objects:
+            if obj.kb.node_number in node_numbers:
+                logger().warning(
+                    f"Duplicate node number [{obj.kb.node_number}] in object [{obj.name}]"
+                )
+            if obj.kb.node_number != -1:
+                node_numbers.add(obj.kb.node_number)
+        next_node_number = max(node_numbers) + 1 if node_numbers else 0
+
+        # Generate node numbers when undefined
+        for obj in objects:
+            if obj.kb.node_number == -1:
+                obj.kb.node_number = next_node_number
+                next_node_number += 1
@@ -0,0 +1,115 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import os
+import struct
+import tempfile
+
+import bpy
+
+import numpy as np
+
+from ..diskcache import evict_entries, get_files_key, touch_entry
+from ..utils import logger
+
+CACHE_VERSION = 1
+IMAGE_EXT = ".tga"
+TXI_EXT = ".txi"
+
+DEF_CACHE_DIR = os.path.join(tempfile.gettempdir(), "kotorblender", "textures")
+
+
+# Stores decoded TPC textures on disk as uncompressed TGA images, with TXI
+# lines alongside, so that Blender can load them as external files instead of
+# decoding and packing pixels on every import. Entries are keyed by TPC file
+# and mip level selection.
+class TextureCache:
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    @classmethod
+    def from_options(cls, options):
+        if not options.use_texture_cache:
+            return None
+        return TextureCache(
+            options.texture_cache_dir or DEF_CACHE_DIR,
+            options.texture_cache_size * 1024 * 1024,
+        )
+
+    def get_key(self, path, mip_bias, max_resolution):
+        return get_files_key(
+            "{}:{}:{}".format(CACHE_VERSION, mip_bias, max_resolution), [path]
+        )
+
+    def load(self, key):
+        image_path = os.path.join(self.cache_dir, key + IMAGE_EXT)
+        txi_path = os.path.join(self.cache_dir, key + TXI_EXT)
+        if not os.path.exists(image_path) or not os.path.exists(txi_path):
+            return None
+        try:
+            with open(txi_path, "r", encoding="utf-8") as f:
+                txi_lines = f.read().splitlines()
+            touch_entry([image_path, txi_path])
+            return image_path, txi_lines
+        except Exception:
+            logger().exception(f"Error loading cache entry [{image_path}]")
+            return None
+
+    def save(self, key, tpc_image):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            image_path = os.path.join(self.cache_dir, key + IMAGE_EXT)
+            txi_path = os.path.join(self.cache_dir, key + TXI_EXT)
+            # Blender pixels go from bottom to top row, as do TGA pixels with
+            # the default origin
+            pixels = np.rint(tpc_image.pixels * 255).astype(np.uint8).reshape(-1, 4)
+            header = struct.pack(
+                "<BBBHHBHHHHBB", 0, 0, 2, 0, 0, 0, 0, 0, tpc_image.w, tpc_image.h, 32, 8
+            )
+            with open(image_path + ".tmp", "wb") as f:
+                f.write(header)
+                f.write(pixels[:, [2, 1, 0, 3]].tobytes())
+            with open(txi_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write("\n".join(tpc_image.txi_lines))
+            os.replace(image_path + ".tmp", image_path)
+            os.replace(txi_path + ".tmp", txi_path)
+            # Keep the new entry and entries behind loaded images, since
+            # Blender reads image files lazily
+            self.evict({key} | self.get_used_keys())
+            return image_path, tpc_image.txi_lines
+        except Exception:
+            logger().exception(f"Error saving cache entry [{key}]")
+            return None
+
+    def get_used_keys(self):
+        cache_dir = os.path.abspath(self.cache_dir)
+        keys = set()
+        for image in bpy.data.images:
+            if not image.filepath:
+                continue
+            path = os.path.abspath(bpy.path.abspath(image.filepath))
+            if os.path.dirname(path) != cache_dir:
+                continue
+            key, ext = os.path.splitext(os.path.basename(path))
+            if ext == IMAGE_EXT:
+                keys.add(key)
+        return keys
+
+    def evict(self, keep_keys=()):
+        evict_entries(self.cache_dir, self.max_size, [IMAGE_EXT, TXI_EXT], keep_keys)
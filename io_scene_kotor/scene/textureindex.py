@@ -0,0 +1,54 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import os
+
+
+# Maps lowercase file names to paths, per search directory, so that looking
+# up a texture does not list every search directory again. Listings are kept
+# for the session and rebuilt when the modification time of a directory
+# changes, i.e. when files are added, removed or renamed.
+class TextureIndex:
+    instance = None
+
+    def __init__(self):
+        self.directories = dict()
+
+    @classmethod
+    def get(cls):
+        if not cls.instance:
+            cls.instance = TextureIndex()
+        return cls.instance
+
+    def get_files(self, directory):
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            self.directories.pop(directory, None)
+            return None
+        cached = self.directories.get(directory)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        files = dict()
+        for filename in os.listdir(directory):
+            files[filename.lower()] = os.path.join(directory, filename)
+        self.directories[directory] = (mtime, files)
+        return files
+
+    def clear(self):
+        self.directories.clear()
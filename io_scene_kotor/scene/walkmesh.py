@@ -20,6 +20,7 @@ from ..constants import WalkmeshType
 from ..utils import is_pwk_root, is_dwk_root
 from .model import Model
 from .modelnode.dummy import DummyNode
+from .snapshot import ObjectSnapshot
 
 
 class Walkmesh(Model):
@@ -55,6 +56,7 @@ class Walkmesh(Model):
             )
 
         walkmesh = Walkmesh(walkmesh_type)
-        walkmesh.root_node = cls.model_node_from_object(obj, options, exclude_xwk=False)
+        snapshot = ObjectSnapshot(obj, exclude_xwk=False)
+        walkmesh.root_node = cls.model_nodes_from_snapshot(snapshot, options)
 
         return walkmesh
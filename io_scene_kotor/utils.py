@@ -19,6 +19,8 @@
 import logging
 import os
 
+import numpy as np
+
 from .constants import *
 
 _logger = logging.getLogger(__name__)
@@ -33,6 +35,14 @@ def logger():
     return _logger
 
 
+def foreach_get_array(collection, attr, dtype, width=1):
+    # Reads attribute of every item of a Blender collection into an array of
+    # shape (len(collection), width), or (len(collection),) if width is 1
+    values = np.empty(len(collection) * width, dtype=dtype)
+    collection.foreach_get(attr, values)
+    return values.reshape(-1, width) if width > 1 else values
+
+
 def is_dummy_type(obj, dummytype):
     return obj and obj.type == "EMPTY" and obj.kb.dummytype == dummytype
 
@@ -0,0 +1,99 @@
+import os
+import shutil
+import sys
+import time
+
+import bmesh
+import bpy
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from io_scene_kotor.constants import DummyType, MeshType
+from io_scene_kotor.format.mdl.reader import MdlReader
+from io_scene_kotor.io.cache import ModelCache
+from io_scene_kotor.io.mdl import read_mdl
+
+num_meshes = int(os.environ["NUM_MESHES"]) if "NUM_MESHES" in os.environ else 16
+num_anims = 4
+
+out_dir = "./test/out/cache"
+shutil.rmtree(out_dir, ignore_errors=True)
+os.makedirs(out_dir)
+model_path = f"{out_dir}/cachetest.mdl"
+
+
+def list_nodes(model):
+    nodes = []
+    stack = [model.root_node]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(reversed(node.children))
+    return nodes
+
+
+# Geometry-heavy model with a few animations
+bpy.ops.wm.read_homefile(use_empty=True)
+root = bpy.data.objects.new("cachetest", None)
+bpy.context.collection.objects.link(root)
+root.kb.dummytype = DummyType.MDLROOT
+root.rotation_mode = "QUATERNION"
+for i in range(num_meshes):
+    bm = bmesh.new()
+    bmesh.ops.create_grid(bm, x_segments=64, y_segments=64, size=5.0)
+    mesh = bpy.data.meshes.new(f"mesh{i}")
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.uv_layers.new(name="UVMap")
+    obj = bpy.data.objects.new(f"mesh{i}", mesh)
+    bpy.context.collection.objects.link(obj)
+    obj.parent = root
+    obj.location = (i, 0.0, 0.0)
+    obj.rotation_mode = "QUATERNION"
+    obj.kb.meshtype = MeshType.TRIMESH
+    obj.kb.node_number = i + 1
+for i in range(num_anims):
+    anim = root.kb.anim_list.add()
+    anim.name = f"anim{i}"
+    anim.frame_start = 10 * i
+    anim.frame_end = 10 * i + 5
+    for frame in [anim.frame_start, anim.frame_end]:
+        obj.location = (0.0, 0.0, frame)
+        obj.keyframe_insert("location", frame=frame)
+assert "FINISHED" in bpy.ops.kb.mdlexport(filepath=model_path)
+
+start = time.perf_counter()
+parsed = MdlReader(model_path).load()
+parse_time = time.perf_counter() - start
+
+cache = ModelCache(f"{out_dir}/entries", 0)
+read_mdl(model_path, cache)
+start = time.perf_counter()
+cached = read_mdl(model_path, cache)
+hit_time = time.perf_counter() - start
+print(f"Parse: {parse_time:.3f}s, cache hit: {hit_time:.3f}s")
+assert hit_time < parse_time
+
+# Animations are read from MDL and only decoded when needed
+assert len(cached.animations) == num_anims
+assert all(anim.root_node is None for anim in cached.animations)
+for anim in cached.animations:
+    anim.load_root_node()
+    assert anim.root_node is not None
+
+parsed_nodes = list_nodes(parsed)
+cached_nodes = list_nodes(cached)
+assert len(cached_nodes) == len(parsed_nodes)
+for expected, actual in zip(parsed_nodes, cached_nodes):
+    assert type(actual) is type(expected), expected.name
+    assert actual.name == expected.name
+    assert actual.from_root == expected.from_root, expected.name
+    if not hasattr(expected, "facelist"):
+        continue
+    for name in ["verts", "normals", "uv1"]:
+        assert np.array_equal(getattr(actual, name), getattr(expected, name)), name
+    for name in ["vertices", "uv", "materials"]:
+        assert np.array_equal(
+            getattr(actual.facelist, name), getattr(expected.facelist, name)
+        ), name
@@ -0,0 +1,120 @@
+import os
+import sys
+
+from struct import unpack
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from io_scene_kotor.format.tpc.reader import TpcEncoding, TpcMip, TpcReader
+
+seed = int(os.environ["SEED"]) if "SEED" in os.environ else 0
+limit = int(os.environ["LIMIT"]) if "LIMIT" in os.environ else 20
+
+
+# Reference decoder, decompresses one pixel at a time
+def decompress_dxt15_reference(w, h, pixels, has_alpha):
+    num_blocks_x = (w + 3) // 4
+    num_blocks_y = (h + 3) // 4
+    block_size = 16 if has_alpha else 8
+    num_channels = 4 if has_alpha else 3
+    out_pixels = [None] * (w * h * num_channels)
+    for block_y in range(num_blocks_y):
+        for block_x in range(num_blocks_x):
+            idx = block_size * (block_y * num_blocks_x + block_x)
+            if has_alpha:
+                a0, a1 = pixels[idx : idx + 2]
+                alpha_codes = unpack("<Q", pixels[idx + 2 : idx + 10])[0]
+                colors = unpack("<HH", pixels[idx + 8 : idx + 12])
+                color_codes = unpack("<L", pixels[idx + 12 : idx + 16])[0]
+            else:
+                colors = unpack("<HH", pixels[idx : idx + 4])
+                color_codes = unpack("<L", pixels[idx + 4 : idx + 8])[0]
+            r, g, b = [], [], []
+            for i in range(2):
+                tmp = (colors[i] >> 11) * 255 + 16
+                r.append((tmp // 32 + tmp) // 32)
+                tmp = ((colors[i] & 0x07E0) >> 5) * 255 + 32
+                g.append((tmp // 64 + tmp) // 64)
+                tmp = (colors[i] & 0x001F) * 255 + 16
+                b.append((tmp // 32 + tmp) // 32)
+            for y in range(4):
+                for x in range(4):
+                    alpha = 255
+                    if has_alpha:
+                        code = (alpha_codes >> (3 * (4 * y + x))) & 0x07
+                        if code < 2:
+                            alpha = (a0, a1)[code]
+                        elif a0 > a1:
+                            alpha = ((8 - code) * a0 + (code - 1) * a1) // 7
+                        elif code == 6:
+                            alpha = 0
+                        elif code == 7:
+                            alpha = 255
+                        else:
+                            alpha = ((6 - code) * a0 + (code - 1) * a1) // 5
+                    code = (color_codes >> (2 * (4 * y + x))) & 0x03
+                    if code < 2:
+                        rgb = (r[code], g[code], b[code])
+                    elif has_alpha or colors[0] > colors[1]:
+                        if code == 2:
+                            rgb = [(2 * c[0] + c[1]) // 3 for c in (r, g, b)]
+                        else:
+                            rgb = [(c[0] + 2 * c[1]) // 3 for c in (r, g, b)]
+                    elif code == 2:
+                        rgb = [(c[0] + c[1]) // 2 for c in (r, g, b)]
+                    else:
+                        rgb = (0, 0, 0)
+                    pixel_x = 4 * block_x + x
+                    pixel_y = 4 * block_y + y
+                    if pixel_x >= w or pixel_y >= h:
+                        continue
+                    out_idx = num_channels * (pixel_y * w + pixel_x)
+                    out_pixels[out_idx : out_idx + 3] = rgb
+                    if has_alpha:
+                        out_pixels[out_idx + 3] = alpha
+    return out_pixels
+
+
+def check_mip(name, mip, has_alpha):
+    expected = decompress_dxt15_reference(mip.w, mip.h, mip.pixels, has_alpha)
+    actual = TpcReader(b"").decompress_mip_dxt15(mip, has_alpha)
+    assert actual.dtype == np.uint8, name
+    assert actual.tolist() == expected, name
+
+
+# Random blocks, covering both DXT1 color modes and both DXT5 alpha modes
+rng = np.random.default_rng(seed)
+for w, h in [(4, 4), (8, 4), (4, 8), (16, 16), (12, 20), (6, 8), (2, 2), (1, 1)]:
+    num_blocks = ((w + 3) // 4) * ((h + 3) // 4)
+    for has_alpha in [False, True]:
+        block_size = 16 if has_alpha else 8
+        pixels = rng.integers(0, 256, block_size * num_blocks, dtype=np.uint8)
+        check_mip(f"random {w}x{h}", TpcMip(w, h, pixels.tobytes()), has_alpha)
+
+# Equal endpoints, where DXT1 switches to three colors and transparent black
+for has_alpha in [False, True]:
+    block = bytes([0x80, 0x80] if has_alpha else [])
+    block += bytes([0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF] if has_alpha else [])
+    block += bytes([0x34, 0x12, 0x34, 0x12, 0xE4, 0xE4, 0xE4, 0xE4])
+    check_mip("equal endpoints", TpcMip(4, 4, block), has_alpha)
+
+# Top mips of compressed textures in a game data directory
+if "DATA_DIR" in os.environ:
+    data_dir = os.environ["DATA_DIR"]
+    names = sorted(name for name in os.listdir(data_dir) if name.endswith(".tpc"))
+    num_checked = 0
+    for name in names:
+        if num_checked >= limit:
+            break
+        with open(os.path.join(data_dir, name), "rb") as f:
+            data = f.read()
+        compressed_size, _, w, h, encoding = unpack("<IIHHB", data[:13])
+        if not compressed_size or h // w == 6:
+            continue
+        if TpcEncoding(encoding) == TpcEncoding.GRAYSCALE:
+            continue
+        mip = TpcMip(w, h, data[128 : 128 + compressed_size])
+        check_mip(name, mip, TpcEncoding(encoding) == TpcEncoding.RGBA)
+        num_checked += 1